@@ -1,4 +1,17 @@
 from aioidex.datastream.datastream import IdexDatastream
+from aioidex.datastream.metrics import DatastreamMetrics
+from aioidex.datastream.pool import IdexDatastreamPool
+from aioidex.datastream.queue import OverflowPolicy
+from aioidex.datastream.recorder import FrameRecorder, FrameReplay
+from aioidex.datastream.router import EventRouter
+from aioidex.http.backfill import TradeBackfill
+from aioidex.http.cache import ResponseCache
 from aioidex.http.client import Client
+from aioidex.http.ratelimit import RateLimiter
+from aioidex.http.retry import CircuitBreaker, RetryPolicy
+from aioidex.orderbook.book import OrderBook
+from aioidex.orderbook.manager import OrderBookManager
+from aioidex.trades.candles import Candle, CandleAggregator
+from aioidex.trades.tape import TradeTape, TradeTapeManager
 from aioidex.types.events import AccountEvents, ChainEvents, MarketEvents
 from aioidex.types.subscriptions import AccountSubscription, ChainSubscription, MarketSubscription
@@ -0,0 +1,86 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Type, Union
+
+import ujson
+
+
+class Codec(ABC):
+    '''JSON codec used to encode requests and decode datastream frames and HTTP response bodies.
+
+    `loads` accepts both `bytes` and `str`, so raw frames and bodies are passed to the parser as is.
+    '''
+    name: str = None
+
+    @abstractmethod
+    def dumps(self, data: Any) -> str:
+        pass
+
+    @abstractmethod
+    def loads(self, data: Union[bytes, str]) -> Any:
+        pass
+
+    def __repr__(self):
+        return f'{type(self).__name__}()'
+
+
+class UjsonCodec(Codec):
+    name = 'ujson'
+
+    def dumps(self, data: Any) -> str:
+        return ujson.dumps(data)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return ujson.loads(data)
+
+
+class OrjsonCodec(Codec):
+    name = 'orjson'
+
+    def __init__(self):
+        try:
+            import orjson
+        except ImportError:
+            raise ImportError('orjson codec requires the orjson package: pip install aioidex[orjson]') from None
+
+        self._orjson = orjson
+
+    def dumps(self, data: Any) -> str:
+        # the datastream expects text frames
+        return self._orjson.dumps(data).decode()
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._orjson.loads(data)
+
+
+class StdJsonCodec(Codec):
+    name = 'json'
+
+    def dumps(self, data: Any) -> str:
+        return json.dumps(data, separators=(',', ':'))
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+CODECS: Dict[str, Type[Codec]] = {
+    UjsonCodec.name: UjsonCodec,
+    OrjsonCodec.name: OrjsonCodec,
+    StdJsonCodec.name: StdJsonCodec,
+}
+
+DEFAULT_CODEC = UjsonCodec.name
+
+
+def get_codec(codec: Union[str, Codec, None] = None) -> Codec:
+    '''Returns a codec instance by its name (`ujson`, `orjson` or `json`), codec instances are returned as is.'''
+    if isinstance(codec, Codec):
+        return codec
+
+    name = codec or DEFAULT_CODEC
+    try:
+        codec_cls = CODECS[name]
+    except KeyError:
+        raise ValueError(f'Unknown codec {name!r}, possible values are {", ".join(CODECS)}') from None
+
+    return codec_cls()
@@ -1,17 +1,25 @@
 import asyncio
 import logging
+import time
 from asyncio import AbstractEventLoop
-from typing import Dict, Union, Optional
+from collections import deque
+from typing import Dict, Union, Optional, Any, Deque, List, Set, Callable, Awaitable
 
 import backoff
-import ujson
 import websockets
 from shortid import ShortId
 from websockets.client import WebSocketClientProtocol
 
+from aioidex.codecs import Codec, get_codec
+from aioidex.datastream.message import DatastreamMessage, TOPIC_FIELD
+from aioidex.datastream.metrics import DatastreamMetrics
+from aioidex.datastream.queue import MessageQueue, OverflowPolicy
+from aioidex.datastream.recorder import FrameRecorder, FrameReplay, FRAME, SID, RETIRED_SID
+from aioidex.datastream.router import EventRouter
 from aioidex.datastream.sub_manager import SubscriptionManager
 from aioidex.exceptions import IdexHandshakeException, IdexAuthenticationFailure, IdexResponseSidError, \
-    IdexDataStreamError, IdexInvalidVersion, IdexHandshakeTimeout
+    IdexDataStreamError, IdexInvalidVersion, IdexHandshakeTimeout, IdexRequestTimeout
+from aioidex.types.models import to_event
 
 
 class IdexDatastream:
@@ -25,30 +33,135 @@ class IdexDatastream:
             ws_endpoint: str = 'wss://datastream.idex.market',
             handshake_timeout: float = 1.0,
             return_sub_responses=False,
-            loop: AbstractEventLoop = None
+            loop: AbstractEventLoop = None,
+            router: EventRouter = None,
+            codec: Union[str, Codec] = None,
+            queue_size: int = 1000,
+            overflow: Union[OverflowPolicy, str] = OverflowPolicy.DROP_OLDEST,
+            make_before_break: bool = False,
+            rotation_interval: float = None,
+            rotation_timeout: float = 5.0,
+            rotation_overlap: float = 5.0,
+            request_timeout: float = 5.0,
+            recorder: FrameRecorder = None,
+            replay: FrameReplay = None,
+            metrics: DatastreamMetrics = None,
+            handler_concurrency: int = 100
     ):
         self._API_KEY = api_key
         self._WS_ENDPOINT = ws_endpoint
         self._WS_VERSION = version
         self._HANDSHAKE_TIMEOUT = handshake_timeout
+        self._QUEUE_SIZE = queue_size
+        self._OVERFLOW = OverflowPolicy(overflow)
+        self._MAKE_BEFORE_BREAK = make_before_break
+        self._ROTATION_INTERVAL = rotation_interval
+        self._ROTATION_TIMEOUT = rotation_timeout
+        self._ROTATION_OVERLAP = rotation_overlap
+        self._REQUEST_TIMEOUT = request_timeout
+        self._HANDLER_CONCURRENCY = handler_concurrency
 
         self._loop = loop or asyncio.get_event_loop()
         self._logger = logging.getLogger(__name__)
 
         self._rid = ShortId()
 
+        self.router = router
+        # coroutine handlers run off the reader task, their results are queued once done
+        self._handler_tasks: Set[asyncio.Future] = set()
+        self.queue: MessageQueue = None
+        self._codec = get_codec(codec)
+
+        # raw frames log, and its replay instead of the connection
+        self.recorder = recorder
+        self._replay = replay
+
+        self.metrics = metrics
+
+        # called with the datastream once a lost connection is restored, events may be missed meanwhile
+        self._reconnect_callbacks: List[Callable[['IdexDatastream'], Any]] = []
+
+        # rid -> response future of the requests in flight
+        self._requests: Dict[str, asyncio.Future] = {}
+
+        # make-before-break rotation state
+        self._rotation_lock = asyncio.Lock()
+        self._backlog: Deque[Union[bytes, str]] = deque()
+        self._retired_sids: Deque[str] = deque(maxlen=4)
+        self._seen_eids: Optional[Set[str]] = None
+        self._dedup_deadline: float = None
+
         self.sub_manager = SubscriptionManager(self, return_sub_responses)
 
     async def _ping_ws_task(self, delay=30):
         while True:
             await asyncio.sleep(delay)
             try:
-                await self._ws.ping()
+                pong = await self._ws.ping()
+                if self.metrics is not None:
+                    asyncio.ensure_future(self._observe_ping(pong, time.perf_counter(), delay), loop=self._loop)
             except Exception as e:
                 self._logger.error('Ping task exception (%s): %s', type(e).__name__, e)
-                self._logger.warning('Reconnecting...')
-                await self.init()
-                await self.sub_manager.resubscribe()
+                await self._reconnect()
+
+    async def _observe_ping(self, pong: asyncio.Future, started: float, timeout: float):
+        try:
+            await asyncio.wait_for(pong, timeout, loop=self._loop)
+        except Exception:
+            return
+        self.metrics.ping_rtt.observe(time.perf_counter() - started)
+        self.metrics.alive_at = time.time()
+
+    async def _metrics_task(self):
+        while True:
+            await asyncio.sleep(self.metrics.interval)
+            try:
+                self.metrics.callback(self.metrics.snapshot())
+            except Exception as e:
+                self._logger.error('Metrics callback exception (%s): %s', type(e).__name__, e)
+
+    async def _rotation_task(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.rotate()
+            except Exception as e:
+                self._logger.error('Scheduled rotation failed (%s): %s', type(e).__name__, e)
+
+    def on_reconnect(self, callback: Callable[['IdexDatastream'], Any]):
+        '''Calls `callback(datastream)` every time a lost connection is restored.
+
+        The events sent meanwhile are missed, unlike those of a scheduled make-before-break `rotate`.
+        '''
+        self._reconnect_callbacks.append(callback)
+
+    async def _reconnect(self):
+        self._logger.warning('Reconnecting...')
+        started = time.perf_counter()
+        # the connection is down since its last sign of life, not since the loss is detected
+        detection = 0.0
+        if self.metrics is not None and self.metrics.alive_at is not None:
+            detection = max(0.0, time.time() - self.metrics.alive_at)
+        await self._restore_connection()
+        if self.metrics is not None:
+            self.metrics.observe_reconnect(detection + time.perf_counter() - started)
+
+        for callback in self._reconnect_callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                self._logger.error('Reconnect callback exception (%s): %s', type(e).__name__, e)
+
+    async def _restore_connection(self):
+        if self._MAKE_BEFORE_BREAK:
+            await self.rotate()
+        else:
+            old_ws = self._ws
+            await self.init()
+            if old_ws is not None and old_ws is not self._ws:
+                asyncio.ensure_future(self._retire_connection(old_ws), loop=self._loop)
+            # the confirmations are read by the reader task, so don't wait for them here
+            await self.sub_manager.resubscribe(wait=False)
 
     async def _check_connection(self):
         if not self._ws:
@@ -56,6 +169,8 @@ class IdexDatastream:
             await self.init()
 
     async def init(self, ws: WebSocketClientProtocol = None):
+        # responses to the requests sent over the previous connection will never come
+        self._cancel_requests()
         await self._init_connection(ws)
         await self._shake_hand()
 
@@ -79,6 +194,57 @@ class IdexDatastream:
 
         return request_rid
 
+    async def request(self, request: str, payload: Dict, rid: str = None, timeout: float = None) -> DatastreamMessage:
+        '''Sends the message and waits for the response with the same rid.
+
+        The response is read by the `listen` reader, so it must be running. Error responses are raised as
+        `IdexDataStreamError`.
+        '''
+        # connecting fails the responses expected so far, so the response is expected once connected
+        await self._check_connection()
+
+        rid = rid or self._get_rid()
+        response = self._expect_response(rid)
+        timeout = timeout or self._REQUEST_TIMEOUT
+        try:
+            await self.send_message(request, payload, rid)
+            return await asyncio.wait_for(response, timeout, loop=self._loop)
+        except asyncio.TimeoutError:
+            raise IdexRequestTimeout(f'Response to {request!r} ({rid}) is not received within {timeout} seconds')
+        finally:
+            self._forget_request(rid)
+
+    def _expect_response(self, rid: str) -> asyncio.Future:
+        future = self._requests[rid] = self._loop.create_future()
+        return future
+
+    def _forget_request(self, rid: str):
+        self._requests.pop(rid, None)
+
+    def _resolve_request(self, message: Dict) -> bool:
+        future = self._requests.pop(message.get('rid'), None)
+        if future is None:
+            return False
+
+        if not future.done():
+            if message.get('result') == 'error':
+                self._fail_request(future, IdexDataStreamError(f'Response error: {message}'))
+            else:
+                future.set_result(message)
+        return True
+
+    def _cancel_requests(self):
+        for rid, future in self._requests.items():
+            if not future.done():
+                self._fail_request(future, IdexDataStreamError(f'Connection is reset before the response to {rid}'))
+        self._requests.clear()
+
+    @staticmethod
+    def _fail_request(future: asyncio.Future, exception: BaseException):
+        future.set_exception(exception)
+        # nobody may await the response anymore, don't log "exception was never retrieved" then
+        future.exception()
+
     def _compose_message(self, rid: str, request: str, payload: Dict):
         return dict(
             rid=rid,
@@ -87,32 +253,153 @@ class IdexDatastream:
             payload=payload
         )
 
-    async def listen(self):
+    async def listen(self, typed: bool = False):
+        '''Yields the messages, with `typed` the events are yielded as `EventMessage` with the payload models.'''
+        if self._replay is not None:
+            async for message in self._listen_replay():
+                yield self._typed(message) if typed else message
+            return
+
         await self._check_connection()
-        asyncio.create_task(self._ping_ws_task())
-        while True:
+        # messages left by a previous listen() are stale
+        self.queue = MessageQueue(self._QUEUE_SIZE, self._OVERFLOW)
+
+        tasks = [
+            asyncio.ensure_future(self._ping_ws_task(), loop=self._loop),
+            asyncio.ensure_future(self._reader_task(self.queue), loop=self._loop),
+        ]
+        if self._ROTATION_INTERVAL:
+            tasks.append(asyncio.ensure_future(self._rotation_task(self._ROTATION_INTERVAL), loop=self._loop))
+        if self.metrics is not None and self.metrics.callback is not None:
+            tasks.append(asyncio.ensure_future(self._metrics_task(), loop=self._loop))
+        try:
+            while True:
+                message = await self.queue.get()
+                yield self._typed(message) if typed else message
+        finally:
+            for task in tasks + list(self._handler_tasks):
+                task.cancel()
+
+    async def _reader_task(self, queue: MessageQueue):
+        '''Drains the socket into the queue, so a slow consumer doesn't stall the frames reading.'''
+        try:
+            while True:
+                try:
+                    # frames received by the new connection while the retired one was drained
+                    while self._backlog:
+                        await self._deliver(self._backlog.popleft(), queue)
+
+                    # 1000 and 1001 exit codes reconnect support
+                    if self._ws.closed:
+                        raise websockets.ConnectionClosed(self._ws.close_code, 'Connection is closed')
+
+                    async for msg in self._ws:
+                        await self._deliver(msg, queue)
+                except (websockets.ConnectionClosed, IdexResponseSidError) as e:
+                    self._logger.error(e)
+                    await self._reconnect()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            queue.put_exception(e)
+
+    @staticmethod
+    def _typed(message: Any) -> Any:
+        # handler results and responses are yielded as is
+        if isinstance(message, DatastreamMessage) and 'event' in message:
+            return to_event(message)
+        return message
+
+    async def _listen_replay(self):
+        '''Feeds the recorded frames through the message processing, no connection is made.'''
+        async for kind, data in self._replay.replay():
+            if kind == SID:
+                self._set_sid(data.decode() or None)
+                continue
+            if kind == RETIRED_SID:
+                self._retired_sids.append(data.decode())
+                continue
+
             try:
-                # 1000 and 1001 exit codes reconnect support
-                if self._ws.closed:
-                    raise websockets.ConnectionClosed(self._ws.close_code, 'Connection is closed')
-
-                async for msg in self._ws:
-                    self._logger.debug('New message: %s', msg)
-                    message = self._process_message(msg)
-                    if message:
-                        yield message
-            except (websockets.ConnectionClosed, IdexResponseSidError) as e:
+                message = self._process_message(data)
+            except IdexResponseSidError as e:
+                # the connection was replaced, the new sid follows
                 self._logger.error(e)
-                self._logger.warning('Reconnecting...')
-                await self.init()
-                await self.sub_manager.resubscribe()
+                continue
+
+            if asyncio.iscoroutine(message):
+                message = await message
+            if message:
+                yield message
+
+    async def _deliver(self, msg: Union[bytes, str], queue: MessageQueue):
+        self._logger.debug('New message: %s', msg)
+        if self.recorder is not None:
+            self.recorder.write(msg, FRAME)
 
-    def _process_message(self, message: str) -> Optional[Dict]:
-        decoded_msg = self._decode(message)
+        if self.metrics is None:
+            message = self._process_message(msg)
+        else:
+            started = time.perf_counter()
+            message = self._process_message(msg)
+            self.metrics.process.observe(time.perf_counter() - started)
+
+        if asyncio.iscoroutine(message):
+            await self._schedule_handler(message, queue)
+        elif message:
+            await queue.put(message)
+
+    async def _schedule_handler(self, handler: Awaitable, queue: MessageQueue):
+        '''Runs a coroutine handler in its own task, so a slow handler doesn't stall the frames reading.
+
+        The reader waits only while `handler_concurrency` handlers are running.
+        '''
+        while len(self._handler_tasks) >= self._HANDLER_CONCURRENCY:
+            await asyncio.wait(self._handler_tasks, loop=self._loop, return_when=asyncio.FIRST_COMPLETED)
+
+        task = asyncio.ensure_future(self._handler_result(handler, queue), loop=self._loop)
+        self._handler_tasks.add(task)
+        task.add_done_callback(self._handler_tasks.discard)
+
+    @staticmethod
+    async def _handler_result(handler: Awaitable, queue: MessageQueue):
+        try:
+            message = await handler
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            queue.put_exception(e)
+            return
+
+        if message:
+            await queue.put(message)
+
+    def _process_message(self, message: Union[bytes, str]) -> Optional[Any]:
+        if self.metrics is None:
+            decoded_msg = self._decode(message)
+        else:
+            started = time.perf_counter()
+            decoded_msg = self._decode(message)
+            self.metrics.decode.observe(time.perf_counter() - started)
+            # text frames are UTF-8 on the wire, only the non ASCII ones (rare, JSON escapes them) are encoded again
+            size = len(message)
+            if not isinstance(message, bytes) and not message.isascii():
+                size = len(message.encode())
+            self.metrics.count_message(decoded_msg, size)
         self._logger.debug('New message: %s', decoded_msg)
 
+        if self._seen_eids is not None and self._is_duplicate(decoded_msg):
+            return None
+
+        if self.router is not None and 'event' in decoded_msg:
+            return self._route_event(decoded_msg)
+
+        # error responses to the awaited requests are raised to the caller
+        awaited = bool(self._requests) and self._resolve_request(decoded_msg)
+
         self._check_warnings(decoded_msg)
-        self._check_errors(decoded_msg)
+        if not awaited:
+            self._check_errors(decoded_msg)
         self._check_sid(decoded_msg)
 
         if self.sub_manager.is_sub_response(decoded_msg):
@@ -120,6 +407,19 @@ class IdexDatastream:
 
         return decoded_msg
 
+    def _route_event(self, message: Dict) -> Optional[Any]:
+        '''Passes the event to its handler, the handler result is yielded by `listen`.
+
+        Events without a handler are dropped right after the sid check.
+        '''
+        self._check_sid(message)
+
+        handler = self.router.resolve(message['event'], message.get(TOPIC_FIELD))
+        if handler is None:
+            return None
+
+        return handler(message)
+
     def _check_warnings(self, message: Dict):
         '''When an upcoming change to the specification is expected, a handshake request may return a warnings property
         which can be used to alert you when an update to your integration will be required.
@@ -140,19 +440,26 @@ class IdexDatastream:
     def _check_sid(self, message: Dict):
         '''Your client should monitor the sid value with every response and immediately reconnect if not a match.'''
         sid = message['sid']
-        if sid != self._sid:
+        if sid != self._sid and sid not in self._retired_sids:
             raise IdexResponseSidError(f'Received sid {sid!r} differs from existing sid {self._sid!r}, reconnecting...')
 
     async def _shake_hand(self):
         self._set_sid(None)
         self._logger.info('Shaking hand...')
-        await self.send_message('handshake', dict(version=self._WS_VERSION, key=self._API_KEY))
+        started = time.perf_counter()
+        await self.send_message('handshake', self._handshake_payload())
         self._process_handshake_response(await self._wait_for_handshake_response())
+        if self.metrics is not None:
+            self.metrics.handshake.observe(time.perf_counter() - started)
+
+    def _handshake_payload(self) -> Dict:
+        return dict(version=self._WS_VERSION, key=self._API_KEY)
 
-    async def _wait_for_handshake_response(self) -> Dict:
+    async def _wait_for_handshake_response(self, ws: WebSocketClientProtocol = None) -> Dict:
+        ws = ws or self._ws
         try:
             logging.info('Waiting for handshake response with timeout %s seconds...', self._HANDSHAKE_TIMEOUT)
-            response = await asyncio.wait_for(self._ws.recv(), self._HANDSHAKE_TIMEOUT, loop=self._loop)
+            response = await asyncio.wait_for(ws.recv(), self._HANDSHAKE_TIMEOUT, loop=self._loop)
         except websockets.ConnectionClosed as e:
             if e.code == 1002:
                 if e.reason == 'AuthenticationFailure':
@@ -166,10 +473,120 @@ class IdexDatastream:
             return self._decode(response)
 
     def _process_handshake_response(self, message: Dict):
+        self._set_sid(self._check_handshake_response(message))
+
+    def _check_handshake_response(self, message: Dict) -> str:
         if message['result'] != 'success' or message['request'] != 'handshake':
             raise IdexHandshakeException(message)
         self._logger.info('Got handshake response: %s', message)
-        self._set_sid(message['sid'])
+        return message['sid']
+
+    async def rotate(self):
+        '''Make-before-break reconnect.
+
+        A new connection is opened, handshaked and resubscribed while the current one keeps delivering events. The
+        connections are switched once every subscription is confirmed, events received by both of them during the
+        overlap are delivered once.
+        '''
+        await self._check_connection()
+
+        async with self._rotation_lock:
+            self._logger.info('Rotating connection...')
+            self._start_dedup()
+
+            ws = await self.create_connection()
+            try:
+                sid = await self._standby_handshake(ws)
+                backlog = await self._standby_resubscribe(ws, sid)
+            except BaseException:
+                self._dedup_deadline = self._loop.time() + self._ROTATION_OVERLAP
+                await ws.close()
+                raise
+
+            self._switch_connection(ws, sid, backlog)
+
+    async def _standby_handshake(self, ws: WebSocketClientProtocol) -> str:
+        started = time.perf_counter()
+        await ws.send(self._encode(dict(rid=self._get_rid(), sid=None, request='handshake',
+                                        payload=self._handshake_payload())))
+        sid = self._check_handshake_response(await self._wait_for_handshake_response(ws))
+        if self.metrics is not None:
+            self.metrics.handshake.observe(time.perf_counter() - started)
+        return sid
+
+    async def _standby_resubscribe(self, ws: WebSocketClientProtocol, sid: str) -> List[Union[bytes, str]]:
+        '''Restores the subscriptions on the standby connection.
+
+        Returns the frames received before all the subscriptions are confirmed.
+        '''
+        pending = set()
+        for request, payload in self.sub_manager.subscription_requests():
+            rid = self._get_rid()
+            await ws.send(self._encode(dict(rid=rid, sid=sid, request=request, payload=payload)))
+            pending.add(rid)
+
+        backlog = []
+        deadline = self._loop.time() + self._ROTATION_TIMEOUT
+        while pending:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                raise IdexDataStreamError(
+                    f'Subscriptions are not confirmed within {self._ROTATION_TIMEOUT} seconds: {sorted(pending)}'
+                )
+            try:
+                frame = await asyncio.wait_for(ws.recv(), timeout, loop=self._loop)
+            except asyncio.TimeoutError:
+                continue
+
+            message = self._decode(frame)
+            if message.get('rid') not in pending:
+                backlog.append(frame)
+                continue
+
+            self._check_errors(message)
+            pending.discard(message['rid'])
+            self.sub_manager.process_sub_response(message)
+
+        return backlog
+
+    def _switch_connection(self, ws: WebSocketClientProtocol, sid: str, backlog: List[Union[bytes, str]]):
+        old_ws, old_sid = self._ws, self._sid
+
+        # frames of the retired connection still being drained are accepted
+        if old_sid is not None:
+            self._retire_sid(old_sid)
+        self._ws = ws
+        self._set_sid(sid)
+        self._backlog.extend(backlog)
+        self._dedup_deadline = self._loop.time() + self._ROTATION_OVERLAP
+
+        self._logger.info('Switched to the new connection: %s', ws)
+        asyncio.ensure_future(self._retire_connection(old_ws), loop=self._loop)
+
+    async def _retire_connection(self, ws: WebSocketClientProtocol):
+        try:
+            await ws.close()
+        except Exception as e:
+            self._logger.warning('Retired connection closing error (%s): %s', type(e).__name__, e)
+
+    def _start_dedup(self):
+        if self._seen_eids is None:
+            self._seen_eids = set()
+        self._dedup_deadline = None
+
+    def _is_duplicate(self, message: Dict) -> bool:
+        '''Drops the events delivered by both connections while they overlap.'''
+        if self._dedup_deadline is not None and self._loop.time() > self._dedup_deadline:
+            self._seen_eids = self._dedup_deadline = None
+            return False
+
+        eid = message.get('eid')
+        if eid is None:
+            return False
+        if eid in self._seen_eids:
+            return True
+        self._seen_eids.add(eid)
+        return False
 
     def _get_rid(self) -> str:
         return f'rid:{self._rid.generate()}'
@@ -179,17 +596,16 @@ class IdexDatastream:
             return
         self._logger.info('Sid changed from %r to %r', self._sid, sid)
         self._sid = sid
+        if self.recorder is not None:
+            self.recorder.write(sid or '', SID)
 
-    @staticmethod
-    def _encode(data: Dict) -> str:
-        return ujson.dumps(data)
+    def _retire_sid(self, sid: str):
+        self._retired_sids.append(sid)
+        if self.recorder is not None:
+            self.recorder.write(sid, RETIRED_SID)
 
-    @staticmethod
-    def _decode(data: str) -> Dict:
-        decoded_msg = ujson.loads(data)
+    def _encode(self, data: Dict) -> str:
+        return self._codec.dumps(data)
 
-        for field in ('payload', 'warnings'):
-            if field in decoded_msg and isinstance(decoded_msg[field], str):
-                decoded_msg[field] = ujson.loads(decoded_msg[field])
-
-        return decoded_msg
+    def _decode(self, data: Union[bytes, str]) -> DatastreamMessage:
+        return DatastreamMessage(self._codec.loads(data), self._codec.loads)
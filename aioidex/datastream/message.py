@@ -0,0 +1,52 @@
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator
+
+# field of the topic (market, account or chain) of the event messages
+TOPIC_FIELD = 'room'
+
+
+class DatastreamMessage(Mapping):
+    '''Read-only view of a decoded datastream message.
+
+    The envelope (`sid`, `event`, `request`, `result`, ...) is decoded eagerly, the nested JSON encoded fields
+    (`payload`, `warnings`) are decoded on the first access only, so messages dropped by the router or by a consumer
+    never pay for the nested decoding.
+    '''
+    __slots__ = ('_data', '_loads', '_decoded')
+
+    _LAZY_FIELDS = frozenset(('payload', 'warnings'))
+
+    def __init__(self, data: Dict, loads: Callable[[str], Any]):
+        self._data = data
+        self._loads = loads
+        self._decoded = set()
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._data[key]
+        if key in self._LAZY_FIELDS and key not in self._decoded:
+            if isinstance(value, str):
+                value = self._data[key] = self._loads(value)
+            self._decoded.add(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # the envelope fields are read straight from the dict, bypassing `Mapping.get`
+        if key in self._LAZY_FIELDS:
+            return self[key] if key in self._data else default
+        return self._data.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self._data!r})'
+
+    def is_decoded(self, key: str) -> bool:
+        '''Whether the lazy field has been decoded already (always true for the envelope fields).'''
+        return key not in self._LAZY_FIELDS or key in self._decoded or not isinstance(self._data.get(key), str)
@@ -0,0 +1,137 @@
+import time
+from collections import defaultdict
+from typing import Dict, Tuple, Callable, Any, Optional, Mapping
+
+from aioidex.datastream.message import TOPIC_FIELD
+from aioidex.histogram import FAST_BUCKETS, SLOW_BUCKETS, Histogram
+
+_TIME_FIELDS = ('timestamp', 'createdAt', 'updatedAt')
+
+
+class DatastreamMetrics:
+    '''Datastream instrumentation, cheap enough to be left on.
+
+    Counts messages and bytes per event (or response request) and topic, observes decode, processing, handshake, ping
+    RTT and reconnect downtime durations. The lag between the server event time and the receive time is estimated
+    from the timestamp of every `lag_sample`-th event payload.
+
+    Snapshots are exported with `snapshot()` or `prometheus()`, or passed to `callback` every `interval` seconds while
+    the datastream is listened to.
+    '''
+
+    def __init__(
+            self,
+            callback: Callable[[Dict[str, Any]], Any] = None,
+            interval: float = 60.0,
+            lag_sample: int = 100,
+            prefix: str = 'aioidex_datastream'
+    ):
+        self.callback = callback
+        self.interval = interval
+        self._LAG_SAMPLE = lag_sample
+        self._PREFIX = prefix
+
+        self.messages: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.bytes: Dict[Tuple[str, str], int] = defaultdict(int)
+
+        self.decode = Histogram(FAST_BUCKETS)
+        self.process = Histogram(FAST_BUCKETS)
+        self.handshake = Histogram(SLOW_BUCKETS)
+        self.ping_rtt = Histogram(SLOW_BUCKETS)
+        self.lag = Histogram(SLOW_BUCKETS)
+
+        self.reconnect_count = 0
+        self.downtime = 0.0
+        self.last_message_at: Optional[float] = None
+        # last frame or pong received, the connection may be lost since then
+        self.alive_at: Optional[float] = None
+
+        self._events = 0
+
+    def count_message(self, message: Mapping, size: int):
+        event = message.get('event')
+        key = event or message.get('request') or 'unknown', message.get(TOPIC_FIELD) or ''
+        self.messages[key] += 1
+        self.bytes[key] += size
+        self.last_message_at = self.alive_at = time.time()
+
+        if event is not None and self._LAG_SAMPLE:
+            self._events += 1
+            if not self._events % self._LAG_SAMPLE:
+                self._observe_lag(message)
+
+    def observe_reconnect(self, downtime: float):
+        self.reconnect_count += 1
+        self.downtime += downtime
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(
+            messages={f'{e}:{t}' if t else e: n for (e, t), n in self.messages.items()},
+            bytes={f'{e}:{t}' if t else e: n for (e, t), n in self.bytes.items()},
+            decode_seconds=self.decode.snapshot(),
+            process_seconds=self.process.snapshot(),
+            handshake_seconds=self.handshake.snapshot(),
+            ping_rtt_seconds=self.ping_rtt.snapshot(),
+            lag_seconds=self.lag.snapshot(),
+            reconnects=self.reconnect_count,
+            downtime_seconds=self.downtime,
+            last_message_at=self.last_message_at,
+        )
+
+    def prometheus(self) -> str:
+        '''Snapshot in the Prometheus text exposition format.'''
+        p = self._PREFIX
+        lines = []
+
+        for name, values in (('messages_total', self.messages), ('bytes_total', self.bytes)):
+            lines.append(f'# TYPE {p}_{name} counter')
+            for (event, topic), value in values.items():
+                lines.append(f'{p}_{name}{{event="{_escape(event)}",topic="{_escape(topic)}"}} {value}')
+
+        for name, histogram in (
+                ('decode_seconds', self.decode),
+                ('process_seconds', self.process),
+                ('handshake_seconds', self.handshake),
+                ('ping_rtt_seconds', self.ping_rtt),
+                ('lag_seconds', self.lag),
+        ):
+            lines.append(f'# TYPE {p}_{name} histogram')
+            for bound, count in histogram.cumulative():
+                lines.append(f'{p}_{name}_bucket{{le="{bound}"}} {count}')
+            lines.append(f'{p}_{name}_sum {histogram.sum}')
+            lines.append(f'{p}_{name}_count {histogram.count}')
+
+        lines.append(f'# TYPE {p}_reconnects_total counter')
+        lines.append(f'{p}_reconnects_total {self.reconnect_count}')
+        lines.append(f'# TYPE {p}_downtime_seconds_total counter')
+        lines.append(f'{p}_downtime_seconds_total {self.downtime}')
+        return '\n'.join(lines) + '\n'
+
+    def _observe_lag(self, message: Mapping):
+        # the payload decoded here is cached by the message, handlers don't decode it again
+        event_time = _event_time(message.get('payload'))
+        if event_time is not None:
+            self.lag.observe(max(0.0, time.time() - event_time))
+
+
+def _event_time(payload: Any) -> Optional[float]:
+    '''Timestamp (seconds) of the payload or of its first item, in seconds or milliseconds.'''
+    if not isinstance(payload, dict):
+        return None
+
+    candidates = [payload] + [v[0] for v in payload.values() if isinstance(v, list) and v and isinstance(v[0], dict)]
+    for item in candidates:
+        for field in _TIME_FIELDS:
+            value = item.get(field)
+            if value is None:
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            return value / 1000 if value > 1e11 else value
+    return None
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
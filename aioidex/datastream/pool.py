@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import zlib
+from asyncio import AbstractEventLoop
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Iterable
+
+from aioidex.datastream.datastream import IdexDatastream
+from aioidex.types.subscriptions import Subscription, Category
+
+
+class IdexDatastreamPool:
+    '''Shards datastream subscriptions across several connections.
+
+    Every topic (market, account address or chain) is bound to one of the `size` connections by a stable hash of its
+    name. Every connection has its own handshake, `SubscriptionManager` and reconnect cycle, so a reconnect blacks out
+    only the topics of one shard. Messages of all the connections are merged into the single `listen` stream.
+    '''
+
+    def __init__(
+            self,
+            size: int = 2,
+            queue_size: int = 1000,
+            loop: AbstractEventLoop = None,
+            **datastream_kwargs
+    ):
+        if size < 1:
+            raise ValueError('Pool size must be positive')
+
+        self._loop = loop or asyncio.get_event_loop()
+        self._logger = logging.getLogger(__name__)
+        self._queue_size = queue_size
+
+        self.datastreams: List[IdexDatastream] = [
+            IdexDatastream(loop=self._loop, **datastream_kwargs) for _ in range(size)
+        ]
+
+    def __len__(self):
+        return len(self.datastreams)
+
+    def shard(self, topic: str) -> int:
+        return zlib.crc32(topic.encode()) % len(self.datastreams)
+
+    def datastream_for(self, topic: str) -> IdexDatastream:
+        return self.datastreams[self.shard(topic)]
+
+    async def init(self):
+        await asyncio.gather(*(ds.init() for ds in self.datastreams))
+
+    def on_reconnect(self, callback: Callable[[IdexDatastream], Any]):
+        '''Calls `callback(datastream)` every time a lost connection of a shard is restored.'''
+        for ds in self.datastreams:
+            ds.on_reconnect(callback)
+
+    async def subscribe(self, subscription: Subscription) -> List[str]:
+        '''Splits the subscription topics between the shards, replaces the category subscriptions of every shard.'''
+        shard_topics = self._split(subscription.topics)
+
+        rids = []
+        for i, ds in enumerate(self.datastreams):
+            topics = shard_topics.get(i)
+            if topics:
+                rids.append(
+                    await ds.sub_manager.subscribe(Subscription(subscription.category, subscription.events, topics))
+                )
+            elif subscription.category in ds.sub_manager.subscriptions:
+                rids.append(await ds.sub_manager.clear(subscription.category))
+        return rids
+
+    async def unsubscribe(self, category: Category, topics: List[str]) -> List[str]:
+        return [
+            await self.datastreams[i].sub_manager.unsubscribe(category, shard_topics)
+            for i, shard_topics in self._split(topics).items()
+        ]
+
+    async def clear(self, category: Category) -> List[str]:
+        return [await ds.sub_manager.clear(category) for ds in self.datastreams]
+
+    @property
+    def subscriptions(self) -> Dict[Category, List[Subscription]]:
+        result = defaultdict(list)
+        for ds in self.datastreams:
+            for category, sub in ds.sub_manager.subscriptions.items():
+                result[category].append(sub)
+        return dict(result)
+
+    async def listen(self, typed: bool = False):
+        queue = asyncio.Queue(self._queue_size)
+        tasks = [asyncio.ensure_future(self._pump(ds, queue, typed), loop=self._loop) for ds in self.datastreams]
+        try:
+            while True:
+                message = await queue.get()
+                if isinstance(message, _PumpError):
+                    raise message.exception
+                yield message
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    async def _pump(ds: IdexDatastream, queue: asyncio.Queue, typed: bool = False):
+        try:
+            async for message in ds.listen(typed):
+                await queue.put(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(_PumpError(e))
+
+    def _split(self, topics: Iterable[str]) -> Dict[int, List[str]]:
+        result = defaultdict(list)
+        for topic in topics:
+            result[self.shard(topic)].append(topic)
+        return dict(result)
+
+
+class _PumpError:
+    __slots__ = ('exception',)
+
+    def __init__(self, exception: Exception):
+        self.exception = exception
+
+    def __repr__(self):
+        return f'_PumpError({self.exception!r})'
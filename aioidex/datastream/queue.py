@@ -0,0 +1,132 @@
+import asyncio
+from collections import deque, OrderedDict
+from collections.abc import Mapping
+from enum import Enum
+from typing import Any, Dict, Hashable, Optional
+
+from aioidex.datastream.message import TOPIC_FIELD
+
+
+class OverflowPolicy(Enum):
+    # the oldest queued message is dropped to free space for the new one
+    DROP_OLDEST = 'drop_oldest'
+
+    # the reader waits for the consumer, the socket is not drained meanwhile
+    BLOCK = 'block'
+
+    # the new message is dropped
+    DROP_NEWEST = 'drop_newest'
+
+    # a queued event is replaced by the newer one of the same event type and topic, keeping its place in the queue;
+    # the oldest message is dropped if the queue is full anyway
+    CONFLATE = 'conflate'
+
+
+class MessageQueue:
+    '''Bounded queue between the socket reader task and the `listen` consumer.'''
+
+    def __init__(self, maxsize: int = 1000, overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST):
+        if maxsize < 1:
+            raise ValueError('Queue size must be positive')
+
+        self.maxsize = maxsize
+        self.overflow = OverflowPolicy(overflow)
+
+        self._items = OrderedDict() if self.overflow is OverflowPolicy.CONFLATE else deque()
+        self._exception: Optional[BaseException] = None
+
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+
+        self.put_count = 0
+        self.get_count = 0
+        self.dropped_count = 0
+        self.conflated_count = 0
+        self.blocked_count = 0
+        self.max_depth = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def full(self) -> bool:
+        return len(self._items) >= self.maxsize
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            depth=len(self._items),
+            max_depth=self.max_depth,
+            maxsize=self.maxsize,
+            overflow=self.overflow.value,
+            put=self.put_count,
+            got=self.get_count,
+            dropped=self.dropped_count,
+            conflated=self.conflated_count,
+            blocked=self.blocked_count,
+        )
+
+    async def put(self, message: Any) -> bool:
+        '''Returns False if the message has been dropped.'''
+        self.put_count += 1
+
+        if self.overflow is OverflowPolicy.CONFLATE:
+            self._put_conflated(message)
+        elif not self.full():
+            self._items.append(message)
+        elif self.overflow is OverflowPolicy.BLOCK:
+            self.blocked_count += 1
+            while self.full():
+                self._not_full.clear()
+                await self._not_full.wait()
+            self._items.append(message)
+        elif self.overflow is OverflowPolicy.DROP_OLDEST:
+            self._items.popleft()
+            self.dropped_count += 1
+            self._items.append(message)
+        else:
+            self.dropped_count += 1
+            return False
+
+        self.max_depth = max(self.max_depth, len(self._items))
+        self._not_empty.set()
+        return True
+
+    def put_exception(self, exception: BaseException):
+        '''The exception is raised by `get` as soon as the queued messages are consumed.'''
+        self._exception = exception
+        self._not_empty.set()
+
+    async def get(self) -> Any:
+        while not self._items:
+            if self._exception is not None:
+                exception, self._exception = self._exception, None
+                raise exception
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+        if self.overflow is OverflowPolicy.CONFLATE:
+            _, message = self._items.popitem(last=False)
+        else:
+            message = self._items.popleft()
+
+        self.get_count += 1
+        self._not_full.set()
+        return message
+
+    def _put_conflated(self, message: Any):
+        key = self._conflation_key(message)
+        if key in self._items:
+            self._items[key] = message
+            self.conflated_count += 1
+            return
+
+        if self.full():
+            self._items.popitem(last=False)
+            self.dropped_count += 1
+        self._items[key] = message
+
+    def _conflation_key(self, message: Any) -> Hashable:
+        if isinstance(message, Mapping) and 'event' in message:
+            return message['event'], message.get(TOPIC_FIELD)
+        # not an event, never conflated
+        return object()
@@ -0,0 +1,158 @@
+import asyncio
+import glob
+import gzip
+import logging
+import mmap
+import os
+import re
+import struct
+import time
+from typing import Union, Iterator, Tuple, List, AsyncIterator, Optional
+
+# record kinds
+FRAME = 0
+SID = 1
+RETIRED_SID = 2
+
+# receive timestamp, kind, data length
+_HEADER = struct.Struct('<dBI')
+
+Record = Tuple[float, int, bytes]
+
+
+class FrameRecorder:
+    '''Append-only log of the raw datastream frames with their receive timestamps.
+
+    The log is split into the numbered segments of about `segment_size` bytes, optionally gzip compressed. A new
+    recorder never touches the existing segments of the same prefix, it starts the next one.
+    '''
+
+    def __init__(
+            self,
+            directory: str,
+            prefix: str = 'frames',
+            segment_size: int = 64 * 1024 * 1024,
+            compress: bool = False,
+            compress_level: int = 1
+    ):
+        self.directory = directory
+        self.prefix = prefix
+        self._SEGMENT_SIZE = segment_size
+        self._COMPRESS = compress
+        self._COMPRESS_LEVEL = compress_level
+
+        os.makedirs(directory, exist_ok=True)
+        self._index = max((index for index, _ in _segments(directory, prefix)), default=-1)
+        self._file = None
+        self._written = 0
+
+        self.record_count = 0
+
+        self._logger = logging.getLogger(__name__)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def segment(self) -> Optional[str]:
+        return self._file.name if self._file is not None else None
+
+    def write(self, data: Union[bytes, str], kind: int = FRAME, timestamp: float = None):
+        if isinstance(data, str):
+            data = data.encode()
+        if self._file is None or self._written >= self._SEGMENT_SIZE:
+            self._next_segment()
+
+        self._file.write(_HEADER.pack(timestamp or time.time(), kind, len(data)))
+        self._file.write(data)
+        self._written += _HEADER.size + len(data)
+        self.record_count += 1
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _next_segment(self):
+        self.close()
+        self._index += 1
+        path = os.path.join(self.directory, f'{self.prefix}-{self._index:06d}.frames')
+        if self._COMPRESS:
+            self._file = gzip.open(path + '.gz', 'xb', compresslevel=self._COMPRESS_LEVEL)
+        else:
+            self._file = open(path, 'xb')
+        self._written = 0
+        self._logger.info('Recording frames to %s', path)
+
+
+class FrameReplay:
+    '''Reads the segments written by `FrameRecorder`.
+
+    Plain segments are memory-mapped, compressed ones are decompressed whole. With `speed` the records are replayed
+    at the recorded pace (`speed` times faster), otherwise as fast as possible.
+    '''
+    # let the other tasks run while replaying as fast as possible
+    _YIELD_EVERY = 1000
+
+    def __init__(self, directory: str, prefix: str = 'frames', speed: float = None):
+        self.segments: List[str] = [path for _, path in _segments(directory, prefix)]
+        self._SPEED = speed
+
+        self._logger = logging.getLogger(__name__)
+
+    def records(self) -> Iterator[Record]:
+        for path in self.segments:
+            if not os.path.getsize(path):
+                continue
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                data = gzip.decompress(mm) if path.endswith('.gz') else mm
+                yield from self._parse(data, path)
+
+    async def replay(self) -> AsyncIterator[Tuple[int, bytes]]:
+        loop = asyncio.get_event_loop()
+        started = first = None
+
+        for count, (timestamp, kind, data) in enumerate(self.records(), 1):
+            if self._SPEED:
+                if first is None:
+                    started, first = loop.time(), timestamp
+                delay = (timestamp - first) / self._SPEED - (loop.time() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif not count % self._YIELD_EVERY:
+                await asyncio.sleep(0)
+
+            yield kind, data
+
+    def _parse(self, data: Union[bytes, mmap.mmap], path: str) -> Iterator[Record]:
+        unpack, header_size = _HEADER.unpack_from, _HEADER.size
+        offset, end = 0, len(data)
+        while offset + header_size <= end:
+            timestamp, kind, length = unpack(data, offset)
+            offset += header_size
+            if offset + length > end:
+                offset -= header_size
+                break
+            yield timestamp, kind, data[offset:offset + length]
+            offset += length
+
+        if offset < end:
+            # the recorder was interrupted in the middle of a record
+            self._logger.warning('Truncated record at the end of %s', path)
+
+
+def _segments(directory: str, prefix: str) -> List[Tuple[int, str]]:
+    pattern = re.compile(re.escape(prefix) + r'-(\d+)\.frames(\.gz)?$')
+    found = []
+    for path in glob.glob(os.path.join(glob.escape(directory), f'{glob.escape(prefix)}-*.frames*')):
+        match = pattern.search(os.path.basename(path))
+        if match:
+            found.append((int(match.group(1)), path))
+    return sorted(found)
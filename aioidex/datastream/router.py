@@ -0,0 +1,61 @@
+from enum import Enum
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+Handler = Callable[[Dict], Any]
+EventType = Union[Enum, str]
+
+
+class EventRouter:
+    '''Dispatches datastream events to handlers registered per event type and, optionally, per topic.
+
+    Topic specific handlers take precedence over the event wide ones. Events without a handler are dropped by the
+    datastream before any further processing.
+    '''
+
+    def __init__(self):
+        self._routes: Dict[str, Handler] = {}
+        self._topic_routes: Dict[Tuple[str, str], Handler] = {}
+
+    def __len__(self):
+        return len(self._routes) + len(self._topic_routes)
+
+    def __contains__(self, event: EventType) -> bool:
+        event = self._event_value(event)
+        return event in self._routes or any(e == event for e, _ in self._topic_routes)
+
+    def add(self, event: EventType, handler: Handler, topic: str = None):
+        if not callable(handler):
+            raise TypeError(f'Handler must be callable, got {handler!r}')
+
+        event = self._event_value(event)
+        if topic is None:
+            self._routes[event] = handler
+        else:
+            self._topic_routes[(event, topic)] = handler
+
+    def route(self, event: EventType, topic: str = None) -> Callable[[Handler], Handler]:
+        '''Decorator version of `add`.'''
+
+        def decorator(handler: Handler) -> Handler:
+            self.add(event, handler, topic)
+            return handler
+
+        return decorator
+
+    def remove(self, event: EventType, topic: str = None):
+        event = self._event_value(event)
+        if topic is None:
+            self._routes.pop(event, None)
+        else:
+            self._topic_routes.pop((event, topic), None)
+
+    def resolve(self, event: str, topic: str = None) -> Optional[Handler]:
+        if self._topic_routes:
+            handler = self._topic_routes.get((event, topic))
+            if handler is not None:
+                return handler
+        return self._routes.get(event)
+
+    @staticmethod
+    def _event_value(event: EventType) -> str:
+        return event.value if isinstance(event, Enum) else event
@@ -1,7 +1,9 @@
 from __future__ import annotations  # PEP 563
 
+import asyncio
 import logging
-from typing import Dict, List, Iterable
+import time
+from typing import Dict, List, Iterable, Tuple, Optional, Union
 from typing import TYPE_CHECKING
 
 from aioidex.types.subscriptions import Subscription, Category, Action
@@ -15,15 +17,27 @@ class SubscriptionManager:
     _CATEGORY_VALUES = set(_.value for _ in Category)
     subscriptions: Dict[Category, Subscription]
 
-    def __init__(self, datastream: IdexDatastream, return_responses: bool):
+    def __init__(self, datastream: IdexDatastream, return_responses: bool, resubscribe_timeout: float = 5.0):
         self._init_subscriptions()
 
         self._ds = datastream
         self._return_responses = return_responses
+        self._RESUBSCRIBE_TIMEOUT = resubscribe_timeout
+
+        self._recovery: Optional[asyncio.Future] = None
+        self._recovery_rids: List[str] = []
+        self.recovery_time: Optional[float] = None
 
         self._logger = logging.getLogger(__name__)
 
-    async def subscribe(self, subscription: Subscription, rid: str = None) -> str:
+    async def subscribe(
+            self,
+            subscription: Subscription,
+            rid: str = None,
+            wait: bool = False,
+            timeout: float = None
+    ) -> Union[str, Tuple[str]]:
+        '''Returns the request rid, or the confirmed topics with `wait` (requires running `listen`).'''
         self._logger.info('Sending subscribe request: %s', subscription)
         if subscription.category in self.subscriptions:
             self._logger.warning(
@@ -32,26 +46,141 @@ class SubscriptionManager:
                 subscription.category,
                 self.subscriptions[subscription.category]
             )
-        return await self._ds.send_message(
-            subscription.category.value,
+        return await self._send(
+            subscription.category,
             self._sub_payload(Action.SUBSCRIBE, topics=subscription.topics, events=subscription.events),
-            rid
+            rid,
+            wait,
+            timeout
+        )
+
+    async def get(
+            self,
+            category: Category,
+            rid: str = None,
+            wait: bool = False,
+            timeout: float = None
+    ) -> Union[str, Tuple[str]]:
+        return await self._send(category, self._sub_payload(Action.GET), rid, wait, timeout)
+
+    async def unsubscribe(
+            self,
+            category: Category,
+            topics: List[str],
+            rid: str = None,
+            wait: bool = False,
+            timeout: float = None
+    ) -> Union[str, Tuple[str]]:
+        return await self._send(category, self._sub_payload(Action.UNSUBSCRIBE, topics), rid, wait, timeout)
+
+    async def clear(
+            self,
+            category: Category,
+            rid: str = None,
+            wait: bool = False,
+            timeout: float = None
+    ) -> Union[str, Tuple[str]]:
+        return await self._send(category, self._sub_payload(Action.CLEAR), rid, wait, timeout)
+
+    async def _send(
+            self,
+            category: Category,
+            payload: Dict,
+            rid: str = None,
+            wait: bool = False,
+            timeout: float = None
+    ) -> Union[str, Tuple[str]]:
+        if not wait:
+            return await self._ds.send_message(category.value, payload, rid)
+
+        response = await self._ds.request(category.value, payload, rid, timeout)
+        return tuple(sorted(response['payload'].get('topics', ())))
+
+    def subscription_requests(self) -> List[Tuple[str, Dict]]:
+        '''Requests (request name and payload) restoring the current subscriptions on a new connection.'''
+        return [
+            (sub.category.value, self._sub_payload(Action.SUBSCRIBE, topics=sub.topics, events=sub.events))
+            for sub in self.subscriptions.values()
+        ]
+
+    async def resubscribe(self, wait: bool = True, timeout: float = None) -> Optional[float]:
+        '''Restores the subscriptions of every category after a reconnect.
+
+        All the subscribe requests are sent at once, then their confirmations are gathered. With `wait` returns once
+        every request is confirmed or the timeout expires. Returns the recovery time in seconds, None if not all of the
+        subscriptions are confirmed or `wait` is false (see `wait_recovered`).
+        '''
+        subs = list(self.subscriptions.values())
+        self._init_subscriptions()
+        self._cancel_recovery()
+
+        started = time.monotonic()
+        confirmations = {self._ds._get_rid(): sub for sub in subs}
+        self._recovery_rids = list(confirmations)
+        self._recovery = asyncio.ensure_future(
+            self._wait_confirmations(
+                {rid: self._ds._expect_response(rid) for rid in confirmations},
+                started,
+                timeout or self._RESUBSCRIBE_TIMEOUT
+            ),
+            loop=self._ds._loop
         )
 
-    async def get(self, category: Category, rid: str = None) -> str:
-        return await self._ds.send_message(category.value, self._sub_payload(Action.GET), rid)
+        await asyncio.gather(*(self.subscribe(sub, rid) for rid, sub in confirmations.items()), loop=self._ds._loop)
+        if wait:
+            return await self.wait_recovered()
+
+    async def wait_recovered(self) -> Optional[float]:
+        '''Waits for the last resubscribe to finish, returns its recovery time.'''
+        while self._recovery is not None:
+            recovery = self._recovery
+            try:
+                return await asyncio.shield(recovery)
+            except asyncio.CancelledError:
+                # a newer resubscribe replaced the awaited one, wait for it instead
+                if not recovery.cancelled() or recovery is self._recovery:
+                    raise
+        return self.recovery_time
+
+    async def _wait_confirmations(
+            self,
+            confirmations: Dict[str, asyncio.Future],
+            started: float,
+            timeout: float
+    ) -> Optional[float]:
+        if confirmations:
+            await asyncio.wait(list(confirmations.values()), timeout=timeout)
+
+        for rid in confirmations:
+            self._ds._forget_request(rid)
+
+        unconfirmed = [rid for rid, f in confirmations.items() if not self._is_confirmed(f)]
+        if unconfirmed:
+            self._logger.error(
+                'Resubscribe is not confirmed within %s seconds, rids: %s', timeout, ', '.join(unconfirmed)
+            )
+            return None
 
-    async def unsubscribe(self, category: Category, topics: List[str], rid: str = None) -> str:
-        return await self._ds.send_message(category.value, self._sub_payload(Action.UNSUBSCRIBE, topics), rid)
+        self.recovery_time = time.monotonic() - started
+        self._logger.info('Resubscribed to %s categories in %.3f seconds', len(confirmations), self.recovery_time)
+        return self.recovery_time
 
-    async def clear(self, category: Category, rid: str = None) -> str:
-        return await self._ds.send_message(category.value, self._sub_payload(Action.CLEAR), rid)
+    def _cancel_recovery(self):
+        if self._recovery is not None and not self._recovery.done():
+            self._recovery.cancel()
+        # the abandoned confirmations would never be forgotten otherwise
+        for rid in self._recovery_rids:
+            self._ds._forget_request(rid)
+        self._recovery_rids = []
 
-    async def resubscribe(self):
-        subs = self.subscriptions.values()
-        self._init_subscriptions()
-        for sub in subs:
-            await self.subscribe(sub)
+    @staticmethod
+    def _is_confirmed(response: asyncio.Future) -> bool:
+        return (
+                response.done()
+                and not response.cancelled()
+                and response.exception() is None
+                and response.result()['result'] == 'success'
+        )
 
     def is_sub_response(self, response: Dict) -> bool:
         return response.get('request') in self._CATEGORY_VALUES
@@ -60,14 +189,14 @@ class SubscriptionManager:
         self._logger.debug('Subscription response: %s', message)
 
         success = message['result'] == 'success'
-        category = Category(message['request'])
-        payload = message['payload']
-        action = payload['action']
-
         if not success:
             self._logger.error('Subscription error: %s', message)  # raise an exception?
             return
 
+        category = Category(message['request'])
+        payload = message['payload']
+        action = payload['action']
+
         handler = {
             'subscribe': self._process_subscribe_action_response,
             'get': self._process_get_action_response,
@@ -26,6 +26,10 @@ class IdexResponseSidError(IdexDataStreamException):
     pass
 
 
+class IdexRequestTimeout(IdexDataStreamException):
+    pass
+
+
 # HTTP API
 class IdexClientException(Exception):
     pass
@@ -42,3 +46,22 @@ class IdexClientContentTypeError(IdexClientException):
 
     def __str__(self):
         return f'[{self.status}] {self.content!r}'
+
+
+class IdexClientStatusError(IdexClientException):
+    def __init__(self, status, content, retry_after=None):
+        self.status = status
+        self.content = content
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return f'[{self.status}] {self.content!r}'
+
+
+class IdexClientCircuitOpenError(IdexClientException):
+    def __init__(self, host, retry_in):
+        self.host = host
+        self.retry_in = retry_in
+
+    def __str__(self):
+        return f'Circuit open for {self.host}, retry in {self.retry_in:.1f}s'
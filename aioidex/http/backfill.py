@@ -0,0 +1,177 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from aioidex.http.modules.public import Public
+
+
+def _trade_key(trade: Dict) -> Tuple:
+    return trade.get('timestamp', 0), trade.get('tid', 0)
+
+
+class TradeBackfill:
+    '''Backfill of the trade history of many markets between `start` and `end` (seconds).
+
+    The range is split into `shard_size` seconds slots, every (slot, market) shard follows its own cursor chain and up
+    to `concurrency` shards are fetched at once, at most `ahead` slots ahead of the one being yielded. Trades are
+    yielded as `(market, trade)` in (timestamp, tid) order, deduplicated by market and tid.
+
+    With `checkpoint` (a file path) the end of every yielded slot is saved, an interrupted backfill started again with
+    the same parameters resumes from the first slot not fully yielded, so the trades of that slot can be yielded twice.
+    '''
+
+    def __init__(
+            self,
+            public: Public,
+            markets: Iterable[str],
+            start: int,
+            end: int,
+            shard_size: int = 86400,
+            concurrency: int = 8,
+            ahead: int = 1,
+            page_size: int = 100,
+            checkpoint: str = None
+    ):
+        if start >= end:
+            raise ValueError('start must be before end')
+        if shard_size <= 0:
+            raise ValueError('shard_size must be positive')
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1')
+
+        self._public = public
+        self._MARKETS = list(dict.fromkeys(markets))
+        self._START = start
+        self._END = end
+        self._SHARD_SIZE = shard_size
+        self._CONCURRENCY = concurrency
+        self._AHEAD = ahead
+        self._PAGE_SIZE = page_size
+        self._CHECKPOINT = checkpoint
+
+        self.done_until = start
+        self.shard_count = 0
+        self.trade_count = 0
+        self.duplicate_count = 0
+
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def stats(self) -> Dict:
+        return dict(
+            done_until=self.done_until,
+            shards=self.shard_count,
+            trades=self.trade_count,
+            duplicates=self.duplicate_count,
+        )
+
+    def slots(self, start: int = None) -> List[Tuple[int, int]]:
+        start = self._START if start is None else start
+        return [(s, min(s + self._SHARD_SIZE, self._END)) for s in range(start, self._END, self._SHARD_SIZE)]
+
+    async def trades(self) -> AsyncIterator[Tuple[str, Dict]]:
+        self.done_until = self._load_checkpoint()
+        slots = self.slots(self.done_until)
+        if not slots:
+            return
+
+        jobs = iter([(i, market) for i in range(len(slots)) for market in self._MARKETS])
+        results: List[Optional[Dict[str, List[Dict]]]] = [{} for _ in slots]
+        errors: List[BaseException] = []
+        progress = asyncio.Condition()
+        current = 0
+
+        async def worker():
+            for i, market in jobs:
+                async with progress:
+                    await progress.wait_for(lambda: i <= current + self._AHEAD)
+                try:
+                    trades = await self._fetch_shard(market, *slots[i])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    errors.append(e)
+                    trades = None
+                async with progress:
+                    if trades is not None:
+                        results[i][market] = trades
+                    progress.notify_all()
+                if errors:
+                    return
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self._CONCURRENCY)]
+        seen = set()
+        try:
+            for current in range(len(slots)):
+                async with progress:
+                    progress.notify_all()
+                    await progress.wait_for(lambda: errors or len(results[current]) == len(self._MARKETS))
+                if errors:
+                    raise errors[0]
+
+                shard_trades = results[current]
+                results[current] = None
+                previous, seen = seen, set()
+                for market, trade in heapq.merge(
+                        *([(market, t) for t in trades] for market, trades in shard_trades.items()),
+                        key=lambda item: _trade_key(item[1])
+                ):
+                    key = market, trade.get('tid')
+                    if key in seen or key in previous:
+                        self.duplicate_count += 1
+                        continue
+                    seen.add(key)
+                    self.trade_count += 1
+                    yield market, trade
+
+                self.done_until = slots[current][1]
+                self._save_checkpoint()
+        finally:
+            for w in workers:
+                w.cancel()
+
+    async def _fetch_shard(self, market: str, start: int, end: int) -> List[Dict]:
+        # the API range is inclusive, the shards don't overlap but the last one
+        trades = [
+            t async for t in self._public.iter_trade_history(
+                market,
+                start=start,
+                end=end - 1 if end < self._END else end,
+                sort='asc',
+                page_size=self._PAGE_SIZE,
+                # a prefetched page would be one more request in flight per worker
+                prefetch=False
+            )
+        ]
+        trades.sort(key=_trade_key)
+        self.shard_count += 1
+        self._logger.debug('Backfilled %s [%s, %s): %s trades', market, start, end, len(trades))
+        return trades
+
+    def _params(self) -> Dict:
+        return dict(markets=self._MARKETS, start=self._START, end=self._END, shard_size=self._SHARD_SIZE)
+
+    def _load_checkpoint(self) -> int:
+        if not self._CHECKPOINT or not os.path.exists(self._CHECKPOINT):
+            return self._START
+
+        with open(self._CHECKPOINT) as f:
+            state = json.load(f)
+
+        if {k: state.get(k) for k in self._params()} != self._params():
+            raise ValueError(f'Checkpoint {self._CHECKPOINT} was saved by a backfill with other parameters')
+
+        self._logger.info('Resuming the backfill from %s', state['done_until'])
+        return state['done_until']
+
+    def _save_checkpoint(self):
+        if not self._CHECKPOINT:
+            return
+
+        tmp = f'{self._CHECKPOINT}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(dict(self._params(), done_until=self.done_until), f)
+        os.replace(tmp, self._CHECKPOINT)
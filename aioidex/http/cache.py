@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# seconds, endpoints missing here are cached for `default_ttl`
+DEFAULT_TTLS = {
+    'returnCurrencies': 300,
+    'returnContractAddress': 3600,
+    'return24Volume': 30,
+}
+
+CacheKey = Tuple[str, Hashable]
+
+
+class ResponseCache:
+    '''TTL + LRU cache of the HTTP responses, keyed by the endpoint and the filtered params.
+
+    An expired response is still returned during `stale_while_revalidate` seconds after the expiration while it is
+    refreshed in background. Cached responses are shared between the callers and must not be mutated.
+    '''
+
+    def __init__(
+            self,
+            maxsize: int = 1024,
+            ttls: Dict[str, float] = None,
+            default_ttl: float = None,
+            stale_while_revalidate: float = 0
+    ):
+        self._MAXSIZE = maxsize
+        self._TTLS = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self._DEFAULT_TTL = default_ttl
+        self._STALE_WHILE_REVALIDATE = stale_while_revalidate
+
+        # key -> (response, fetch time)
+        self._entries: 'OrderedDict[CacheKey, Tuple[Any, float]]' = OrderedDict()
+        self._revalidations: Dict[CacheKey, asyncio.Future] = {}
+
+        self.hit_count = 0
+        self.stale_hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+        self.revalidation_error_count = 0
+
+        self._logger = logging.getLogger(__name__)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hit_count + self.stale_hit_count + self.miss_count
+        return dict(
+            size=len(self._entries),
+            hits=self.hit_count,
+            stale_hits=self.stale_hit_count,
+            misses=self.miss_count,
+            hit_ratio=(self.hit_count + self.stale_hit_count) / lookups if lookups else None,
+            evictions=self.eviction_count,
+            revalidating=len(self._revalidations),
+            revalidation_errors=self.revalidation_error_count,
+        )
+
+    def ttl(self, path: str) -> Optional[float]:
+        return self._TTLS.get(path, self._DEFAULT_TTL)
+
+    def is_cached(self, path: str) -> bool:
+        return bool(self.ttl(path))
+
+    async def get(self, path: str, params: Dict, fetch: Callable[[], Awaitable]) -> Any:
+        '''Returns the cached response of the endpoint or the result of `fetch`.'''
+        ttl = self.ttl(path)
+        if not ttl:
+            return await fetch()
+
+        key = path, self._normalize(params)
+        entry = self._entries.get(key)
+        if entry is not None:
+            response, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age <= ttl:
+                self.hit_count += 1
+                self._entries.move_to_end(key)
+                return response
+            if age <= ttl + self._STALE_WHILE_REVALIDATE:
+                self.stale_hit_count += 1
+                self._entries.move_to_end(key)
+                self._revalidate(key, fetch)
+                return response
+
+        self.miss_count += 1
+        response = await fetch()
+        self._store(key, response)
+        return response
+
+    def invalidate(self, path: str = None):
+        '''Drops the responses of the endpoint, or every response.'''
+        if path is None:
+            self._entries.clear()
+        else:
+            for key in [k for k in self._entries if k[0] == path]:
+                del self._entries[key]
+
+    def close(self):
+        for task in self._revalidations.values():
+            task.cancel()
+        self._revalidations.clear()
+
+    def _revalidate(self, key: CacheKey, fetch: Callable[[], Awaitable]):
+        if key not in self._revalidations:
+            self._revalidations[key] = asyncio.ensure_future(self._refresh(key, fetch))
+
+    async def _refresh(self, key: CacheKey, fetch: Callable[[], Awaitable]):
+        try:
+            self._store(key, await fetch())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # the stale response is served until the stale window is over
+            self.revalidation_error_count += 1
+            self._logger.warning('Cache revalidation of %s failed (%s): %s', key[0], type(e).__name__, e)
+        finally:
+            self._revalidations.pop(key, None)
+
+    def _store(self, key: CacheKey, response: Any):
+        self._entries[key] = response, time.monotonic()
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._MAXSIZE:
+            self._entries.popitem(last=False)
+            self.eviction_count += 1
+
+    @staticmethod
+    def _normalize(params: Dict) -> Hashable:
+        return tuple(sorted(params.items())) if params else ()
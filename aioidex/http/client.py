@@ -1,14 +1,33 @@
 from asyncio import AbstractEventLoop
+from typing import Union, Dict, Any
 
+from aioidex.codecs import Codec
+from aioidex.http.cache import ResponseCache
 from aioidex.http.modules.public import Public
 from aioidex.http.network import Network
+from aioidex.http.ratelimit import RateLimiter
+from aioidex.http.retry import RetryPolicy, CircuitBreaker
 
 
 class Client:
-    def __init__(self, loop: AbstractEventLoop = None, timeout: int = None) -> None:
-        self._http = Network(loop, timeout)
+    def __init__(
+            self,
+            loop: AbstractEventLoop = None,
+            timeout: int = None,
+            codec: Union[str, Codec] = None,
+            cache: ResponseCache = None,
+            coalesce: bool = False,
+            rate_limiter: RateLimiter = None,
+            retry_policy: RetryPolicy = None,
+            circuit_breaker: CircuitBreaker = None,
+            connector: Dict[str, Any] = None
+    ) -> None:
+        self._http = Network(loop, timeout, codec, coalesce, rate_limiter, retry_policy, circuit_breaker, connector)
+        self.cache = cache
 
-        self.public = Public(self._http)
+        self.public = Public(self._http, cache)
 
     async def close(self, delay: float = 0.250):
+        if self.cache is not None:
+            self.cache.close()
         await self._http.close(delay)
@@ -0,0 +1,88 @@
+import time
+from types import SimpleNamespace
+from typing import Any, Dict
+
+from aiohttp import ClientSession, TCPConnector, TraceConfig
+
+from aioidex.histogram import Histogram, SLOW_BUCKETS
+
+# aiohttp.TCPConnector options, a connection idle for keepalive_timeout seconds is closed
+DEFAULT_CONNECTOR = dict(
+    limit=100,
+    limit_per_host=0,
+    keepalive_timeout=15.0,
+    ttl_dns_cache=10,
+)
+
+
+class ConnectionStats:
+    '''Connection pool usage of a session, collected with an aiohttp `TraceConfig`.
+
+    `created` vs `reused` tells whether the pool and the keep-alive timeout are large enough for the request rate,
+    `queued` counts the requests that waited for a free connection because of `limit` or `limit_per_host`.
+    '''
+
+    def __init__(self):
+        self.created_count = 0
+        self.reused_count = 0
+        self.queued_count = 0
+        self.dns_hit_count = 0
+        self.dns_miss_count = 0
+        self.connect = Histogram(SLOW_BUCKETS)
+        self.queue_wait = Histogram(SLOW_BUCKETS)
+
+    def trace_config(self) -> TraceConfig:
+        trace_config = TraceConfig()
+        trace_config.on_connection_create_start.append(self._on_create_start)
+        trace_config.on_connection_create_end.append(self._on_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_reuse)
+        trace_config.on_connection_queued_start.append(self._on_queued_start)
+        trace_config.on_connection_queued_end.append(self._on_queued_end)
+        trace_config.on_dns_cache_hit.append(self._on_dns_hit)
+        trace_config.on_dns_cache_miss.append(self._on_dns_miss)
+        return trace_config
+
+    def snapshot(self, connector: TCPConnector = None) -> Dict[str, Any]:
+        requests = self.created_count + self.reused_count
+        result = dict(
+            created=self.created_count,
+            reused=self.reused_count,
+            reuse_ratio=self.reused_count / requests if requests else None,
+            queued=self.queued_count,
+            dns_cache_hits=self.dns_hit_count,
+            dns_cache_misses=self.dns_miss_count,
+            connect_seconds=self.connect.snapshot(),
+            queue_wait_seconds=self.queue_wait.snapshot(),
+        )
+        if connector is not None:
+            # the pool state is only exposed by the connector internals
+            result.update(
+                limit=connector.limit,
+                limit_per_host=connector.limit_per_host,
+                acquired=len(getattr(connector, '_acquired', ())),
+                idle=sum(len(c) for c in getattr(connector, '_conns', {}).values()),
+            )
+        return result
+
+    async def _on_create_start(self, session: ClientSession, ctx: SimpleNamespace, params):
+        ctx.connect_started = time.perf_counter()
+
+    async def _on_create_end(self, session: ClientSession, ctx: SimpleNamespace, params):
+        self.created_count += 1
+        self.connect.observe(time.perf_counter() - ctx.connect_started)
+
+    async def _on_reuse(self, session: ClientSession, ctx: SimpleNamespace, params):
+        self.reused_count += 1
+
+    async def _on_queued_start(self, session: ClientSession, ctx: SimpleNamespace, params):
+        self.queued_count += 1
+        ctx.queued_at = time.perf_counter()
+
+    async def _on_queued_end(self, session: ClientSession, ctx: SimpleNamespace, params):
+        self.queue_wait.observe(time.perf_counter() - ctx.queued_at)
+
+    async def _on_dns_hit(self, session: ClientSession, ctx: SimpleNamespace, params):
+        self.dns_hit_count += 1
+
+    async def _on_dns_miss(self, session: ClientSession, ctx: SimpleNamespace, params):
+        self.dns_miss_count += 1
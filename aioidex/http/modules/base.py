@@ -1,16 +1,65 @@
+import asyncio
 from abc import ABC
 from enum import Enum
-from typing import Dict, Optional
+from typing import Dict, Optional, Any, Tuple, AsyncIterator, Callable
 
+from aioidex.http.cache import ResponseCache
 from aioidex.http.network import Network
 
 
 class BaseModule(ABC):
-    def __init__(self, network):
+    def __init__(self, network, cache: ResponseCache = None):
         self._http: Network = network
+        self._cache = cache
 
     async def _post(self, path: str, data: Optional[Dict] = None):
-        return await self._http.post(path, data=self._filter_params(data))
+        params = self._filter_params(data)
+        if self._cache is None:
+            return await self._http.post(path, data=params)
+        return await self._cache.get(path, params, lambda: self._http.post(path, data=params))
+
+    async def _post_page(self, path: str, data: Optional[Dict] = None) -> Tuple[Any, Optional[str]]:
+        return await self._http.post_page(path, data=self._filter_params(data))
+
+    def _stream(self, path: str, data: Optional[Dict] = None) -> AsyncIterator[Tuple[str, Any]]:
+        return self._http.post_stream(path, data=self._filter_params(data))
+
+    async def _paginate(
+            self,
+            path: str,
+            data: Dict,
+            prefetch: bool = True,
+            stop: Callable[[Dict], bool] = None
+    ) -> AsyncIterator[Dict]:
+        '''Yields the items of every page, following the cursor header.
+
+        With `prefetch` the next page is requested while the items of the current one are consumed. Iteration ends on
+        the last page, or before the first item `stop` returns true for.
+        '''
+        params = dict(data)
+        fetch = asyncio.ensure_future(self._post_page(path, params))
+        try:
+            while fetch is not None:
+                items, cursor = await fetch
+                fetch = None
+
+                if not items or cursor is None or cursor == params.get('cursor'):
+                    params = None
+                else:
+                    params = dict(params, cursor=cursor)
+                    if prefetch:
+                        fetch = asyncio.ensure_future(self._post_page(path, params))
+
+                for item in items:
+                    if stop is not None and stop(item):
+                        return
+                    yield item
+
+                if params is not None and fetch is None:
+                    fetch = asyncio.ensure_future(self._post_page(path, params))
+        finally:
+            if fetch is not None:
+                fetch.cancel()
 
     @staticmethod
     def _filter_params(params: Dict) -> Dict:
@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, AsyncIterator, Tuple
 
 from aioidex.http.modules.base import BaseModule
 
@@ -16,6 +16,13 @@ class Public(BaseModule):
         """
         return await self._post('returnTicker', {'market': market}, )
 
+    def iter_ticker(self) -> AsyncIterator[Tuple[str, Dict]]:
+        """Yields the `(market, ticker)` pairs of all markets as the response is received.
+
+        https://docs.idex.market/#operation/returnTicker
+        """
+        return self._stream('returnTicker')
+
     async def currencies(self) -> Dict:
         """Returns an object of token data indexed by symbol.
 
@@ -23,6 +30,13 @@ class Public(BaseModule):
         """
         return await self._post('returnCurrencies')
 
+    def iter_currencies(self) -> AsyncIterator[Tuple[str, Dict]]:
+        """Yields the `(symbol, currency)` pairs of all currencies as the response is received.
+
+        https://docs.idex.market/#operation/returnCurrencies
+        """
+        return self._stream('returnCurrencies')
+
     async def volume_24hr(self) -> Dict:
         """Returns the 24-hour volume for all markets, plus totals for primary currencies.
 
@@ -73,6 +87,29 @@ class Public(BaseModule):
             {'market': market, 'address': address, 'count': count, 'cursor': cursor}
         )
 
+    def iter_open_orders(
+            self,
+            market: str = None,
+            address: str = None,
+            page_size: int = 100,
+            prefetch: bool = True
+    ) -> AsyncIterator[Dict]:
+        """Iterates over all open orders for a given market or address, page by page.
+
+        The next page is requested while the current one is consumed, unless `prefetch` is false.
+        """
+        if not market and not address:
+            raise ValueError('Either market or address is required.')
+
+        if page_size not in range(1, 101):
+            raise ValueError('Count must be in the interval [ 1 .. 100 ]')
+
+        return self._paginate(
+            'returnOpenOrders',
+            {'market': market, 'address': address, 'count': page_size},
+            prefetch
+        )
+
     async def order_book(self, market: str, count: int = None) -> Dict:
         """Returns the best-priced open orders for a given market.
 
@@ -133,6 +170,51 @@ class Public(BaseModule):
             }
         )
 
+    def iter_trade_history(
+            self,
+            market: str = None,
+            address: str = None,
+            start: int = None,
+            end: int = None,
+            sort: str = None,
+            page_size: int = 100,
+            prefetch: bool = True
+    ) -> AsyncIterator[Dict]:
+        """Iterates over all trades for a given market or address between `start` and `end`, page by page.
+
+        The next page is requested while the current one is consumed, unless `prefetch` is false.
+        """
+        if not market and not address:
+            raise ValueError('Either market or address is required.')
+
+        if page_size not in range(1, 101):
+            raise ValueError('Count must be in the interval [ 1 .. 100 ]')
+
+        if sort is not None and sort not in ('asc', 'desc'):
+            raise ValueError('Possible values are asc (oldest first) and desc (newest first). Defaults to desc.')
+
+        # the pages are bounded by the API already, the timestamps are checked in case the cursor overruns the range
+        if sort == 'asc':
+            bound = end
+            stop = (lambda t: t.get('timestamp', bound) > bound) if bound is not None else None
+        else:
+            bound = start
+            stop = (lambda t: t.get('timestamp', bound) < bound) if bound is not None else None
+
+        return self._paginate(
+            'returnTradeHistory',
+            {
+                'market': market,
+                'address': address,
+                'start': start,
+                'end': end,
+                'sort': sort,
+                'count': page_size,
+            },
+            prefetch,
+            stop
+        )
+
     async def contract_address(self) -> Dict:
         """Returns the contract address used for depositing, withdrawing, and posting orders.
 
@@ -1,11 +1,19 @@
 import asyncio
+import logging
+import re
 from asyncio import AbstractEventLoop
 from enum import Enum
-from typing import Optional, Dict
+from typing import Optional, Dict, Union, Hashable, Any, Tuple, AsyncIterator
+from urllib.parse import urlsplit
 
-from aiohttp import ClientSession, ClientTimeout, ClientResponse, ContentTypeError
+from aiohttp import ClientSession, ClientTimeout, ClientResponse, TCPConnector
 
-from aioidex.exceptions import IdexClientContentTypeError, IdexClientApiError
+from aioidex.codecs import Codec, get_codec
+from aioidex.exceptions import IdexClientContentTypeError, IdexClientApiError, IdexClientStatusError
+from aioidex.http.connection import ConnectionStats, DEFAULT_CONNECTOR
+from aioidex.http.ratelimit import RateLimiter
+from aioidex.http.retry import RetryPolicy, CircuitBreaker, parse_retry_after
+from aioidex.http.streaming import ObjectStreamParser
 
 
 class HttpMethod(Enum):
@@ -17,11 +25,39 @@ class HttpMethod(Enum):
 
 class Network:
     _API_URL = 'https://api.idex.market'
-
-    def __init__(self, loop: AbstractEventLoop = None, timeout: int = 10):
+    _JSON_CONTENT_TYPE = re.compile(r'^application/(?:[\w.+-]+?\+)?json')
+    _CURSOR_HEADER = 'idex-next-cursor'
+
+    def __init__(
+            self,
+            loop: AbstractEventLoop = None,
+            timeout: int = 10,
+            codec: Union[str, Codec] = None,
+            coalesce: bool = False,
+            rate_limiter: RateLimiter = None,
+            retry_policy: RetryPolicy = None,
+            circuit_breaker: CircuitBreaker = None,
+            connector: Dict[str, Any] = None
+    ):
         self._loop = loop or asyncio.get_event_loop()
+        self._codec = get_codec(codec)
+        self._CONNECTOR = dict(DEFAULT_CONNECTOR, **(connector or {}))
+        self.connections = ConnectionStats()
         self._session = self._init_session(timeout)
 
+        # opt-in: identical concurrent requests share a single in flight request and every caller gets the same result
+        self._COALESCE = coalesce
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.rate_limiter = rate_limiter
+        # without a policy the failures seen by the circuit breaker are not retried
+        self.retry_policy = retry_policy or (RetryPolicy(attempts=1) if circuit_breaker is not None else None)
+        self.circuit_breaker = circuit_breaker
+
+        self._logger = logging.getLogger(__name__)
+
+        self.request_count = 0
+        self.coalesced_count = 0
+
     def _init_session(self, timeout: int) -> ClientSession:
         return ClientSession(
             headers={
@@ -29,9 +65,23 @@ class Network:
                 'User-Agent': 'aioidex/python',
             },
             timeout=ClientTimeout(total=timeout),
+            connector=TCPConnector(loop=self._loop, **self._CONNECTOR),
+            trace_configs=[self.connections.trace_config()],
             loop=self._loop
         )
 
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            requests=self.request_count,
+            coalesced=self.coalesced_count,
+            in_flight=len(self._in_flight),
+        )
+
+    @property
+    def connection_stats(self) -> Dict[str, Any]:
+        return self.connections.snapshot(self._session.connector)
+
     async def close(self, delay):
         '''Graceful shutdown.
 
@@ -46,18 +96,102 @@ class Network:
     async def _request_api(self, method: HttpMethod, path: str, data: Optional[dict] = None, ):
         return await self._request(method, self._create_api_uri(path), data)
 
-    async def _request(self, method: HttpMethod, url: str, data: Optional[dict] = None):
+    async def _request(self, method: HttpMethod, url: str, data: Optional[dict] = None, page: bool = False):
+        key = self._coalesce_key(method, url, data, page) if self._COALESCE else None
+        if key is None:
+            self.request_count += 1
+            return await self._send(method, url, data, page)
+
+        future = self._in_flight.get(key)
+        if future is None:
+            self.request_count += 1
+            future = self._in_flight[key] = asyncio.ensure_future(self._send(method, url, data, page), loop=self._loop)
+            future.add_done_callback(lambda f: self._request_done(key, f))
+        else:
+            self.coalesced_count += 1
+
+        # a cancelled caller doesn't cancel the request shared with the other callers
+        return await asyncio.shield(future, loop=self._loop)
+
+    def _request_done(self, key: Hashable, future: asyncio.Future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if not future.cancelled():
+            # marks the exception as retrieved when every caller has been cancelled
+            future.exception()
+
+    @staticmethod
+    def _coalesce_key(method: HttpMethod, url: str, data: Optional[dict], page: bool = False) -> Optional[Hashable]:
+        key = method, url, tuple(sorted(data.items())) if data else (), page
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    async def _send(self, method: HttpMethod, url: str, data: Optional[dict] = None, page: bool = False):
+        if self.retry_policy is None:
+            return await self._send_once(method, url, data, page)
+
+        # the coalesced requests share the retries too
+        path = url.rsplit('/', 1)[-1]
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_request(host)
+
+            try:
+                result = await self._send_once(method, url, data, page)
+            except asyncio.CancelledError:
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.release(host)
+                raise
+            except Exception as e:
+                if self.circuit_breaker is not None:
+                    # an API error is a response of a healthy API
+                    if self.retry_policy.is_transient(e):
+                        self.circuit_breaker.record_failure(host)
+                    else:
+                        self.circuit_breaker.record_success(host)
+
+                delay = self.retry_policy.retry_delay(e, path, attempt)
+                if delay is None:
+                    raise
+                self._logger.warning('%s failed (%s: %s), retry %s in %.2fs', path, type(e).__name__, e, attempt + 1,
+                                     delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_success(host)
+            return result
+
+    async def _send_once(self, method: HttpMethod, url: str, data: Optional[dict] = None, page: bool = False):
+        if self.rate_limiter is not None:
+            # the coalesced requests take the tokens of a single request
+            await self.rate_limiter.acquire(url.rsplit('/', 1)[-1])
+
         http_method = getattr(self._session, method.value)
         async with http_method(url, data=data) as response:
-            return await self._handle_response(response)
+            if self.retry_policy is not None and response.status in self.retry_policy.statuses:
+                raise IdexClientStatusError(
+                    response.status,
+                    await response.text(),
+                    parse_retry_after(response.headers.get('Retry-After'))
+                )
+            result = await self._handle_response(response)
+            if page:
+                return result, response.headers.get(self._CURSOR_HEADER)
+            return result
 
     async def _handle_response(self, response: ClientResponse):
-        try:
-            response_json = await response.json()
-        except ContentTypeError:
+        if not self._JSON_CONTENT_TYPE.match(response.content_type):
             raise IdexClientContentTypeError(response.status, await response.text())
-        else:
-            return self._raise_if_error(response_json)
+
+        # the body bytes are passed to the parser as is, without decoding to str first
+        return self._raise_if_error(self._codec.loads(await response.read()))
 
     @staticmethod
     def _raise_if_error(response: Dict) -> Dict:
@@ -67,3 +201,31 @@ class Network:
 
     async def post(self, path: str, data: Optional[Dict] = None):
         return await self._request_api(HttpMethod.POST, path, data)
+
+    async def post_stream(self, path: str, data: Optional[Dict] = None) -> AsyncIterator[Tuple[str, Any]]:
+        '''Yields the `(key, value)` members of the response object as they are received.
+
+        The response is neither coalesced nor retried, the members may have been yielded already when it fails.
+        '''
+        url = self._create_api_uri(path)
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(path)
+
+        self.request_count += 1
+        async with self._session.post(url, data=data) as response:
+            if not self._JSON_CONTENT_TYPE.match(response.content_type):
+                raise IdexClientContentTypeError(response.status, await response.text())
+
+            parser = ObjectStreamParser()
+            first = True
+            async for chunk in response.content.iter_any():
+                for key, value in parser.feed(chunk):
+                    if first and key == 'error':
+                        raise IdexClientApiError(value)
+                    first = False
+                    yield key, value
+            parser.close()
+
+    async def post_page(self, path: str, data: Optional[Dict] = None) -> Tuple[Any, Optional[str]]:
+        '''Returns the response of a paginated endpoint and the cursor of the next page, None on the last page.'''
+        return await self._request(HttpMethod.POST, self._create_api_uri(path), data, page=True)
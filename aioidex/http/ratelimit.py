@@ -0,0 +1,126 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from aioidex.histogram import Histogram, SLOW_BUCKETS
+
+# lower goes first, the endpoints missing here have DEFAULT_PRIORITY
+DEFAULT_PRIORITY = 1
+DEFAULT_PRIORITIES = {
+    'returnNextNonce': 0,
+    'returnOrderStatus': 0,
+    'returnTradeHistory': 2,
+    'returnOpenOrders': 2,
+}
+
+
+class RateLimiter:
+    '''Token bucket limiter of the requests of a `Client`, refilled with `rate` tokens per second up to `burst`.
+
+    A request takes `costs[endpoint]` tokens (1 by default). Requests that can't be sent right away wait in a priority
+    queue, so the latency critical endpoints (nonce, order status) go ahead of the bulk ones (trade history pages).
+    '''
+
+    def __init__(
+            self,
+            rate: float = 10.0,
+            burst: float = None,
+            costs: Dict[str, float] = None,
+            priorities: Dict[str, int] = None
+    ):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+
+        self._RATE = rate
+        self._BURST = rate if burst is None else burst
+        self._COSTS = costs or {}
+        self._PRIORITIES = dict(DEFAULT_PRIORITIES if priorities is None else priorities)
+
+        self._tokens = self._BURST
+        self._updated_at = time.monotonic()
+        # (priority, order, cost, future)
+        self._waiters: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.request_count = 0
+        self.throttled_count = 0
+        self.wait = Histogram(SLOW_BUCKETS)
+        self.waits_by_priority: Dict[int, Histogram] = {}
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            requests=self.request_count,
+            throttled=self.throttled_count,
+            queued=sum(1 for w in self._waiters if not w[3].done()),
+            tokens=self._refill(),
+            wait_seconds=self.wait.snapshot(),
+            wait_seconds_by_priority={p: h.snapshot() for p, h in sorted(self.waits_by_priority.items())},
+        )
+
+    def cost(self, path: str) -> float:
+        return self._COSTS.get(path, 1)
+
+    def priority(self, path: str) -> int:
+        return self._PRIORITIES.get(path, DEFAULT_PRIORITY)
+
+    async def acquire(self, path: str, priority: int = None):
+        '''Waits for the tokens of a request to the endpoint.'''
+        cost = min(self.cost(path), self._BURST)
+        priority = self.priority(path) if priority is None else priority
+        self.request_count += 1
+
+        if not self._waiters and self._refill() >= cost:
+            self._tokens -= cost
+            self._observe(priority, 0.0)
+            return
+
+        self.throttled_count += 1
+        started = time.monotonic()
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), cost, future))
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # the tokens were taken for the cancelled request, they are given back
+                self._tokens += cost
+                self._schedule()
+            raise
+        self._observe(priority, time.monotonic() - started)
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        self._tokens = min(self._BURST, self._tokens + (now - self._updated_at) * self._RATE)
+        self._updated_at = now
+        return self._tokens
+
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        self._refill()
+        while self._waiters:
+            _, _, cost, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self._tokens < cost:
+                delay = (cost - self._tokens) / self._RATE
+                self._timer = asyncio.get_event_loop().call_later(delay, self._schedule)
+                return
+            heapq.heappop(self._waiters)
+            self._tokens -= cost
+            future.set_result(None)
+
+    def _observe(self, priority: int, wait: float):
+        self.wait.observe(wait)
+        histogram = self.waits_by_priority.get(priority)
+        if histogram is None:
+            histogram = self.waits_by_priority[priority] = Histogram(SLOW_BUCKETS)
+        histogram.observe(wait)
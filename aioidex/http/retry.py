@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import aiohttp
+
+from aioidex.exceptions import IdexClientContentTypeError, IdexClientStatusError, IdexClientCircuitOpenError
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def is_idempotent(path: str) -> bool:
+    # the read-only endpoints are all named return*
+    return path.startswith('return')
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    '''Seconds to wait of a Retry-After header value, in seconds or an HTTP date.'''
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    '''Retries of the transient failures: timeouts, connection errors, `RETRY_STATUSES` and non JSON error pages.
+
+    Delays grow exponentially from `base_delay` up to `max_delay` with full jitter, a Retry-After header is honored
+    unless it is longer than `max_retry_after` (then the error is raised right away). The non idempotent requests are
+    retried only when they can't have reached the API: connection failures and 429 responses.
+    '''
+
+    def __init__(
+            self,
+            attempts: int = 3,
+            base_delay: float = 0.2,
+            max_delay: float = 10.0,
+            max_retry_after: float = 60.0,
+            statuses: Iterable[int] = RETRY_STATUSES,
+            idempotent: Callable[[str], bool] = is_idempotent
+    ):
+        if attempts < 1:
+            raise ValueError('attempts must be at least 1')
+
+        self._ATTEMPTS = attempts
+        self._BASE_DELAY = base_delay
+        self._MAX_DELAY = max_delay
+        self._MAX_RETRY_AFTER = max_retry_after
+        self.statuses = frozenset(statuses)
+        self._idempotent = idempotent
+
+        self.retry_count = 0
+        self.exhausted_count = 0
+        self.retries_by_reason: Dict[str, int] = defaultdict(int)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            retries=self.retry_count,
+            exhausted=self.exhausted_count,
+            retries_by_reason=dict(self.retries_by_reason),
+        )
+
+    def is_transient(self, e: BaseException) -> bool:
+        if isinstance(e, IdexClientStatusError):
+            return e.status in self.statuses
+        return isinstance(e, (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                              IdexClientContentTypeError))
+
+    def retry_delay(self, e: BaseException, path: str, attempt: int) -> Optional[float]:
+        '''Delay before the next attempt of the failed request, None if it must not be retried.'''
+        if not self.is_transient(e):
+            return None
+
+        if not self._idempotent(path) and not (
+                isinstance(e, aiohttp.ClientConnectorError)
+                or isinstance(e, IdexClientStatusError) and e.status == 429
+        ):
+            return None
+
+        retry_after = getattr(e, 'retry_after', None)
+        if attempt + 1 >= self._ATTEMPTS or retry_after is not None and retry_after > self._MAX_RETRY_AFTER:
+            self.exhausted_count += 1
+            return None
+
+        self.retry_count += 1
+        self.retries_by_reason[str(e.status) if isinstance(e, IdexClientStatusError) else type(e).__name__] += 1
+
+        delay = random.uniform(0, min(self._MAX_DELAY, self._BASE_DELAY * 2 ** attempt))
+        return max(delay, retry_after) if retry_after is not None else delay
+
+
+class CircuitBreaker:
+    '''Per host circuit breaker, fails the requests fast while the API is degraded.
+
+    After `failure_threshold` consecutive transient failures the circuit of the host opens for `reset_timeout`
+    seconds, the requests raise `IdexClientCircuitOpenError` meanwhile. Then a single probe request is let through, its
+    success closes the circuit and its failure opens it again.
+    '''
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self._FAILURE_THRESHOLD = failure_threshold
+        self._RESET_TIMEOUT = reset_timeout
+
+        self._failures: Dict[str, int] = defaultdict(int)
+        self._opened_at: Dict[str, float] = {}
+        self._probing = set()
+
+        self.open_count = 0
+        self.rejected_count = 0
+
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        hosts = set(self._failures) | set(self._opened_at)
+        return dict(
+            hosts={h: dict(state=self.state(h), failures=self._failures.get(h, 0)) for h in sorted(hosts)},
+            opened=self.open_count,
+            rejected=self.rejected_count,
+        )
+
+    def state(self, host: str) -> str:
+        opened_at = self._opened_at.get(host)
+        if opened_at is None:
+            return self.CLOSED
+        if host in self._probing or time.monotonic() - opened_at >= self._RESET_TIMEOUT:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def before_request(self, host: str):
+        '''Raises `IdexClientCircuitOpenError` if the request to the host must not be sent.'''
+        state = self.state(host)
+        if state == self.CLOSED:
+            return
+        if state == self.HALF_OPEN and host not in self._probing:
+            self._probing.add(host)
+            return
+
+        self.rejected_count += 1
+        retry_in = max(0.0, self._opened_at[host] + self._RESET_TIMEOUT - time.monotonic())
+        raise IdexClientCircuitOpenError(host, retry_in)
+
+    def record_success(self, host: str):
+        if host in self._opened_at:
+            self._logger.info('Circuit of %s closed', host)
+            del self._opened_at[host]
+        self._probing.discard(host)
+        self._failures.pop(host, None)
+
+    def record_failure(self, host: str):
+        self._failures[host] += 1
+        probe = host in self._probing
+        self._probing.discard(host)
+        if probe or host not in self._opened_at and self._failures[host] >= self._FAILURE_THRESHOLD:
+            self.open_count += 1
+            self._opened_at[host] = time.monotonic()
+            self._logger.warning('Circuit of %s open for %ss after %s failures',
+                                 host, self._RESET_TIMEOUT, self._failures[host])
+
+    def release(self, host: str):
+        '''Ends a probe request cancelled before telling about the API health.'''
+        self._probing.discard(host)
@@ -0,0 +1,137 @@
+import codecs
+import json
+import re
+from typing import Any, Iterator, Tuple
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# key without escapes and the colon, the fast path of the members
+_KEY = re.compile(r'"([^"\\]*)"[ \t\n\r]*:[ \t\n\r]*')
+_DECODER = json.JSONDecoder()
+_scan = _DECODER.scan_once
+
+# a decoding error closer than that to the end of the buffer may be due to the member cut by the chunk boundary
+_INCOMPLETE_TAIL = 16
+
+
+class ObjectStreamParser:
+    '''Incremental parser of the members of a top level JSON object.
+
+    Chunks of the body are fed as they arrive and every complete `"key": value` member is decoded on its own, so the
+    whole body is never held as one string or one dict. The members are decoded by the C scanner of the stdlib `json`
+    whatever the client codec, Python only steps from one member to the next.
+    '''
+
+    def __init__(self):
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._started = False
+        self._separator = False
+        self._empty = True
+        self.done = False
+
+    def feed(self, chunk: bytes) -> Iterator[Tuple[str, Any]]:
+        '''Yields the members completed by the chunk as they are decoded, exhaust it before feeding the next chunk.'''
+        buffer = self._buffer + self._utf8.decode(chunk)
+        pos = _WHITESPACE.match(buffer).end()
+
+        if self.done:
+            if pos < len(buffer):
+                raise ValueError('Extra data after the JSON object')
+            return
+
+        if not self._started:
+            if pos == len(buffer):
+                self._buffer = ''
+                return
+            if buffer[pos] != '{':
+                raise ValueError('The JSON document is not an object')
+            self._started = True
+            pos += 1
+
+        end = len(buffer)
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos >= end:
+                break
+
+            char = buffer[pos]
+            if char == '}' and (self._separator or self._empty):
+                self.done = True
+                if _WHITESPACE.match(buffer, pos + 1).end() < end:
+                    raise ValueError('Extra data after the JSON object')
+                pos = end
+                break
+            if self._separator:
+                if char != ',':
+                    raise ValueError(f'Expecting , or }} at {pos}')
+                self._separator = False
+                pos += 1
+                continue
+
+            member = self._decode_member(buffer, pos)
+            if member is None:
+                break
+            key, value, pos = member
+            self._separator = True
+            self._empty = False
+            yield key, value
+
+        self._buffer = buffer[pos:]
+
+    def close(self):
+        if not self.done:
+            raise ValueError('Incomplete JSON object')
+
+    def _decode_member(self, buffer: str, pos: int):
+        '''Returns the key, the value and the end of the member at `pos`, None if it isn't complete yet.'''
+        end = len(buffer)
+        match = _KEY.match(buffer, pos)
+        if match is not None and match.end() < end:
+            key = match.group(1)
+            try:
+                value, i = _scan(buffer, match.end())
+            except StopIteration as e:
+                # the value is the position of the missing value, nested values included
+                if end - e.value < _INCOMPLETE_TAIL:
+                    return None
+                raise ValueError(f'Expecting value at {e.value}')
+            except json.JSONDecodeError as e:
+                if e.msg.startswith('Unterminated string') or end - e.pos < _INCOMPLETE_TAIL:
+                    return None
+                raise
+            return self._member_end(buffer, key, value, i)
+
+        try:
+            key, i = _DECODER.raw_decode(buffer, pos)
+            if not isinstance(key, str):
+                raise ValueError(f'Expecting a property name at {pos}')
+
+            i = _WHITESPACE.match(buffer, i).end()
+            if i >= end:
+                return None
+            if buffer[i] != ':':
+                raise ValueError(f'Expecting : at {i}')
+
+            i = _WHITESPACE.match(buffer, i + 1).end()
+            if i >= end:
+                return None
+            value, i = _DECODER.raw_decode(buffer, i)
+        except json.JSONDecodeError as e:
+            if e.msg.startswith('Unterminated string') or end - e.pos < _INCOMPLETE_TAIL:
+                return None
+            raise
+        return self._member_end(buffer, key, value, i)
+
+    @staticmethod
+    def _member_end(buffer: str, key: str, value: Any, i: int):
+        end = len(buffer)
+        # a number at the end of the buffer may go on in the next chunk ("1" of "1.5"), the member is complete only once
+        # its separator is received
+        j = _WHITESPACE.match(buffer, i).end()
+        if j >= end:
+            return None
+        if buffer[j] not in ',}':
+            if end - j < _INCOMPLETE_TAIL:
+                return None
+            raise ValueError(f'Expecting , or }} at {j}')
+        return key, value, i
@@ -0,0 +1,232 @@
+import time
+from collections import deque
+from heapq import heapify, heappop, heappush, nlargest, nsmallest
+from decimal import Decimal
+from enum import Enum
+from typing import Deque, Dict, Hashable, List, Optional, Set, Tuple, Union
+
+Number = Union[Decimal, str, int, float]
+Level = Tuple[Decimal, Decimal]
+
+
+class Side(Enum):
+    BID = 'buy'
+    ASK = 'sell'
+
+
+class BookSide:
+    '''Price levels of one side of the book.
+
+    Levels are looked up by price in a dict and the prices are kept in a heap, best first, so a new level costs
+    O(log n) and the best one is read in O(1). A removed level is left in the heap and dropped lazily once it reaches
+    the top; the heap is rebuilt when such stale prices make up most of it. Depth queries sort the levels, O(n log k)
+    for `k` levels.
+    '''
+    __slots__ = ('side', '_heap', '_amounts', '_orders')
+
+    # stale heap entries tolerated on top of the live ones before a rebuild
+    _STALE_SLACK = 64
+
+    def __init__(self, side: Side):
+        self.side = side
+        # prices of the asks, negated prices of the bids
+        self._heap: List[Decimal] = []
+        self._amounts: Dict[Decimal, Decimal] = {}
+        self._orders: Dict[Decimal, int] = {}
+
+    def __len__(self):
+        return len(self._amounts)
+
+    def __contains__(self, price: Decimal) -> bool:
+        return price in self._amounts
+
+    def amount(self, price: Decimal) -> Decimal:
+        return self._amounts.get(price, Decimal(0))
+
+    def orders(self, price: Decimal) -> int:
+        return self._orders.get(price, 0)
+
+    def add(self, price: Decimal, amount: Decimal):
+        if price in self._amounts:
+            self._amounts[price] += amount
+            self._orders[price] += 1
+            return
+
+        heappush(self._heap, -price if self.side is Side.BID else price)
+        self._amounts[price] = amount
+        self._orders[price] = 1
+
+    def reduce(self, price: Decimal, amount: Decimal, remove_order: bool = False):
+        if price not in self._amounts:
+            return
+
+        self._amounts[price] -= amount
+        if remove_order:
+            self._orders[price] -= 1
+
+        if self._orders[price] <= 0 or self._amounts[price] <= 0:
+            del self._amounts[price]
+            del self._orders[price]
+            self._drop_stale()
+
+    def best(self) -> Optional[Level]:
+        if not self._amounts:
+            return None
+        price = -self._heap[0] if self.side is Side.BID else self._heap[0]
+        return price, self._amounts[price]
+
+    def levels(self, depth: int = None) -> List[Level]:
+        '''Price levels from the best one.'''
+        reverse = self.side is Side.BID
+        if depth:
+            prices = (nlargest if reverse else nsmallest)(depth, self._amounts)
+        else:
+            prices = sorted(self._amounts, reverse=reverse)
+        return [(price, self._amounts[price]) for price in prices]
+
+    def clear(self):
+        self._heap.clear()
+        self._amounts.clear()
+        self._orders.clear()
+
+    def _drop_stale(self):
+        heap = self._heap
+        if len(heap) > 2 * len(self._amounts) + self._STALE_SLACK:
+            heap[:] = [-p for p in self._amounts] if self.side is Side.BID else list(self._amounts)
+            heapify(heap)
+            return
+
+        # the best level must stay on top
+        bid = self.side is Side.BID
+        while heap and (-heap[0] if bid else heap[0]) not in self._amounts:
+            heappop(heap)
+
+
+class Order:
+    __slots__ = ('hash', 'side', 'price', 'amount')
+
+    def __init__(self, order_hash: str, side: Side, price: Decimal, amount: Decimal):
+        self.hash = order_hash
+        self.side = side
+        self.price = price
+        self.amount = amount
+
+    def __repr__(self):
+        return f'Order(hash={self.hash!r}, side={self.side.value}, price={self.price}, amount={self.amount})'
+
+
+class OrderBook:
+    '''Order book of a single market, maintained order by order.'''
+
+    # trade ids remembered to apply every fill once
+    _RECENT_TIDS = 1000
+
+    def __init__(self, market: str):
+        self.market = market
+        self.bids = BookSide(Side.BID)
+        self.asks = BookSide(Side.ASK)
+        self._orders: Dict[str, Order] = {}
+        self._tids: Set[Hashable] = set()
+        self._tids_order: Deque[Hashable] = deque()
+
+        # a gap in the updates is suspected, the book is being resynced
+        self.stale = False
+        self.resync_count = 0
+        self.synced_at: Optional[float] = None
+        self.updated_at: Optional[float] = None
+
+    def __repr__(self):
+        return f'OrderBook(market={self.market!r}, bid={self.best_bid}, ask={self.best_ask})'
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __contains__(self, order_hash: str) -> bool:
+        return order_hash in self._orders
+
+    @property
+    def best_bid(self) -> Optional[Level]:
+        return self.bids.best()
+
+    @property
+    def best_ask(self) -> Optional[Level]:
+        return self.asks.best()
+
+    @property
+    def spread(self) -> Optional[Decimal]:
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def depth(self, levels: int = None) -> Dict[str, List[Level]]:
+        return dict(bids=self.bids.levels(levels), asks=self.asks.levels(levels))
+
+    def order(self, order_hash: str) -> Optional[Order]:
+        return self._orders.get(order_hash)
+
+    def add_order(self, order_hash: str, side: Union[Side, str], price: Number, amount: Number):
+        if order_hash in self._orders:
+            self.remove_order(order_hash)
+
+        order = Order(order_hash, Side(side), Decimal(price), Decimal(amount))
+        if order.amount <= 0:
+            return
+
+        self._orders[order_hash] = order
+        self._side(order.side).add(order.price, order.amount)
+
+    def remove_order(self, order_hash: str) -> Optional[Order]:
+        order = self._orders.pop(order_hash, None)
+        if order is not None:
+            self._side(order.side).reduce(order.price, order.amount, remove_order=True)
+        return order
+
+    def fill_order(self, order_hash: str, amount: Number, tid: Hashable = None) -> Optional[Order]:
+        '''Reduces the order amount by the traded amount, removes the order once it is filled.
+
+        A trade with the `tid` of an already applied one is ignored.
+        '''
+        order = self._orders.get(order_hash)
+        if order is None:
+            return None
+
+        if tid is not None:
+            if tid in self._tids:
+                return order
+            self._tids.add(tid)
+            self._tids_order.append(tid)
+            if len(self._tids_order) > self._RECENT_TIDS:
+                self._tids.discard(self._tids_order.popleft())
+
+        amount = min(Decimal(amount), order.amount)
+        if amount >= order.amount:
+            return self.remove_order(order_hash)
+
+        order.amount -= amount
+        self._side(order.side).reduce(order.price, amount)
+        return order
+
+    def clear(self):
+        self._orders.clear()
+        self.bids.clear()
+        self.asks.clear()
+        self._tids.clear()
+        self._tids_order.clear()
+
+    def replace(self, book: 'OrderBook'):
+        '''Takes over the content of the other book, the references to this one see the new content at once.'''
+        self.bids, self.asks, self._orders = book.bids, book.asks, book._orders
+        self._tids, self._tids_order = book._tids, book._tids_order
+        self.synced_at, self.updated_at = book.synced_at, book.updated_at
+
+    def load_snapshot(self, snapshot: Dict):
+        '''Replaces the book content with the `returnOrderBook` response.'''
+        self.clear()
+        for side, key in ((Side.BID, 'bids'), (Side.ASK, 'asks')):
+            for order in snapshot.get(key, ()):
+                self.add_order(order['orderHash'], side, order['price'], order['amount'])
+        self.synced_at = self.updated_at = time.time()
+
+    def _side(self, side: Side) -> BookSide:
+        return self.bids if side is Side.BID else self.asks
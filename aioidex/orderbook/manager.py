@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional, List, Tuple, Callable, Any, Union, Set
+
+from aioidex.datastream.datastream import IdexDatastream
+from aioidex.datastream.message import TOPIC_FIELD
+from aioidex.datastream.pool import IdexDatastreamPool
+from aioidex.datastream.router import EventRouter
+from aioidex.http.modules.public import Public
+from aioidex.orderbook.book import OrderBook
+from aioidex.types.events import MarketEvents, ChainEvents
+
+Delta = Tuple[Callable, Dict]
+
+
+class OrderBookManager:
+    '''Keeps local order books of several markets.
+
+    Books are seeded by `returnOrderBook` snapshots and updated by the `market_orders`, `market_cancels` and
+    `market_trades` datastream events, either routed by an `EventRouter` or passed to `process`.
+
+    A gap in the updates is suspected on a reconnect of the registered datastream (once its subscriptions are
+    restored), a `chain_server_block` jump or a trade of an unknown order. The book is marked stale and resynced in
+    background: a fresh snapshot is fetched, the deltas received since its request are replayed on it and the book
+    content is swapped at once. The deltas received before the request are covered by the snapshot. Orders and cancels
+    received while it is fetched replay safely (known orders are kept, cancels of missing orders are ignored), but a
+    fill of an order of the snapshot may be in it or not: another snapshot is fetched then, the book stays stale
+    meanwhile.
+    '''
+    _BLOCK_FIELDS = ('currentBlock', 'blockNumber', 'block')
+
+    def __init__(self, public: Public, snapshot_depth: int = 100, resync_retry_delay: float = 1.0):
+        self._public = public
+        self._SNAPSHOT_DEPTH = snapshot_depth
+        self._RESYNC_RETRY_DELAY = resync_retry_delay
+
+        self.books: Dict[str, OrderBook] = {}
+
+        self._handlers = {
+            MarketEvents.ORDERS.value: self._on_orders,
+            MarketEvents.CANCELS.value: self._on_cancels,
+            MarketEvents.TRADES.value: self._on_trades,
+        }
+
+        # resync state
+        self._resyncs: Dict[str, asyncio.Future] = {}
+        self._buffers: Dict[str, List[Delta]] = {}
+        self._resync_again = set()
+        # resyncs waiting for the subscriptions of a reconnected datastream
+        self._recoveries: Set[asyncio.Future] = set()
+        self._block: Optional[int] = None
+
+        self.gap_count = 0
+        self.snapshot_race_count = 0
+
+        self._logger = logging.getLogger(__name__)
+
+    def __getitem__(self, market: str) -> OrderBook:
+        return self.books[market]
+
+    def __contains__(self, market: str) -> bool:
+        return market in self.books
+
+    def book(self, market: str) -> Optional[OrderBook]:
+        return self.books.get(market)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return dict(
+            gaps=self.gap_count,
+            snapshot_races=self.snapshot_race_count,
+            resyncing=len(self._resyncs),
+            books={
+                market: dict(
+                    orders=len(book),
+                    stale=book.stale,
+                    resyncs=book.resync_count,
+                    since_sync=now - book.synced_at if book.synced_at else None,
+                    since_update=now - book.updated_at if book.updated_at else None,
+                )
+                for market, book in self.books.items()
+            },
+        )
+
+    async def load(self, markets: Iterable[str]):
+        '''Seeds the books of the markets from the HTTP snapshots.'''
+        for market in markets:
+            book = self.books.setdefault(market, OrderBook(market))
+            book.load_snapshot(await self._public.order_book(market, self._SNAPSHOT_DEPTH))
+            self._logger.info('Order book %s loaded: %s orders', market, len(book))
+
+    async def close(self):
+        for task in list(self._resyncs.values()) + list(self._recoveries):
+            task.cancel()
+        self._resyncs.clear()
+        self._buffers.clear()
+
+    def register(
+            self,
+            router: EventRouter,
+            markets: Iterable[str] = None,
+            watch_blocks: bool = True,
+            datastream: Union[IdexDatastream, IdexDatastreamPool] = None
+    ):
+        '''Routes the market events (of the given markets or all of them) to the books.
+
+        With `watch_blocks` the `chain_server_block` events are routed as well to detect the block jumps. The
+        reconnects of the `datastream` (or of any connection of a pool) resync the books.
+        '''
+        if datastream is not None:
+            datastream.on_reconnect(self._on_reconnect)
+
+        for event in self._handlers:
+            if markets is None:
+                router.add(event, self.process)
+            else:
+                for market in markets:
+                    router.add(event, self.process, topic=market)
+
+        if watch_blocks:
+            router.add(ChainEvents.SERVER_BLOCK, self.process)
+
+    def process(self, message: Dict):
+        '''Applies the datastream market event to the book, events of the unknown markets are ignored.'''
+        event = message.get('event')
+        if event == ChainEvents.SERVER_BLOCK.value:
+            self._check_block(message['payload'])
+            return
+
+        handler = self._handlers.get(event)
+        if handler is None:
+            return
+
+        payload = message['payload']
+        book = self.books.get(payload.get('market') or message.get(TOPIC_FIELD))
+        if book is None:
+            return
+
+        buffer = self._buffers.get(book.market)
+        if buffer is not None:
+            buffer.append((handler, payload))
+
+        handler(book, payload)
+        book.updated_at = time.time()
+
+    def suspect_gap(self, market: str = None, reason: str = 'unknown'):
+        '''Resyncs the book of the market (or all the books) in background.'''
+        self.gap_count += 1
+        for m in ([market] if market else list(self.books)):
+            if m not in self.books:
+                continue
+
+            self._logger.warning('Order book %s gap suspected (%s), resyncing...', m, reason)
+            self.books[m].stale = True
+            if m in self._resyncs:
+                # the snapshot being fetched may miss the events lost by the new gap
+                self._resync_again.add(m)
+                continue
+
+            self._buffers[m] = []
+            self._resyncs[m] = asyncio.ensure_future(self._resync(m))
+
+    async def _resync(self, market: str):
+        try:
+            while True:
+                # the deltas received before the request are in the snapshot
+                self._buffers[market] = []
+                book = OrderBook(market)
+                book.load_snapshot(await self._fetch_snapshot(market))
+                buffer = self._buffers[market]
+                if not self._fills_snapshot_orders(book, buffer):
+                    break
+
+                # the fills may be counted by the snapshot already, replaying them could apply them twice
+                self.snapshot_race_count += 1
+                self._logger.info('Order book %s snapshot raced with fills, fetching another one', market)
+                await asyncio.sleep(self._RESYNC_RETRY_DELAY)
+
+            # a stale book doesn't suspect a gap on the trades of the orders the snapshot has no more
+            book.stale = True
+            for handler, payload in buffer:
+                handler(book, payload)
+
+            # no await between the replay and the swap, so no event is applied to the stale content only
+            current = self.books[market]
+            current.replace(book)
+            current.resync_count += 1
+            current.stale = False
+            self._logger.info('Order book %s resynced: %s orders', market, len(current))
+        finally:
+            self._resyncs.pop(market, None)
+            self._buffers.pop(market, None)
+
+        if market in self._resync_again:
+            self._resync_again.discard(market)
+            self.suspect_gap(market, 'gap during resync')
+
+    async def _fetch_snapshot(self, market: str) -> Dict:
+        while True:
+            try:
+                return await self._public.order_book(market, self._SNAPSHOT_DEPTH)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._logger.error('Order book %s snapshot error (%s): %s', market, type(e).__name__, e)
+                await asyncio.sleep(self._RESYNC_RETRY_DELAY)
+
+    def _fills_snapshot_orders(self, book: OrderBook, buffer: List[Delta]) -> bool:
+        return any(
+            handler == self._on_trades and any(self._order_hash(t) in book for t in payload.get('trades', ()))
+            for handler, payload in buffer
+        )
+
+    def _on_reconnect(self, datastream: IdexDatastream):
+        # the events sent while the connection was down are missed
+        for book in self.books.values():
+            book.stale = True
+        task = asyncio.ensure_future(self._resync_recovered(datastream))
+        self._recoveries.add(task)
+        task.add_done_callback(self._recoveries.discard)
+
+    async def _resync_recovered(self, datastream: IdexDatastream):
+        # a snapshot fetched before the subscriptions are restored would miss the events sent until then
+        await datastream.sub_manager.wait_recovered()
+        self.suspect_gap(reason='datastream reconnect')
+
+    def _check_block(self, payload: Dict):
+        block = next((payload[f] for f in self._BLOCK_FIELDS if f in payload), None)
+        if block is None:
+            return
+
+        block = int(block)
+        if self._block is not None and block > self._block + 1:
+            self.suspect_gap(reason=f'server block jump {self._block} -> {block}')
+        self._block = max(block, self._block or 0)
+
+    def _on_orders(self, book: OrderBook, payload: Dict):
+        for order in payload.get('orders', ()):
+            order_hash = self._order_hash(order)
+            # a new order is announced once, the known ones come from a replay
+            if order_hash not in book:
+                book.add_order(order_hash, order['type'], order['price'], order['amount'])
+
+    def _on_cancels(self, book: OrderBook, payload: Dict):
+        for cancel in payload.get('cancels', ()):
+            book.remove_order(self._order_hash(cancel))
+
+    def _on_trades(self, book: OrderBook, payload: Dict):
+        for trade in payload.get('trades', ()):
+            order = book.fill_order(self._order_hash(trade), trade['amount'], trade.get('tid'))
+            if order is None and not book.stale:
+                self.suspect_gap(book.market, f'trade of unknown order {self._order_hash(trade)}')
+
+    @staticmethod
+    def _order_hash(data: Dict) -> str:
+        return data.get('orderHash') or data.get('hash')
@@ -0,0 +1,343 @@
+import argparse
+import asyncio
+import logging
+import random
+import time
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union, Type
+
+import websockets
+from shortid import ShortId
+from websockets.server import WebSocketServerProtocol
+
+from aioidex.codecs import Codec, get_codec
+from aioidex.types.events import AccountEvents, MarketEvents, ChainEvents
+from aioidex.types.subscriptions import Category, Action
+
+CATEGORY_EVENTS: Dict[str, Type[Enum]] = {
+    Category.ACCOUNT.value: AccountEvents,
+    Category.MARKET.value: MarketEvents,
+    Category.CHAIN.value: ChainEvents,
+}
+
+Target = Tuple[str, str]
+
+
+class _Connection:
+    def __init__(self, ws: WebSocketServerProtocol):
+        self.ws = ws
+        self.sid: Optional[str] = None
+        self.seq = 0
+        # request -> topics and events
+        self.topics: Dict[str, Set[str]] = {}
+        self.events: Dict[str, List[str]] = {}
+        self.targets: List[Target] = []
+        self._next_target = 0
+        self.generator: Optional[asyncio.Future] = None
+
+    def update_targets(self):
+        self.targets = [
+            (event, topic)
+            for request, topics in self.topics.items()
+            for event in self.events.get(request) or [e.value for e in CATEGORY_EVENTS[request]]
+            for topic in sorted(topics)
+        ]
+
+    def next_target(self) -> Optional[Target]:
+        if not self.targets:
+            return None
+        self._next_target = (self._next_target + 1) % len(self.targets)
+        return self.targets[self._next_target]
+
+
+class DatastreamServer:
+    '''Local stand-in of the IDEX datastream for load and reconnect testing.
+
+    Speaks the handshake, sid and `subscribeTo*` protocol and sends synthetic events of the subscribed topics at
+    `rate` events per second per connection (as fast as possible if None), `batch_size` items per orders, cancels and
+    trades event. Faults are injected with `disconnect`, `change_sid`, `reject` and `handshake_error`.
+
+    Payloads are generated once, `pool_size` of them per event and topic, and sent in turn, so the server is cheap
+    enough to share the process with the measured client. Pass `compression='deflate'` to negotiate permessage-deflate.
+    '''
+
+    def __init__(
+            self,
+            host: str = '127.0.0.1',
+            port: int = 0,
+            rate: Optional[float] = 100.0,
+            batch_size: int = 1,
+            api_keys: Iterable[str] = None,
+            versions: Iterable[str] = None,
+            codec: Union[str, Codec] = None,
+            seed: int = None,
+            pool_size: int = 64,
+            compression: Optional[str] = None
+    ):
+        self._HOST = host
+        self._PORT = port
+        self._RATE = rate
+        self._BATCH_SIZE = batch_size
+        self._POOL_SIZE = pool_size
+        self._COMPRESSION = compression
+        self._API_KEYS = set(api_keys) if api_keys is not None else None
+        self._VERSIONS = set(versions) if versions is not None else None
+
+        self._codec = get_codec(codec)
+        self._random = random.Random(seed)
+        self._sid = ShortId()
+
+        self._server = None
+        self._connections: Set[_Connection] = set()
+        # (event, topic) -> encoded payloads and the next one to send
+        self._payloads: Dict[Target, List[str]] = {}
+        self._next_payload: Dict[Target, int] = {}
+
+        # close the next handshakes with 1002 and this reason
+        self.handshake_error: Optional[str] = None
+
+        self._eid = 0
+        self._counter = 0
+        self._block = 1
+        self.connection_count = 0
+        self.handshake_count = 0
+        self.event_count = 0
+        self.byte_count = 0
+        self.disconnect_count = 0
+        self.sid_change_count = 0
+
+        self._logger = logging.getLogger(__name__)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f'ws://{host}:{port}'
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return dict(
+            connections=len(self._connections),
+            connections_total=self.connection_count,
+            handshakes=self.handshake_count,
+            events=self.event_count,
+            bytes=self.byte_count,
+            disconnects=self.disconnect_count,
+            sid_changes=self.sid_change_count,
+        )
+
+    async def start(self) -> str:
+        self._server = await websockets.serve(self._handle, self._HOST, self._PORT, compression=self._COMPRESSION)
+        self._logger.info('Datastream server is listening on %s', self.url)
+        return self.url
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def disconnect(self, code: int = 1000, reason: str = '', abort: bool = False):
+        '''Closes every connection, with `abort` the transport is dropped without a close frame (1006).'''
+        for conn in list(self._connections):
+            self.disconnect_count += 1
+            if abort:
+                # websockets < 8 keep the transport in the stream writer
+                transport = getattr(conn.ws, 'transport', None) or conn.ws.writer.transport
+                transport.abort()
+            else:
+                await conn.ws.close(code, reason)
+
+    async def reject(self, reason: str = 'AuthenticationFailure'):
+        '''Closes every connection with the 1002 protocol error code.'''
+        await self.disconnect(1002, reason)
+
+    def change_sid(self):
+        '''The next events of every connection are sent with a new sid.'''
+        for conn in self._connections:
+            if conn.sid is not None:
+                conn.sid = self._new_sid()
+                self.sid_change_count += 1
+
+    async def _handle(self, ws: WebSocketServerProtocol, path: str):
+        conn = _Connection(ws)
+        self._connections.add(conn)
+        self.connection_count += 1
+        try:
+            async for frame in ws:
+                await self._on_request(conn, self._codec.loads(frame))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._connections.discard(conn)
+            if conn.generator is not None:
+                conn.generator.cancel()
+
+    async def _on_request(self, conn: _Connection, message: Dict):
+        request, rid = message.get('request'), message.get('rid')
+
+        if request == 'handshake':
+            await self._on_handshake(conn, rid, message.get('payload') or {})
+        elif conn.sid is None or message.get('sid') != conn.sid:
+            await self._respond(conn, rid, request, dict(message=f'Invalid sid {message.get("sid")!r}'), 'error')
+        elif request in CATEGORY_EVENTS:
+            await self._respond(conn, rid, request, self._on_subscription(conn, request, message.get('payload') or {}))
+        else:
+            await self._respond(conn, rid, request, dict(message=f'Unknown request {request!r}'), 'error')
+
+    async def _on_handshake(self, conn: _Connection, rid: str, payload: Dict):
+        reason = self.handshake_error
+        if reason is None and self._API_KEYS is not None and payload.get('key') not in self._API_KEYS:
+            reason = 'AuthenticationFailure'
+        if reason is None and self._VERSIONS is not None and payload.get('version') not in self._VERSIONS:
+            reason = 'InvalidVersion'
+        if reason is not None:
+            await conn.ws.close(1002, reason)
+            return
+
+        conn.sid = self._new_sid()
+        self.handshake_count += 1
+        await self._respond(conn, rid, 'handshake', dict(version=payload.get('version')))
+
+        if conn.generator is None:
+            conn.generator = asyncio.ensure_future(self._generate(conn))
+
+    def _on_subscription(self, conn: _Connection, request: str, payload: Dict) -> Dict:
+        action = Action(payload.get('action'))
+        topics = conn.topics.setdefault(request, set())
+
+        if action is Action.SUBSCRIBE:
+            topics.update(payload.get('topics') or ())
+            if payload.get('events'):
+                conn.events[request] = list(payload['events'])
+        elif action is Action.UNSUBSCRIBE:
+            topics.difference_update(payload.get('topics') or ())
+        elif action is Action.CLEAR:
+            topics.clear()
+
+        conn.update_targets()
+        return dict(action=action.value, topics=sorted(topics), events=conn.events.get(request, []))
+
+    async def _respond(self, conn: _Connection, rid: str, request: str, payload: Dict, result: str = 'success'):
+        await conn.ws.send(self._codec.dumps(
+            dict(type='response', rid=rid, sid=conn.sid, request=request, result=result, payload=payload)
+        ))
+
+    async def _generate(self, conn: _Connection):
+        try:
+            await self._generate_events(conn)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _generate_events(self, conn: _Connection):
+        loop = asyncio.get_event_loop()
+        last, credit = loop.time(), 0.0
+        while conn.ws.open:
+            if self._RATE:
+                await asyncio.sleep(0.01)
+                now = loop.time()
+                credit += (now - last) * self._RATE
+                last = now
+                count = int(credit)
+                credit -= count
+            else:
+                await asyncio.sleep(0)
+                count = 100
+
+            for _ in range(count):
+                target = conn.next_target()
+                if target is None:
+                    break
+                await self._send_event(conn, *target)
+
+    async def _send_event(self, conn: _Connection, event: str, topic: str):
+        self._eid += 1
+        conn.seq += 1
+        frame = self._codec.dumps(dict(
+            type='notification',
+            sid=conn.sid,
+            eid=f'evt:{self._eid}',
+            seq=conn.seq,
+            room=topic,
+            event=event,
+            payload=self._next_encoded_payload(event, topic),
+        ))
+        await conn.ws.send(frame)
+        self.event_count += 1
+        self.byte_count += len(frame.encode())
+
+    def _next_encoded_payload(self, event: str, topic: str) -> str:
+        target = event, topic
+        payloads = self._payloads.get(target)
+        if payloads is None:
+            payloads = self._payloads[target] = [
+                self._codec.dumps(self._payload(event, topic)) for _ in range(self._POOL_SIZE)
+            ]
+        index = self._next_payload.get(target, 0)
+        self._next_payload[target] = (index + 1) % len(payloads)
+        return payloads[index]
+
+    def _payload(self, event: str, topic: str) -> Dict:
+        kind = event.split('_', 1)[0]
+        payload = {kind: topic}
+
+        items = event.rsplit('_', 1)[-1]
+        if items in ('orders', 'cancels', 'trades'):
+            payload[items] = [self._item(items, topic) for _ in range(self._BATCH_SIZE)]
+        elif event == ChainEvents.SERVER_BLOCK.value:
+            self._block += 1
+            payload['currentBlock'] = self._block
+        else:
+            payload['value'] = str(self._price())
+        return payload
+
+    def _item(self, items: str, topic: str) -> Dict:
+        self._counter += 1
+        order_hash = f'0x{self._counter:064x}'
+        if items == 'cancels':
+            return dict(id=self._counter, orderHash=order_hash, market=topic)
+
+        item = dict(
+            orderHash=order_hash,
+            price=str(self._price()),
+            amount=str(round(self._random.uniform(0.1, 1000), 8)),
+            type=self._random.choice(('buy', 'sell')),
+            timestamp=int(time.time()),
+        )
+        if items == 'trades':
+            item['tid'] = self._counter
+        return item
+
+    def _price(self) -> float:
+        return round(self._random.uniform(0.0001, 0.01), 8)
+
+    def _new_sid(self) -> str:
+        return f'sid:{self._sid.generate()}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local IDEX datastream stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rate', type=float, default=100.0, help='events per second per connection, 0 for max')
+    parser.add_argument('--batch-size', type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = DatastreamServer(args.host, args.port, args.rate or None, args.batch_size)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(server.start())
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        loop.run_until_complete(server.stop())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import pytest
+
+from aioidex.http.backfill import TradeBackfill
+
+# market -> trades, one every 10 seconds in [0, 100)
+TRADES = {
+    m: [{'tid': f'{m}-{t}', 'timestamp': t, 'price': t} for t in range(0, 100, 10)]
+    for m in ('ETH_AURA', 'ETH_KIN', 'ETH_ZRX')
+}
+
+
+class FakePublic:
+    def __init__(self, fail_at: int = None):
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.fail_at = fail_at
+
+    async def _iter(self, market, start, end, sort, page_size):
+        self.calls.append((market, start, end))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.001)
+            if self.fail_at is not None and start >= self.fail_at:
+                raise RuntimeError('fetch failed')
+            trades = [t for t in TRADES[market] if start <= t['timestamp'] <= end]
+            # the cursor chains may return a trade twice
+            for t in trades + trades[-1:]:
+                yield t
+        finally:
+            self.active -= 1
+
+    def iter_trade_history(self, market, start=None, end=None, sort=None, page_size=100, prefetch=True):
+        assert sort == 'asc'
+        # the concurrency is the number of requests in flight
+        assert not prefetch
+        return self._iter(market, start, end, sort, page_size)
+
+
+async def collect(backfill: TradeBackfill):
+    return [(m, t['timestamp']) async for m, t in backfill.trades()]
+
+
+@pytest.mark.asyncio
+async def test_backfill():
+    public = FakePublic()
+    backfill = TradeBackfill(public, TRADES, 0, 100, shard_size=30, concurrency=2)
+
+    result = await collect(backfill)
+
+    assert len(result) == 30
+    assert [ts for _, ts in result] == sorted(ts for _, ts in result)
+    assert sorted(result) == sorted((m, t['timestamp']) for m, ts in TRADES.items() for t in ts)
+    assert public.max_active == 2
+    assert sorted({(s, e) for _, s, e in public.calls}) == [(0, 29), (30, 59), (60, 89), (90, 100)]
+    assert backfill.stats['shards'] == 12
+    assert backfill.stats['duplicates'] == 12
+    assert backfill.done_until == 100
+
+
+@pytest.mark.asyncio
+async def test_backfill_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / 'backfill.json')
+
+    backfill = TradeBackfill(FakePublic(fail_at=60), TRADES, 0, 100, shard_size=30, checkpoint=checkpoint)
+    result = []
+    with pytest.raises(RuntimeError):
+        async for m, t in backfill.trades():
+            result.append((m, t['timestamp']))
+
+    assert len(result) == 18
+    with open(checkpoint) as f:
+        assert json.load(f)['done_until'] == 60
+
+    public = FakePublic()
+    backfill = TradeBackfill(public, TRADES, 0, 100, shard_size=30, checkpoint=checkpoint)
+    result.extend(await collect(backfill))
+
+    assert len(result) == 30
+    assert min(s for _, s, _ in public.calls) == 60
+
+    with pytest.raises(ValueError):
+        await collect(TradeBackfill(FakePublic(), ['ETH_AURA'], 0, 100, shard_size=30, checkpoint=checkpoint))
+
+
+@pytest.mark.asyncio
+async def test_backfill_close():
+    public = FakePublic()
+    backfill = TradeBackfill(public, TRADES, 0, 100, shard_size=10, concurrency=3)
+
+    async for _ in backfill.trades():
+        break
+    await asyncio.sleep(0.01)
+
+    assert public.active == 0
+    # at most `ahead` slots are fetched ahead of the yielded one
+    assert max(s for _, s, _ in public.calls) <= 10
+
+
+def test_init():
+    with pytest.raises(ValueError):
+        TradeBackfill(FakePublic(), TRADES, 100, 0)
+    with pytest.raises(ValueError):
+        TradeBackfill(FakePublic(), TRADES, 0, 100, shard_size=0)
+    with pytest.raises(ValueError):
+        TradeBackfill(FakePublic(), TRADES, 0, 100, concurrency=0)
+
+    assert TradeBackfill(FakePublic(), TRADES, 0, 25, shard_size=10).slots() == [(0, 10), (10, 20), (20, 25)]
@@ -0,0 +1,142 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from asynctest import CoroutineMock
+
+from aioidex import Client
+from aioidex.http.cache import ResponseCache
+
+
+def fetcher(*results):
+    return CoroutineMock(side_effect=list(results))
+
+
+@pytest.mark.asyncio
+async def test_hit_miss():
+    cache = ResponseCache(ttls={'returnCurrencies': 10})
+    fetch = fetcher({'ETH': 1}, {'ETH': 2})
+
+    assert await cache.get('returnCurrencies', {}, fetch) == {'ETH': 1}
+    assert await cache.get('returnCurrencies', {}, fetch) == {'ETH': 1}
+    assert fetch.await_count == 1
+    assert cache.stats['hits'] == 1
+    assert cache.stats['misses'] == 1
+    assert cache.stats['hit_ratio'] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_not_cached_endpoint():
+    cache = ResponseCache(ttls={'returnCurrencies': 10})
+    fetch = fetcher(1, 2)
+
+    assert not cache.is_cached('returnTicker')
+    assert await cache.get('returnTicker', {}, fetch) == 1
+    assert await cache.get('returnTicker', {}, fetch) == 2
+    assert len(cache) == 0
+
+    cache = ResponseCache(ttls={}, default_ttl=5)
+    assert cache.ttl('returnTicker') == 5
+
+
+@pytest.mark.asyncio
+async def test_params_key():
+    cache = ResponseCache(ttls={'returnTicker': 10})
+    fetch = fetcher('a', 'b')
+
+    assert await cache.get('returnTicker', {'market': 'ETH_AURA', 'x': 1}, fetch) == 'a'
+    assert await cache.get('returnTicker', {'x': 1, 'market': 'ETH_AURA'}, fetch) == 'a'
+    assert await cache.get('returnTicker', {'market': 'ETH_KIN'}, fetch) == 'b'
+
+
+@pytest.mark.asyncio
+async def test_expiration():
+    cache = ResponseCache(ttls={'returnCurrencies': 10})
+    fetch = fetcher(1, 2)
+
+    with patch('aioidex.http.cache.time.monotonic', return_value=100):
+        assert await cache.get('returnCurrencies', {}, fetch) == 1
+    with patch('aioidex.http.cache.time.monotonic', return_value=111):
+        assert await cache.get('returnCurrencies', {}, fetch) == 2
+    assert cache.stats['misses'] == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate():
+    cache = ResponseCache(ttls={'returnCurrencies': 10}, stale_while_revalidate=30)
+    fetch = fetcher(1, 2)
+
+    with patch('aioidex.http.cache.time.monotonic', return_value=100):
+        assert await cache.get('returnCurrencies', {}, fetch) == 1
+    with patch('aioidex.http.cache.time.monotonic', return_value=115):
+        assert await cache.get('returnCurrencies', {}, fetch) == 1
+        assert await cache.get('returnCurrencies', {}, fetch) == 1
+        assert cache.stats['revalidating'] == 1
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert await cache.get('returnCurrencies', {}, fetch) == 2
+
+    assert fetch.await_count == 2
+    assert cache.stats['stale_hits'] == 2
+    assert cache.stats['revalidating'] == 0
+
+
+@pytest.mark.asyncio
+async def test_revalidation_error():
+    cache = ResponseCache(ttls={'returnCurrencies': 10}, stale_while_revalidate=30)
+    fetch = fetcher(1, Exception('down'))
+
+    with patch('aioidex.http.cache.time.monotonic', return_value=100):
+        await cache.get('returnCurrencies', {}, fetch)
+    with patch('aioidex.http.cache.time.monotonic', return_value=115):
+        assert await cache.get('returnCurrencies', {}, fetch) == 1
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert await cache.get('returnCurrencies', {}, CoroutineMock()) == 1
+
+    assert cache.stats['revalidation_errors'] == 1
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction():
+    cache = ResponseCache(maxsize=2, ttls={'returnTicker': 10})
+
+    await cache.get('returnTicker', {'market': 'a'}, fetcher('a'))
+    await cache.get('returnTicker', {'market': 'b'}, fetcher('b'))
+    await cache.get('returnTicker', {'market': 'a'}, fetcher())
+    await cache.get('returnTicker', {'market': 'c'}, fetcher('c'))
+
+    assert len(cache) == 2
+    assert cache.stats['evictions'] == 1
+    assert await cache.get('returnTicker', {'market': 'a'}, fetcher()) == 'a'
+    assert await cache.get('returnTicker', {'market': 'b'}, fetcher('b2')) == 'b2'
+
+
+@pytest.mark.asyncio
+async def test_invalidate():
+    cache = ResponseCache(ttls={'returnTicker': 10, 'returnCurrencies': 10})
+    await cache.get('returnTicker', {'market': 'a'}, fetcher('a'))
+    await cache.get('returnCurrencies', {}, fetcher('c'))
+
+    cache.invalidate('returnTicker')
+    assert len(cache) == 1
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_client_cache():
+    cache = ResponseCache()
+    c = Client(cache=cache)
+    c._http.post = CoroutineMock(return_value={'ETH': {}})
+
+    await c.public.currencies()
+    await c.public.currencies()
+    await c.public.next_nonce('0x0')
+    await c.public.next_nonce('0x0')
+
+    assert c._http.post.await_count == 3
+    c._http.post.assert_any_await('returnCurrencies', data={})
+    assert cache.stats['hits'] == 1
+    await c.close(0.01)
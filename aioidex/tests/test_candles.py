@@ -0,0 +1,151 @@
+import asyncio
+from decimal import Decimal as D
+
+import pytest
+from asynctest import Mock
+
+from aioidex.datastream.router import EventRouter
+from aioidex.trades.candles import CandleAggregator, parse_interval
+from aioidex.types.events import MarketEvents
+
+
+def trade(tid, timestamp, price, amount='1'):
+    return dict(tid=tid, timestamp=timestamp, price=str(price), amount=str(amount), type='buy')
+
+
+def test_parse_interval():
+    assert parse_interval('1s') == 1
+    assert parse_interval('1d') == 86400
+    assert parse_interval(120) == 120
+
+    with pytest.raises(ValueError):
+        parse_interval('2w')
+    with pytest.raises(ValueError):
+        parse_interval(7)
+
+
+def test_add_trade():
+    agg = CandleAggregator(intervals=['1m', '5m'])
+    agg.add_trade('ETH_AURA', trade(1, 60, '2', '1'))
+    agg.add_trade('ETH_AURA', trade(2, 70, '3', '2'))
+    agg.add_trade('ETH_AURA', trade(3, 80, '1', '1'))
+
+    candle = agg.open_candle('ETH_AURA', '1m')
+    assert (candle.start, candle.end) == (60, 120)
+    assert (candle.open, candle.high, candle.low, candle.close) == (D(2), D(3), D(1), D(1))
+    assert candle.volume == D(4)
+    assert candle.trades == 3
+    assert agg.closed_candles('ETH_AURA', '1m') == []
+
+    agg.add_trade('ETH_AURA', trade(4, 130, '5'))
+    closed = agg.closed_candles('ETH_AURA', '1m')
+    assert len(closed) == 1 and closed[0] is candle
+    assert agg.open_candle('ETH_AURA', '1m').open == D(5)
+    assert agg.open_candle('ETH_AURA', '5m').trades == 4
+
+    agg.add_trade('ETH_AURA', trade(5, 100, '5'))
+    # late for the 1m candle only
+    assert agg.late_count == 1
+    assert agg.open_candle('ETH_AURA', '5m').trades == 5
+
+
+def test_flush():
+    agg = CandleAggregator(intervals=[1, 60])
+    agg.add_trade('ETH_AURA', trade(1, 60, '2'))
+
+    assert agg.flush(now=61) == 1
+    assert agg.open_candle('ETH_AURA', 1) is None
+    assert agg.open_candle('ETH_AURA', 60) is not None
+
+
+@pytest.mark.asyncio
+async def test_candles():
+    router = EventRouter()
+    agg = CandleAggregator(intervals=['1s'])
+    agg.register(router)
+
+    router.resolve(MarketEvents.TRADES.value, 'ETH_AURA')(dict(
+        event=MarketEvents.TRADES.value,
+        room='ETH_AURA',
+        payload=dict(trades=[trade(1, 10, '1'), trade(2, 11, '2')])
+    ))
+
+    it = agg.candles(flush_interval=0.01)
+    first = await it.__anext__()
+    assert (first.start, first.close) == (10, D(1))
+    # the open candle is flushed by the wall clock
+    second = await asyncio.wait_for(it.__anext__(), 1)
+    assert (second.start, second.close) == (11, D(2))
+
+
+@pytest.mark.asyncio
+async def test_load():
+    # more trades of one second than a page, the cursor chains repeat a trade
+    trades = [trade(1, 60, '1'), trade(2, 61, '2'), trade(3, 61, '2'), trade(4, 61, '2'), trade(4, 61, '2'),
+              trade(5, 125, '3')]
+
+    async def iter_trade_history(**kwargs):
+        for t in trades:
+            yield t
+
+    public = Mock()
+    public.iter_trade_history = Mock(side_effect=iter_trade_history)
+    agg = CandleAggregator(public, intervals=['1m'])
+
+    assert await agg.load('ETH_AURA', start=0, count=2) == 5
+    public.iter_trade_history.assert_called_once_with(market='ETH_AURA', start=0, end=None, sort='asc', page_size=2)
+
+    closed = agg.closed_candles('ETH_AURA', '1m')
+    assert [(c.start, c.trades) for c in closed] == [(60, 4)]
+    assert agg.open_candle('ETH_AURA', '1m').start == 120
+    # history candles are not emitted
+    assert agg._closed.empty()
+
+
+@pytest.mark.asyncio
+async def test_candles_busy_market():
+    agg = CandleAggregator(intervals=['1s'])
+    agg.add_trade('ETH_QUIET', trade(1, 10, '1'))
+
+    async def busy():
+        for i in range(10000):
+            agg.add_trade('ETH_BUSY', trade(i, 1000 + i, '2'))
+            await asyncio.sleep(0.001)
+
+    async def quiet_candle():
+        async for candle in agg.candles(flush_interval=0.01):
+            if candle.market == 'ETH_QUIET':
+                return candle
+
+    producer = asyncio.ensure_future(busy())
+    try:
+        # the busy market closes a candle every millisecond, the quiet one is flushed anyway
+        candle = await asyncio.wait_for(quiet_candle(), 1)
+    finally:
+        producer.cancel()
+    assert (candle.start, candle.close) == (10, D(1))
+
+
+def test_late_trade_of_flushed_period():
+    agg = CandleAggregator(intervals=['1m'])
+    agg.add_trade('ETH_AURA', trade(1, 60, '1'))
+    assert agg.flush(now=121) == 1
+
+    agg.add_trade('ETH_AURA', trade(2, 70, '2'))
+    assert agg.open_candle('ETH_AURA', '1m') is None
+    assert agg.late_count == 1
+    assert agg.flush(now=200) == 0
+    assert agg._closed.qsize() == 1
+
+    agg.add_trade('ETH_AURA', trade(3, 130, '3'))
+    assert agg.open_candle('ETH_AURA', '1m').start == 120
+
+
+def test_closed_queue_bounded():
+    agg = CandleAggregator(intervals=['1s'], history_size=2)
+    for i in range(5):
+        agg.add_trade('ETH_AURA', trade(i, 10 + i, '1'))
+
+    assert agg._closed.qsize() == 2
+    assert agg.dropped_count == 2
+    assert agg._closed.get_nowait().start == 12
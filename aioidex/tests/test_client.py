@@ -4,6 +4,7 @@ from unittest.mock import patch
 import pytest
 from asynctest import CoroutineMock
 
+from aioidex.codecs import StdJsonCodec
 from aioidex.http.client import Client
 from aioidex.http.modules.public import Public
 from aioidex.http.network import Network
@@ -41,3 +42,10 @@ async def test_close_session(client: Client):
     with patch('aioidex.http.network.Network.close', new_callable=CoroutineMock) as m:
         await client.close(0.01)
         m.assert_awaited_once_with(0.01)
+
+
+@pytest.mark.asyncio
+async def test_codec():
+    c = Client(codec='json')
+    assert isinstance(c._http._codec, StdJsonCodec)
+    await c.close(0.01)
@@ -0,0 +1,53 @@
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from aioidex.codecs import get_codec, UjsonCodec, OrjsonCodec, StdJsonCodec, Codec, CODECS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson is an optional extra
+requires_orjson = pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+
+DATA = {'some': 'data', 'arr': [{'k1': 'v1'}, {'k2': 2}]}
+ENCODED = '{"some":"data","arr":[{"k1":"v1"},{"k2":2}]}'
+
+
+@pytest.mark.parametrize('name', [
+    pytest.param(name, marks=requires_orjson) if name == OrjsonCodec.name else name
+    for name in CODECS
+])
+def test_codec(name):
+    codec = get_codec(name)
+
+    assert isinstance(codec, Codec)
+    assert codec.name == name
+    assert codec.dumps(DATA) == ENCODED
+    assert codec.loads(ENCODED) == DATA
+    assert codec.loads(ENCODED.encode()) == DATA
+
+
+def test_get_codec():
+    assert isinstance(get_codec(), UjsonCodec)
+    assert isinstance(get_codec('json'), StdJsonCodec)
+
+    codec = StdJsonCodec()
+    assert get_codec(codec) is codec
+
+    with pytest.raises(ValueError):
+        get_codec('unknown')
+
+
+@requires_orjson
+def test_get_orjson_codec():
+    assert isinstance(get_codec('orjson'), OrjsonCodec)
+
+
+def test_orjson_missing():
+    with patch.dict(sys.modules, {'orjson': None}):
+        with pytest.raises(ImportError):
+            get_codec('orjson')
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from aioidex import Client
+from aioidex.http.network import Network
+
+
+@pytest.fixture()
+async def server():
+    async def handle(request: web.Request) -> web.Response:
+        await asyncio.sleep(0.01)
+        return web.json_response({'nonce': 1})
+
+    app = web.Application()
+    app.router.add_post('/returnNextNonce', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    yield 'http://127.0.0.1:{}'.format(site._server.sockets[0].getsockname()[1])
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_connector_options():
+    nw = Network(connector=dict(limit=7, limit_per_host=3, keepalive_timeout=5))
+    connector = nw._session.connector
+
+    assert connector.limit == 7
+    assert connector.limit_per_host == 3
+    assert connector._keepalive_timeout == 5
+    await nw.close(0.01)
+
+
+@pytest.mark.asyncio
+async def test_connection_reuse(server):
+    c = Client(coalesce=False, connector=dict(limit_per_host=2))
+    c._http._API_URL = server
+
+    for _ in range(5):
+        await c.public.next_nonce('0x0')
+
+    stats = c._http.connection_stats
+    assert stats['created'] == 1
+    assert stats['reused'] == 4
+    assert stats['reuse_ratio'] == 0.8
+    assert stats['idle'] == 1
+    assert stats['acquired'] == 0
+
+    await asyncio.gather(*(c.public.next_nonce('0x0') for _ in range(6)))
+
+    stats = c._http.connection_stats
+    assert stats['created'] == 2
+    assert stats['queued'] == 4
+    assert stats['queue_wait_seconds']['count'] == 4
+    assert stats['limit_per_host'] == 2
+
+    await c.close(0.01)
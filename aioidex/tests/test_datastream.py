@@ -2,13 +2,32 @@ import asyncio
 from logging import Logger
 
 import pytest
+import ujson
 import websockets
 from asynctest import CoroutineMock, Mock, MagicMock, patch
 from shortid import ShortId
 
 from aioidex import IdexDatastream
-from aioidex.exceptions import IdexDataStreamError, IdexResponseSidError, IdexHandshakeException
+from aioidex.exceptions import IdexDataStreamError, IdexResponseSidError, IdexHandshakeException, IdexRequestTimeout
+from aioidex.codecs import StdJsonCodec
+from aioidex.datastream.message import DatastreamMessage
+from aioidex.datastream.queue import OverflowPolicy
+from aioidex.datastream.router import EventRouter
 from aioidex.datastream.sub_manager import SubscriptionManager
+from aioidex.types.events import MarketEvents
+from aioidex.types.subscriptions import Category, Subscription
+
+
+class FakeWs:
+    closed = False
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def __aiter__(self):
+        for m in self.messages:
+            yield m
+        await asyncio.sleep(10)
 
 
 @pytest.fixture()
@@ -125,6 +144,50 @@ async def test_create_connection_rid(ds: IdexDatastream):
     assert result == 'somerid'
 
 
+@pytest.mark.asyncio
+async def test_request_connects_first(ds: IdexDatastream):
+    async def send(message):
+        ds._loop.call_soon(ds._resolve_request, {'rid': 'somerid', 'result': 'success'})
+
+    async def init():
+        # a new connection fails the responses expected so far
+        ds._cancel_requests()
+        ds._ws = Mock()
+        ds._ws.send = send
+
+    ds.init = init
+
+    assert (await ds.request('some_request', {'some': 'payload'}, 'somerid'))['rid'] == 'somerid'
+
+
+def test_cancel_requests(ds: IdexDatastream):
+    response = ds._expect_response('somerid')
+    ds._cancel_requests()
+
+    assert ds._requests == {}
+    # nobody awaits the response, its exception is not logged as never retrieved
+    assert not response._log_traceback
+    with pytest.raises(IdexDataStreamError):
+        response.result()
+
+
+@pytest.mark.asyncio
+async def test_on_reconnect(ds: IdexDatastream):
+    failing = Mock(side_effect=Exception('callback error'))
+    callback = Mock()
+    ds.on_reconnect(failing)
+    ds.on_reconnect(callback)
+    ds._restore_connection = CoroutineMock()
+    ds._logger.error = Mock()
+
+    await ds._reconnect()
+
+    ds._restore_connection.assert_awaited_once()
+    failing.assert_called_once_with(ds)
+    callback.assert_called_once_with(ds)
+    ds._logger.error.assert_called_once()
+
+
 def test_compose_message(ds: IdexDatastream):
     ds._set_sid('somesid')
     assert ds._compose_message('somerid', 'somerequest', {'some': 'payload'}) == dict(
@@ -140,9 +203,7 @@ async def test_listen(ds: IdexDatastream):
     msg_data = '{"payload":"{"some": "data"}"}'
 
     ds._check_connection = CoroutineMock()
-    ds._ws = MagicMock()
-    ds._ws.closed = False
-    ds._ws.__aiter__.return_value = (msg_data,)
+    ds._ws = FakeWs((msg_data,))
 
     processed_message = {'a': 'b'}
     ds._process_message: Mock = Mock()
@@ -406,3 +467,404 @@ def test_decode(ds: IdexDatastream):
     assert ds._decode('{"some":"data"}') == {'some': 'data'}
     assert ds._decode('{"payload": "{\\"some\\": \\"data\\"}"}') == {'payload': {'some': 'data'}}
     assert ds._decode('{"warnings": "[\\"warn1\\", \\"warn2\\"]"}') == {'warnings': ['warn1', 'warn2']}
+
+
+def test_process_message_routed(ds: IdexDatastream):
+    ds._sid = 'sid:one'
+    ds.router = EventRouter()
+    ds.router.add(MarketEvents.ORDERS, lambda m: ('handled', m['room']))
+    ds._check_warnings = Mock()
+
+    result = ds._process_message('{"sid": "sid:one", "event": "market_orders", "room": "ETH_AURA", "payload": "{}"}')
+
+    assert result == ('handled', 'ETH_AURA')
+    ds._check_warnings.assert_not_called()
+
+
+def test_process_message_unrouted(ds: IdexDatastream):
+    ds._sid = 'sid:one'
+    ds.router = EventRouter()
+    ds.router.add(MarketEvents.ORDERS, Mock())
+    ds._decode = Mock(return_value={'sid': 'sid:one', 'event': 'market_trades', 'room': 'ETH_AURA'})
+
+    assert ds._process_message('msg') is None
+    ds.router.resolve('market_orders').assert_not_called()
+
+
+def test_process_message_routed_sid(ds: IdexDatastream):
+    ds._sid = 'sid:one'
+    ds.router = EventRouter()
+
+    with pytest.raises(IdexResponseSidError):
+        ds._process_message('{"sid": "sid:another", "event": "market_trades", "payload": "{}"}')
+
+
+def test_process_message_routed_response(ds: IdexDatastream):
+    ds._sid = 'sid:one'
+    ds.router = EventRouter()
+
+    msg = ds._process_message('{"sid": "sid:one", "request": "handshake", "result": "success", "payload": "{}"}')
+
+    assert msg == {'sid': 'sid:one', 'request': 'handshake', 'result': 'success', 'payload': {}}
+
+
+@pytest.mark.asyncio
+async def test_listen_async_handler(ds: IdexDatastream):
+    async def handler(message):
+        return 'handled'
+
+    ds._check_connection = CoroutineMock()
+    ds._ws = FakeWs(('msg',))
+    ds._process_message = Mock(side_effect=lambda m: handler(m))
+
+    async for m in ds.listen():
+        assert m == 'handled'
+        break
+
+
+@pytest.mark.asyncio
+async def test_listen_slow_async_handler(ds: IdexDatastream):
+    release = asyncio.Event()
+
+    async def handler(message):
+        await release.wait()
+        return f'{message} handled'
+
+    ds._check_connection = CoroutineMock()
+    ds._ws = FakeWs(('slow', 'fast1', 'fast2'))
+    ds._process_message = Mock(side_effect=lambda m: handler(m) if m == 'slow' else m)
+
+    messages = ds.listen()
+    # the frames after the one of the slow handler are read meanwhile
+    assert await asyncio.wait_for(messages.__anext__(), 1) == 'fast1'
+    assert await asyncio.wait_for(messages.__anext__(), 1) == 'fast2'
+    release.set()
+    assert await asyncio.wait_for(messages.__anext__(), 1) == 'slow handled'
+    await messages.aclose()
+
+
+@pytest.mark.asyncio
+async def test_listen_handler_concurrency():
+    ds = IdexDatastream(handler_concurrency=1)
+    release = asyncio.Event()
+    processed = []
+
+    async def handler(message):
+        await release.wait()
+        return f'{message} handled'
+
+    def process_message(m):
+        processed.append(m)
+        return handler(m) if m.startswith('slow') else m
+
+    ds._check_connection = CoroutineMock()
+    ds._ws = FakeWs(('slow1', 'slow2', 'fast'))
+    ds._process_message = Mock(side_effect=process_message)
+
+    messages = ds.listen()
+    consumer = asyncio.ensure_future(messages.__anext__())
+    await asyncio.sleep(0.01)
+    # the reader waits for a running handler before scheduling another one
+    assert processed == ['slow1', 'slow2']
+    assert not consumer.done()
+
+    release.set()
+    assert await asyncio.wait_for(consumer, 1) == 'slow1 handled'
+    # the handler results are queued as they complete
+    assert sorted([await messages.__anext__() for _ in range(2)]) == ['fast', 'slow2 handled']
+    await messages.aclose()
+
+
+@pytest.mark.asyncio
+async def test_listen_async_handler_error(ds: IdexDatastream):
+    async def handler(message):
+        raise ValueError('handler failed')
+
+    ds._check_connection = CoroutineMock()
+    ds._ws = FakeWs(('msg',))
+    ds._process_message = Mock(side_effect=handler)
+
+    with pytest.raises(ValueError):
+        async for _ in ds.listen():
+            pass
+
+
+def test_decode_lazy(ds: IdexDatastream):
+    msg = ds._decode('{"sid": "sid:one", "payload": "{\\"some\\": \\"data\\"}"}')
+
+    assert isinstance(msg, DatastreamMessage)
+    assert not msg.is_decoded('payload')
+    assert msg['payload'] == {'some': 'data'}
+
+
+def test_codec():
+    ds = IdexDatastream(codec='json')
+
+    assert isinstance(ds._codec, StdJsonCodec)
+    assert ds._encode({'some': 'data'}) == '{"some":"data"}'
+    assert ds._decode(b'{"payload": "{\\"some\\": \\"data\\"}"}') == {'payload': {'some': 'data'}}
+
+
+@pytest.mark.asyncio
+async def test_listen_queue(ds: IdexDatastream):
+    ds._QUEUE_SIZE = 2
+    ds._OVERFLOW = OverflowPolicy.DROP_NEWEST
+
+    messages = [f'msg{i}' for i in range(5)]
+    drained = asyncio.Event()
+
+    def process_message(m):
+        if m == messages[-1]:
+            drained.set()
+        return m
+
+    ds._check_connection = CoroutineMock()
+    ds._ws = FakeWs(messages)
+    ds._process_message = Mock(side_effect=process_message)
+
+    async def slow_consumer():
+        async for m in ds.listen():
+            await drained.wait()
+            return m
+
+    first = asyncio.ensure_future(slow_consumer())
+    await asyncio.wait_for(drained.wait(), 1)
+
+    # the reader drains the socket ahead of the consumer
+    assert ds._process_message.call_count == len(messages)
+    assert ds.queue.dropped_count == 3
+    assert await first == 'msg0'
+
+
+@pytest.mark.asyncio
+async def test_listen_queue_reset(ds: IdexDatastream):
+    ds._check_connection = CoroutineMock()
+    ds._process_message = Mock(side_effect=lambda m: m)
+    ds._ws = FakeWs(['msg0', 'msg1'])
+
+    async for m in ds.listen():
+        assert m == 'msg0'
+        break
+    queue = ds.queue
+    assert len(queue) == 1
+
+    ds._ws = FakeWs(['msg2'])
+    async for m in ds.listen():
+        assert m == 'msg2'
+        break
+    assert ds.queue is not queue
+
+
+class FakeConnection:
+    '''Answers handshake and subscription requests like the datastream server does.'''
+
+    def __init__(self, sid, respond=True, events=()):
+        self.sid = sid
+        self.respond = respond
+        self.events = list(events)
+        self.frames = asyncio.Queue()
+        self.closed = False
+        self.sent = []
+
+    async def send(self, data):
+        message = ujson.loads(data)
+        self.sent.append(message)
+        if not self.respond:
+            return
+        if message['request'] == 'handshake':
+            response = dict(rid=message['rid'], sid=self.sid, request='handshake', result='success', payload='{}')
+        else:
+            for event in self.events:
+                self.frames.put_nowait(ujson.dumps(event))
+            payload = dict(message['payload'], events=message['payload']['events'])
+            response = dict(
+                rid=message['rid'], sid=self.sid, request=message['request'], result='success',
+                payload=ujson.dumps(payload)
+            )
+        self.frames.put_nowait(ujson.dumps(response))
+
+    async def recv(self):
+        return await self.frames.get()
+
+    async def close(self):
+        self.closed = True
+
+
+def market_sub():
+    return Subscription(Category.MARKET, [MarketEvents.ORDERS], ['ETH_AURA'])
+
+
+@pytest.mark.asyncio
+async def test_rotate(ds: IdexDatastream):
+    old_ws = FakeConnection('sid:old')
+    ds._ws = old_ws
+    ds._sid = 'sid:old'
+    ds.sub_manager.subscriptions = {Category.MARKET: market_sub()}
+
+    event = dict(sid='sid:new', eid='evt:1', event='market_orders', room='ETH_AURA', payload='{}')
+    new_ws = FakeConnection('sid:new', events=[event])
+    ds.create_connection = CoroutineMock(return_value=new_ws)
+
+    await ds.rotate()
+    await asyncio.sleep(0)
+
+    assert ds._ws is new_ws
+    assert ds._sid == 'sid:new'
+    assert old_ws.closed
+    assert not new_ws.closed
+    assert 'sid:old' in ds._retired_sids
+    assert [ujson.loads(f)['eid'] for f in ds._backlog] == ['evt:1']
+    assert [m['request'] for m in new_ws.sent] == ['handshake', Category.MARKET.value]
+    assert new_ws.sent[1]['sid'] == 'sid:new'
+    assert new_ws.sent[1]['payload'] == dict(action='subscribe', topics=['ETH_AURA'], events=['market_orders'])
+    assert ds.sub_manager.subscriptions[Category.MARKET].topics == ('ETH_AURA',)
+
+    # the retired connection frames are still accepted, events delivered by both connections are deduplicated
+    old_event = dict(event, sid='sid:old')
+    assert ds._process_message(ujson.dumps(old_event))['sid'] == 'sid:old'
+    assert ds._process_message(ujson.dumps(event)) is None
+    with pytest.raises(IdexResponseSidError):
+        ds._process_message(ujson.dumps(dict(event, sid='sid:another', eid='evt:2')))
+
+
+@pytest.mark.asyncio
+async def test_rotate_not_confirmed(ds: IdexDatastream):
+    ds._ROTATION_TIMEOUT = 0.01
+    old_ws = FakeConnection('sid:old')
+    ds._ws = old_ws
+    ds._sid = 'sid:old'
+    ds.sub_manager.subscriptions = {Category.MARKET: market_sub()}
+
+    new_ws = FakeConnection('sid:new')
+    new_ws._send = new_ws.send
+
+    async def send(data):
+        if ujson.loads(data)['request'] == 'handshake':
+            await new_ws._send(data)
+
+    new_ws.send = send
+    ds.create_connection = CoroutineMock(return_value=new_ws)
+
+    with pytest.raises(IdexDataStreamError):
+        await ds.rotate()
+
+    assert ds._ws is old_ws
+    assert ds._sid == 'sid:old'
+    assert new_ws.closed
+    assert not old_ws.closed
+
+
+@pytest.mark.asyncio
+async def test_reconnect_make_before_break(ds: IdexDatastream):
+    ds.rotate = CoroutineMock()
+    ds.init = CoroutineMock()
+
+    ds._MAKE_BEFORE_BREAK = True
+    await ds._reconnect()
+    ds.rotate.assert_awaited_once()
+    ds.init.assert_not_awaited()
+
+    ds._MAKE_BEFORE_BREAK = False
+    ds.sub_manager.resubscribe = CoroutineMock()
+    await ds._reconnect()
+    ds.init.assert_awaited_once()
+    ds.sub_manager.resubscribe.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_closes_old_connection(ds: IdexDatastream):
+    old_ws, new_ws = Mock(close=CoroutineMock()), Mock(close=CoroutineMock())
+    ds._ws = old_ws
+
+    async def init():
+        ds._ws = new_ws
+
+    ds.init = init
+    ds.sub_manager.resubscribe = CoroutineMock()
+    await ds._reconnect()
+    await asyncio.sleep(0)
+
+    old_ws.close.assert_awaited_once()
+    new_ws.close.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_is_duplicate(ds: IdexDatastream):
+    ds._start_dedup()
+
+    assert ds._is_duplicate({'eid': 'evt:1'}) is False
+    assert ds._is_duplicate({'eid': 'evt:1'}) is True
+    assert ds._is_duplicate({'request': 'handshake'}) is False
+
+    ds._dedup_deadline = ds._loop.time() - 1
+    assert ds._is_duplicate({'eid': 'evt:1'}) is False
+    assert ds._seen_eids is None
+
+
+@pytest.mark.asyncio
+async def test_request(ds: IdexDatastream):
+    ds._check_connection = CoroutineMock()
+    ds.send_message = CoroutineMock()
+
+    task = asyncio.ensure_future(ds.request('subscribeToMarkets', {'action': 'get'}, 'rid:1'))
+    await asyncio.sleep(0)
+
+    ds.send_message.assert_awaited_once_with('subscribeToMarkets', {'action': 'get'}, 'rid:1')
+    assert 'rid:1' in ds._requests
+
+    ds._sid = 'sid:one'
+    ds._process_message(
+        '{"rid": "rid:1", "sid": "sid:one", "request": "subscribeToMarkets", "result": "success", '
+        '"payload": "{\\"action\\": \\"get\\", \\"topics\\": []}"}'
+    )
+
+    response = await task
+    assert response['payload'] == {'action': 'get', 'topics': []}
+    assert ds._requests == {}
+
+
+@pytest.mark.asyncio
+async def test_request_error(ds: IdexDatastream):
+    ds._check_connection = CoroutineMock()
+    ds.send_message = CoroutineMock()
+    ds._sid = 'sid:one'
+
+    task = asyncio.ensure_future(ds.request('subscribeToMarkets', {}, 'rid:1'))
+    await asyncio.sleep(0)
+
+    # not raised by the reader, but by the awaiting caller
+    ds._process_message(
+        '{"rid": "rid:1", "sid": "sid:one", "request": "subscribeToMarkets", "result": "error", '
+        '"payload": "{\\"message\\": \\"some error\\"}"}'
+    )
+
+    with pytest.raises(IdexDataStreamError):
+        await task
+
+
+@pytest.mark.asyncio
+async def test_request_timeout(ds: IdexDatastream):
+    ds._check_connection = CoroutineMock()
+    ds.send_message = CoroutineMock()
+
+    with pytest.raises(IdexRequestTimeout):
+        await ds.request('subscribeToMarkets', {}, timeout=0.01)
+
+    assert ds._requests == {}
+
+
+@pytest.mark.asyncio
+async def test_init_cancels_requests(ds: IdexDatastream):
+    ds._check_connection = CoroutineMock()
+    ds.send_message = CoroutineMock()
+    ds._init_connection = CoroutineMock()
+    ds._shake_hand = CoroutineMock()
+
+    task = asyncio.ensure_future(ds.request('subscribeToMarkets', {}))
+    await asyncio.sleep(0)
+
+    await ds.init()
+
+    with pytest.raises(IdexDataStreamError):
+        await task
+    assert ds._requests == {}
@@ -0,0 +1,66 @@
+import ujson
+from asynctest import Mock
+
+from aioidex.datastream.message import DatastreamMessage
+
+
+def test_envelope():
+    msg = DatastreamMessage({'sid': 'sid:1', 'event': 'market_orders', 'payload': '{"a": 1}'}, ujson.loads)
+
+    assert msg['sid'] == 'sid:1'
+    assert msg.get('event') == 'market_orders'
+    assert msg.get('request') is None
+    assert len(msg) == 3
+    assert set(msg) == {'sid', 'event', 'payload'}
+
+
+def test_lazy_payload():
+    loads = Mock(side_effect=ujson.loads)
+    msg = DatastreamMessage({'sid': 'sid:1', 'payload': '{"a": 1}', 'warnings': '["w"]'}, loads)
+
+    assert 'payload' in msg
+    assert not msg.is_decoded('payload')
+    loads.assert_not_called()
+
+    assert msg['payload'] == {'a': 1}
+    assert msg['payload'] == {'a': 1}
+    loads.assert_called_once_with('{"a": 1}')
+    assert msg.is_decoded('payload')
+
+    assert msg.get('warnings') == ['w']
+    assert loads.call_count == 2
+
+
+def test_decoded_payload():
+    loads = Mock()
+    msg = DatastreamMessage({'payload': {'a': 1}}, loads)
+
+    assert msg.is_decoded('payload')
+    assert msg['payload'] == {'a': 1}
+    loads.assert_not_called()
+
+
+def test_string_payload_decoded_once():
+    msg = DatastreamMessage({'payload': '"\\"nested\\""'}, ujson.loads)
+
+    assert msg['payload'] == '"nested"'
+    assert msg['payload'] == '"nested"'
+
+
+def test_eq():
+    msg = DatastreamMessage({'payload': '{"a": 1}'}, ujson.loads)
+
+    assert msg == {'payload': {'a': 1}}
+    assert {'payload': {'a': 1}} == msg
+    assert dict(msg) == {'payload': {'a': 1}}
+
+
+def test_get():
+    msg = DatastreamMessage({'event': 'market_orders', 'payload': '{"a": 1}'}, ujson.loads)
+
+    assert msg.get('event') == 'market_orders'
+    assert msg.get('room') is None
+    assert msg.get('room', '') == ''
+    assert not msg.is_decoded('payload')
+    assert msg.get('payload') == {'a': 1}
+    assert msg.get('warnings', ()) == ()
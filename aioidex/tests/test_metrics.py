@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+import pytest
+import ujson
+from asynctest import CoroutineMock
+
+from aioidex import IdexDatastream
+from aioidex.datastream.message import DatastreamMessage
+from aioidex.datastream.metrics import DatastreamMetrics
+from aioidex.histogram import Histogram
+from aioidex.testing.server import DatastreamServer
+from aioidex.types.events import MarketEvents
+from aioidex.types.subscriptions import MarketSubscription
+
+
+def message(data):
+    return DatastreamMessage(data, ujson.loads)
+
+
+def test_histogram():
+    h = Histogram([0.1, 1])
+    for value in (0.05, 0.1, 0.5, 5):
+        h.observe(value)
+
+    assert h.count == 4
+    assert h.sum == pytest.approx(5.65)
+    assert h.cumulative() == [('0.1', 2), ('1', 3), ('+Inf', 4)]
+
+
+def test_count_message():
+    metrics = DatastreamMetrics(lag_sample=0)
+    metrics.count_message(message(dict(event='market_orders', room='ETH_AURA', payload='{}')), 10)
+    metrics.count_message(message(dict(event='market_orders', room='ETH_AURA', payload='{}')), 20)
+    metrics.count_message(message(dict(request='subscribeToMarkets', payload='{}')), 5)
+
+    assert metrics.messages == {('market_orders', 'ETH_AURA'): 2, ('subscribeToMarkets', ''): 1}
+    assert metrics.bytes[('market_orders', 'ETH_AURA')] == 30
+    assert metrics.snapshot()['messages'] == {'market_orders:ETH_AURA': 2, 'subscribeToMarkets': 1}
+
+
+def test_lag():
+    metrics = DatastreamMetrics(lag_sample=2)
+    now = time.time()
+    for timestamp in (now - 10, now - 5, (now - 3) * 1000):
+        msg = message(dict(event='market_trades', room='ETH_AURA',
+                           payload=ujson.dumps(dict(trades=[dict(timestamp=timestamp)]))))
+        metrics.count_message(msg, 1)
+        # not sampled messages aren't decoded
+        assert msg.is_decoded('payload') == (metrics._events % 2 == 0)
+
+    assert metrics.lag.count == 1
+    assert metrics.lag.sum == pytest.approx(5, abs=1)
+
+
+def test_prometheus():
+    metrics = DatastreamMetrics(prefix='ds')
+    metrics.count_message(message(dict(event='market_orders', room='ETH_"X"', payload='{}')), 10)
+    metrics.decode.observe(0.0001)
+    metrics.observe_reconnect(1.5)
+
+    text = metrics.prometheus()
+    assert 'ds_messages_total{event="market_orders",topic="ETH_\\"X\\""} 1\n' in text
+    assert '# TYPE ds_decode_seconds histogram\n' in text
+    assert 'ds_decode_seconds_bucket{le="+Inf"} 1\n' in text
+    assert 'ds_decode_seconds_count 1\n' in text
+    assert 'ds_reconnects_total 1\n' in text
+    assert 'ds_downtime_seconds_total 1.5\n' in text
+
+
+@pytest.mark.asyncio
+async def test_observe_ping():
+    ds = IdexDatastream(metrics=DatastreamMetrics())
+    pong = asyncio.Future()
+    pong.set_result(None)
+    await ds._observe_ping(pong, time.perf_counter(), 1)
+    assert ds.metrics.ping_rtt.count == 1
+    assert ds.metrics.alive_at is not None
+
+    await ds._observe_ping(asyncio.Future(), time.perf_counter(), 0.01)
+    assert ds.metrics.ping_rtt.count == 1
+
+
+@pytest.mark.asyncio
+async def test_frame_bytes():
+    ds = IdexDatastream(metrics=DatastreamMetrics(lag_sample=0))
+    ds._set_sid('sid:1')
+    frame = ujson.dumps(dict(sid='sid:1', event='market_orders', room='ETH_AURA', payload='{"name": "\u00e9\u00e9"}'),
+                        ensure_ascii=False)
+
+    ds._process_message(frame)
+    ds._process_message(frame.encode())
+
+    # the wire size, not the number of characters
+    assert len(frame.encode()) > len(frame)
+    assert ds.metrics.bytes[('market_orders', 'ETH_AURA')] == 2 * len(frame.encode())
+
+    ascii_frame = ujson.dumps(dict(sid='sid:1', event='market_orders', room='ETH_KIN', payload='{"name": "e"}'))
+    ds._process_message(ascii_frame)
+    assert ds.metrics.bytes[('market_orders', 'ETH_KIN')] == len(ascii_frame)
+
+
+@pytest.mark.asyncio
+async def test_reconnect_downtime():
+    ds = IdexDatastream(metrics=DatastreamMetrics())
+    ds._restore_connection = CoroutineMock()
+
+    # the loss is detected 2 seconds after the last frame
+    ds.metrics.alive_at = time.time() - 2
+    await ds._reconnect()
+
+    assert ds.metrics.reconnect_count == 1
+    assert ds.metrics.downtime == pytest.approx(2, abs=0.5)
+
+
+@pytest.mark.asyncio
+async def test_datastream_metrics():
+    snapshots = []
+    metrics = DatastreamMetrics(callback=snapshots.append, interval=0.05)
+
+    async with DatastreamServer(rate=1000) as server:
+        ds = IdexDatastream(ws_endpoint=server.url, metrics=metrics)
+        await ds.init()
+        await ds.sub_manager.subscribe(MarketSubscription([MarketEvents.ORDERS], ['ETH_AURA']))
+
+        received = 0
+        listen = ds.listen()
+        async for m in listen:
+            received += 1
+            if received == 20:
+                server.change_sid()
+            if snapshots and ds.metrics.reconnect_count:
+                break
+        await listen.aclose()
+        await ds._ws.close()
+
+    assert metrics.handshake.count == 2
+    assert metrics.reconnect_count == 1
+    assert metrics.downtime > 0
+    assert metrics.messages[('market_orders', 'ETH_AURA')] >= 20
+    assert metrics.decode.count == sum(metrics.messages.values())
+    # the frame of the changed sid raised before its processing completed
+    assert metrics.process.count == metrics.decode.count - 1
+    assert snapshots[0]['messages']
@@ -0,0 +1,89 @@
+import sys
+
+import pytest
+import ujson
+
+from aioidex import IdexDatastream
+from aioidex.datastream.message import DatastreamMessage
+from aioidex.testing.server import DatastreamServer
+from aioidex.types.events import MarketEvents, AccountEvents, ChainEvents
+from aioidex.types.models import to_event, EventMessage, OrderEvent, Trade, Cancel, BalanceSheet, Nonce, ServerBlock
+from aioidex.types.subscriptions import MarketSubscription
+
+
+def message(event, payload, room='ETH_AURA'):
+    return DatastreamMessage(
+        dict(event=event, room=room, sid='sid:1', eid='evt:1', seq=7, payload=ujson.dumps(payload)), ujson.loads
+    )
+
+
+def test_orders():
+    e = to_event(message(MarketEvents.ORDERS.value, dict(market='ETH_AURA', orders=[
+        dict(orderHash='0x1', price='0.1', amount='5', total='0.5', type='buy', user='0xu', createdAt=100),
+    ])))
+
+    assert isinstance(e, EventMessage)
+    assert (e.event, e.topic, e.sid, e.eid, e.seq) == (MarketEvents.ORDERS.value, 'ETH_AURA', 'sid:1', 'evt:1', 7)
+    order, = e.data
+    assert isinstance(order, OrderEvent)
+    assert (order.hash, order.market, order.side, order.price, order.amount, order.total, order.user,
+            order.timestamp) == ('0x1', 'ETH_AURA', 'buy', '0.1', '5', '0.5', '0xu', 100)
+
+
+def test_trades_and_cancels():
+    trade, = to_event(message(AccountEvents.TRADES.value, dict(trades=[
+        dict(tid=5, orderHash='0x1', market='ETH_KIN', type='sell', price='0.2', amount='1', timestamp=10,
+             transactionHash='0xt'),
+    ]))).data
+    assert isinstance(trade, Trade)
+    assert (trade.tid, trade.market, trade.side, trade.transaction_hash, trade.maker) == (5, 'ETH_KIN', 'sell', '0xt',
+                                                                                         None)
+
+    cancel, = to_event(message(MarketEvents.CANCELS.value, dict(market='ETH_AURA', cancels=[
+        dict(id=3, orderHash='0x1'),
+    ]))).data
+    assert isinstance(cancel, Cancel)
+    assert (cancel.id, cancel.hash, cancel.market) == (3, '0x1', 'ETH_AURA')
+
+
+def test_single_models():
+    sheet = to_event(message(AccountEvents.BALANCE_SHEET.value, dict(account='0xa', balances=dict(ETH='1')))).data
+    assert isinstance(sheet, BalanceSheet) and sheet.balances == dict(ETH='1')
+
+    nonce = to_event(message(AccountEvents.NONCE.value, dict(account='0xa', nonce=42))).data
+    assert isinstance(nonce, Nonce) and nonce.nonce == 42
+
+    block = to_event(message(ChainEvents.SERVER_BLOCK.value, dict(chain='eth', currentBlock=100))).data
+    assert isinstance(block, ServerBlock) and block.block == 100
+
+
+def test_no_model():
+    assert to_event(message(ChainEvents.GAS_PRICE.value, dict(value='1'))).data == dict(value='1')
+    assert to_event(DatastreamMessage(dict(request='handshake', payload='{}'), ujson.loads)) is None
+
+
+def test_slots():
+    order = OrderEvent('0x1', 'ETH_AURA', 'buy', '0.1', '5')
+    assert not hasattr(order, '__dict__')
+    assert sys.getsizeof(order) < sys.getsizeof(dict(orderHash='0x1', market='ETH_AURA', type='buy', price='0.1',
+                                                     amount='5', total=None, user=None, timestamp=None))
+    with pytest.raises(AttributeError):
+        order.unknown = 1
+
+
+@pytest.mark.asyncio
+async def test_listen_typed():
+    async with DatastreamServer(rate=1000) as server:
+        ds = IdexDatastream(ws_endpoint=server.url)
+        await ds.init()
+        await ds.sub_manager.subscribe(MarketSubscription([MarketEvents.TRADES], ['ETH_AURA']))
+
+        listen = ds.listen(typed=True)
+        async for m in listen:
+            if isinstance(m, EventMessage):
+                break
+        await listen.aclose()
+        await ds._ws.close()
+
+    assert m.event == MarketEvents.TRADES.value
+    assert all(isinstance(t, Trade) and t.market == 'ETH_AURA' for t in m.data)
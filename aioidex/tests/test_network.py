@@ -2,7 +2,6 @@ import asyncio
 
 import aiohttp
 import pytest
-from aiohttp import ContentTypeError
 from asynctest import CoroutineMock, MagicMock, patch, Mock
 
 from aioidex.exceptions import IdexClientContentTypeError, IdexClientApiError
@@ -20,6 +19,13 @@ async def nw():
     await nw.close(0.01)
 
 
+@pytest.fixture()
+async def coalescing_nw():
+    nw = Network(coalesce=True)
+    yield nw
+    await nw.close(0.01)
+
+
 @pytest.mark.asyncio
 async def test_init():
     myloop = get_loop()
@@ -106,32 +112,51 @@ async def test_handle_response(nw: Network):
     return_value = {'some': 'response'}
 
     response = CoroutineMock()
-    response.json = CoroutineMock()
-    response.json.return_value = return_value
+    response.content_type = 'application/json'
+    response.read = CoroutineMock()
+    response.read.return_value = b'{"some": "response"}'
 
     nw._raise_if_error = Mock()
     nw._raise_if_error.return_value = return_value
 
     result = await nw._handle_response(response)
 
-    response.json.assert_awaited_once()
+    response.read.assert_awaited_once()
     nw._raise_if_error.assert_called_once_with(return_value)
 
     assert result == {'some': 'response'}
 
 
+@pytest.mark.asyncio
+async def test_handle_response_codec():
+    nw = Network(codec='json')
+    nw._codec = Mock()
+    nw._codec.loads.return_value = {'some': 'response'}
+
+    response = CoroutineMock()
+    response.content_type = 'application/vnd.api+json'
+    response.read = CoroutineMock(return_value=b'{"some": "response"}')
+
+    assert await nw._handle_response(response) == {'some': 'response'}
+    nw._codec.loads.assert_called_once_with(b'{"some": "response"}')
+
+    await nw.close(0.01)
+
+
 @pytest.mark.asyncio
 async def test_handle_response_content_type_error(nw: Network):
     response = CoroutineMock()
     response.status = 123
+    response.content_type = 'text/html'
     response.text = CoroutineMock()
     response.text.return_value = 'some content'
-    response.json = CoroutineMock()
-    response.json.side_effect = ContentTypeError(None, None)
+    response.read = CoroutineMock()
 
     with pytest.raises(IdexClientContentTypeError):
         await nw._handle_response(response)
 
+    response.read.assert_not_awaited()
+
 
 @pytest.mark.asyncio
 async def test_raise_if_error(nw: Network):
@@ -149,3 +174,102 @@ async def test_post(nw: Network):
     await nw.post('somepath', {'some': 'data'})
 
     nw._request_api.assert_awaited_once_with(HttpMethod.POST, 'somepath', {'some': 'data'})
+
+
+@pytest.mark.asyncio
+async def test_request_coalesce(coalescing_nw: Network):
+    release = asyncio.Event()
+
+    async def send(method, url, data=None, page=False):
+        await release.wait()
+        return {'url': url, 'data': data}
+
+    coalescing_nw._send = CoroutineMock(side_effect=send)
+
+    tasks = [
+        asyncio.ensure_future(coalescing_nw._request(HttpMethod.POST, 'someurl', {'a': 1, 'b': 2})) for _ in range(10)
+    ]
+    tasks.append(asyncio.ensure_future(coalescing_nw._request(HttpMethod.POST, 'someurl', {'b': 2, 'a': 1})))
+    other = asyncio.ensure_future(coalescing_nw._request(HttpMethod.POST, 'someurl', {'a': 2}))
+    await asyncio.sleep(0)
+    assert coalescing_nw.stats['in_flight'] == 2
+
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert all(r is results[0] for r in results)
+    assert (await other)['data'] == {'a': 2}
+    assert coalescing_nw._send.await_count == 2
+    assert coalescing_nw.stats == {'requests': 2, 'coalesced': 10, 'in_flight': 0}
+
+    await coalescing_nw._request(HttpMethod.POST, 'someurl', {'a': 1, 'b': 2})
+    assert coalescing_nw._send.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_request_coalesce_exception(coalescing_nw: Network):
+    release = asyncio.Event()
+
+    async def send(method, url, data=None, page=False):
+        await release.wait()
+        raise IdexClientApiError('some error')
+
+    coalescing_nw._send = CoroutineMock(side_effect=send)
+
+    tasks = [asyncio.ensure_future(coalescing_nw._request(HttpMethod.POST, 'someurl')) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(r, IdexClientApiError) for r in results)
+    coalescing_nw._send.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_request_coalesce_cancel(coalescing_nw: Network):
+    release = asyncio.Event()
+
+    async def send(method, url, data=None, page=False):
+        await release.wait()
+        return 'result'
+
+    coalescing_nw._send = CoroutineMock(side_effect=send)
+
+    first = asyncio.ensure_future(coalescing_nw._request(HttpMethod.POST, 'someurl'))
+    second = asyncio.ensure_future(coalescing_nw._request(HttpMethod.POST, 'someurl'))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == 'result'
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_request_no_coalesce():
+    nw = Network()
+    nw._send = CoroutineMock(return_value='result')
+
+    await asyncio.gather(*(nw._request(HttpMethod.POST, 'someurl') for _ in range(3)))
+    assert nw._send.await_count == 3
+    assert nw.stats['coalesced'] == 0
+
+    await nw.close(0.01)
+
+
+@pytest.mark.asyncio
+async def test_post_page(nw: Network):
+    class MagicMockContext(MagicMock):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            response = Mock()
+            response.headers = {'idex-next-cursor': '123'}
+            type(self).__aenter__ = CoroutineMock(return_value=response)
+            type(self).__aexit__ = CoroutineMock(return_value=MagicMock())
+
+    nw._handle_response = CoroutineMock(return_value=[{'tid': 1}])
+    nw._API_URL = 'someurl'
+
+    with patch('aiohttp.ClientSession.post', new_callable=MagicMockContext) as m:
+        assert await nw.post_page('returnTradeHistory', {'count': 1}) == ([{'tid': 1}], '123')
+        m.assert_called_once_with('someurl/returnTradeHistory', data={'count': 1})
@@ -0,0 +1,170 @@
+from decimal import Decimal as D
+
+import pytest
+
+from aioidex.orderbook.book import OrderBook, BookSide, Side
+
+
+@pytest.fixture()
+def book():
+    b = OrderBook('ETH_AURA')
+    b.add_order('b1', Side.BID, '0.1', '10')
+    b.add_order('b2', 'buy', '0.2', '5')
+    b.add_order('b3', Side.BID, '0.2', '1')
+    b.add_order('a1', Side.ASK, '0.3', '7')
+    b.add_order('a2', 'sell', '0.4', '2')
+    yield b
+
+
+def test_book_side_bids():
+    side = BookSide(Side.BID)
+    for price in ('3', '1', '2'):
+        side.add(D(price), D(1))
+
+    assert side.best() == (D(3), D(1))
+    assert side.levels() == [(D(3), D(1)), (D(2), D(1)), (D(1), D(1))]
+    assert side.levels(2) == [(D(3), D(1)), (D(2), D(1))]
+
+
+def test_book_side_asks():
+    side = BookSide(Side.ASK)
+    for price in ('3', '1', '2'):
+        side.add(D(price), D(1))
+
+    assert side.best() == (D(1), D(1))
+    assert side.levels(2) == [(D(1), D(1)), (D(2), D(1))]
+
+
+def test_book_side_reduce():
+    side = BookSide(Side.ASK)
+    side.add(D(1), D(5))
+    side.add(D(1), D(3))
+
+    side.reduce(D(1), D(3), remove_order=True)
+    assert side.amount(D(1)) == D(5)
+    assert side.orders(D(1)) == 1
+
+    side.reduce(D(1), D(2))
+    assert side.amount(D(1)) == D(3)
+
+    side.reduce(D(1), D(3), remove_order=True)
+    assert D(1) not in side
+    assert len(side) == 0
+    assert side.best() is None
+
+    side.reduce(D(2), D(1))
+
+
+def test_book_side_stale_levels():
+    side = BookSide(Side.BID)
+    for price in range(1, 201):
+        side.add(D(price), D(1))
+
+    # the best levels are removed, then re-added
+    for price in range(200, 100, -1):
+        side.reduce(D(price), D(1), remove_order=True)
+        assert side.best() == (D(price - 1), D(1))
+    side.add(D(150), D(2))
+    assert side.best() == (D(150), D(2))
+
+    # the deep levels are removed, the stale prices don't pile up
+    for price in range(1, 100):
+        side.reduce(D(price), D(1), remove_order=True)
+    assert len(side) == 2
+    assert len(side._heap) <= 2 * len(side) + BookSide._STALE_SLACK
+    assert side.levels() == [(D(150), D(2)), (D(100), D(1))]
+    assert side.best() == (D(150), D(2))
+
+    side.reduce(D(150), D(2), remove_order=True)
+    assert side.best() == (D(100), D(1))
+
+
+def test_top_of_book(book: OrderBook):
+    assert book.best_bid == (D('0.2'), D(6))
+    assert book.best_ask == (D('0.3'), D(7))
+    assert book.spread == D('0.1')
+    assert len(book) == 5
+    assert 'b1' in book
+
+
+def test_depth(book: OrderBook):
+    assert book.depth(1) == dict(bids=[(D('0.2'), D(6))], asks=[(D('0.3'), D(7))])
+    assert book.depth() == dict(
+        bids=[(D('0.2'), D(6)), (D('0.1'), D(10))],
+        asks=[(D('0.3'), D(7)), (D('0.4'), D(2))],
+    )
+
+
+def test_remove_order(book: OrderBook):
+    order = book.remove_order('b2')
+
+    assert order.hash == 'b2'
+    assert book.best_bid == (D('0.2'), D(1))
+
+    book.remove_order('b3')
+    assert book.best_bid == (D('0.1'), D(10))
+
+    assert book.remove_order('unknown') is None
+
+
+def test_fill_order(book: OrderBook):
+    book.fill_order('a1', '3')
+    assert book.best_ask == (D('0.3'), D(4))
+    assert book.order('a1').amount == D(4)
+
+    book.fill_order('a1', '10')
+    assert 'a1' not in book
+    assert book.best_ask == (D('0.4'), D(2))
+
+    assert book.fill_order('unknown', 1) is None
+
+
+def test_replace_order(book: OrderBook):
+    book.add_order('b1', Side.BID, '0.15', '1')
+
+    assert book.depth()['bids'] == [(D('0.2'), D(6)), (D('0.15'), D(1))]
+
+
+def test_empty_book():
+    book = OrderBook('ETH_AURA')
+
+    assert book.best_bid is None
+    assert book.spread is None
+
+    book.add_order('b1', Side.BID, '0.1', '0')
+    assert len(book) == 0
+
+
+def test_load_snapshot(book: OrderBook):
+    book.load_snapshot(dict(
+        asks=[dict(orderHash='x1', price='0.5', amount='1', total='0.5')],
+        bids=[dict(orderHash='x2', price='0.05', amount='2', total='0.1')],
+    ))
+
+    assert len(book) == 2
+    assert book.best_ask == (D('0.5'), D(1))
+    assert book.best_bid == (D('0.05'), D(2))
+
+
+def test_fill_order_tid(book: OrderBook):
+    book.fill_order('b1', '2', tid=1)
+    book.fill_order('b1', '2', tid=1)
+    assert book.order('b1').amount == D(8)
+
+    book.fill_order('b1', '2')
+    book.fill_order('b1', '2')
+    assert book.order('b1').amount == D(4)
+
+
+def test_replace(book: OrderBook):
+    other = OrderBook('ETH_AURA')
+    other.add_order('a9', Side.ASK, '0.5', '1')
+    other.fill_order('a9', '0.5', tid=1)
+
+    book.replace(other)
+    assert book.best_bid is None
+    assert book.best_ask == (D('0.5'), D('0.5'))
+    assert 'a9' in book and 'b1' not in book
+
+    book.fill_order('a9', '0.5', tid=1)
+    assert book.best_ask == (D('0.5'), D('0.5'))
@@ -0,0 +1,283 @@
+import asyncio
+from decimal import Decimal as D
+
+import pytest
+from asynctest import CoroutineMock, Mock
+
+from aioidex.datastream.router import EventRouter
+from aioidex.orderbook.manager import OrderBookManager
+from aioidex.types.events import MarketEvents, ChainEvents
+
+SNAPSHOT = dict(
+    asks=[dict(orderHash='a1', price='0.3', amount='7')],
+    bids=[dict(orderHash='b1', price='0.2', amount='5')],
+)
+
+
+def event(name, payload, market='ETH_AURA'):
+    return dict(event=name, room=market, payload=dict(payload, market=market))
+
+
+@pytest.fixture()
+async def manager():
+    public = Mock()
+    public.order_book = CoroutineMock(return_value=SNAPSHOT)
+    m = OrderBookManager(public, snapshot_depth=50)
+    await m.load(['ETH_AURA'])
+    yield m
+
+
+@pytest.mark.asyncio
+async def test_load(manager: OrderBookManager):
+    manager._public.order_book.assert_awaited_once_with('ETH_AURA', 50)
+    assert 'ETH_AURA' in manager
+    assert manager['ETH_AURA'].best_bid == (D('0.2'), D(5))
+    assert manager.book('ETH_KIN') is None
+
+
+@pytest.mark.asyncio
+async def test_orders(manager: OrderBookManager):
+    manager.process(event(MarketEvents.ORDERS.value, dict(orders=[
+        dict(orderHash='b2', type='buy', price='0.25', amount='1'),
+        dict(hash='a2', type='sell', price='0.28', amount='2'),
+    ])))
+
+    book = manager['ETH_AURA']
+    assert book.best_bid == (D('0.25'), D(1))
+    assert book.best_ask == (D('0.28'), D(2))
+
+
+@pytest.mark.asyncio
+async def test_cancels(manager: OrderBookManager):
+    manager.process(event(MarketEvents.CANCELS.value, dict(cancels=[dict(orderHash='b1')])))
+
+    assert manager['ETH_AURA'].best_bid is None
+
+
+@pytest.mark.asyncio
+async def test_trades(manager: OrderBookManager):
+    manager.process(event(MarketEvents.TRADES.value, dict(trades=[dict(orderHash='a1', amount='2', type='buy')])))
+
+    assert manager['ETH_AURA'].best_ask == (D('0.3'), D(5))
+
+
+@pytest.mark.asyncio
+async def test_unknown_market_and_event(manager: OrderBookManager):
+    manager.process(event(MarketEvents.CANCELS.value, dict(cancels=[dict(orderHash='b1')]), market='ETH_KIN'))
+    manager.process(event(MarketEvents.LISTING.value, dict()))
+
+    assert len(manager['ETH_AURA']) == 2
+
+
+@pytest.mark.asyncio
+async def test_register(manager: OrderBookManager):
+    router = EventRouter()
+    manager.register(router)
+
+    for e in (MarketEvents.ORDERS, MarketEvents.CANCELS, MarketEvents.TRADES):
+        assert router.resolve(e.value, 'ETH_AURA') == manager.process
+    assert router.resolve(ChainEvents.SERVER_BLOCK.value, 'ETH') == manager.process
+
+    router = EventRouter()
+    manager.register(router, ['ETH_AURA'])
+    assert router.resolve(MarketEvents.ORDERS.value, 'ETH_AURA') == manager.process
+    assert router.resolve(MarketEvents.ORDERS.value, 'ETH_KIN') is None
+
+
+def resync_snapshot():
+    return dict(
+        asks=[dict(orderHash='a9', price='0.35', amount='1')],
+        bids=[dict(orderHash='b1', price='0.2', amount='5'), dict(orderHash='b9', price='0.1', amount='1')],
+    )
+
+
+@pytest.mark.asyncio
+async def test_unknown_trade_resync(manager: OrderBookManager):
+    stale = manager['ETH_AURA']
+    snapshot_future = asyncio.get_event_loop().create_future()
+    manager._public.order_book = CoroutineMock(side_effect=lambda *args: snapshot_future)
+
+    manager.process(event(MarketEvents.TRADES.value, dict(trades=[dict(orderHash='zz', amount='1')])))
+
+    assert stale.stale
+    assert manager.gap_count == 1
+    assert manager.stats['resyncing'] == 1
+    await asyncio.sleep(0)
+
+    # buffered while the snapshot is fetched, applied to the stale book as well
+    manager.process(event(MarketEvents.CANCELS.value, dict(cancels=[dict(orderHash='b9')])))
+    manager.process(event(MarketEvents.TRADES.value, dict(trades=[dict(orderHash='yy', amount='1')])))
+    assert manager.gap_count == 1
+
+    snapshot_future.set_result(resync_snapshot())
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    # the content is swapped in place
+    book = manager['ETH_AURA']
+    assert book is stale
+    assert not book.stale
+    assert book.resync_count == 1
+    assert book.best_bid == (D('0.2'), D(5))
+    assert 'b9' not in book
+    assert book.best_ask == (D('0.35'), D(1))
+    assert manager.stats['resyncing'] == 0
+    assert manager.stats['books']['ETH_AURA']['resyncs'] == 1
+
+
+@pytest.mark.asyncio
+async def test_resync_retry(manager: OrderBookManager):
+    manager._RESYNC_RETRY_DELAY = 0
+    manager._public.order_book = CoroutineMock(side_effect=[Exception('http error'), resync_snapshot()])
+
+    manager.suspect_gap('ETH_AURA')
+    await asyncio.sleep(0.01)
+
+    assert manager._public.order_book.await_count == 2
+    assert manager['ETH_AURA'].best_ask == (D('0.35'), D(1))
+
+
+@pytest.mark.asyncio
+async def test_gap_during_resync(manager: OrderBookManager):
+    manager._public.order_book = CoroutineMock(return_value=resync_snapshot())
+
+    manager.suspect_gap('ETH_AURA')
+    manager.suspect_gap('ETH_AURA')
+    await asyncio.sleep(0.01)
+
+    assert manager._public.order_book.await_count == 2
+    assert manager['ETH_AURA'].resync_count == 2
+
+
+@pytest.mark.asyncio
+async def test_resync_drops_covered_deltas(manager: OrderBookManager):
+    snapshot_future = asyncio.get_event_loop().create_future()
+    manager._public.order_book = CoroutineMock(side_effect=lambda *args: snapshot_future)
+
+    # received before the snapshot request, the snapshot covers it
+    manager.suspect_gap('ETH_AURA')
+    manager.process(event(MarketEvents.TRADES.value, dict(trades=[dict(orderHash='b1', amount='1', tid=1)])))
+    await asyncio.sleep(0)
+
+    # received while the snapshot is in flight, it may cover them as well
+    manager.process(event(MarketEvents.ORDERS.value, dict(orders=[
+        dict(orderHash='b9', type='buy', price='0.1', amount='5'),
+        dict(orderHash='b8', type='buy', price='0.15', amount='2'),
+    ])))
+    manager.process(event(MarketEvents.TRADES.value, dict(trades=[dict(orderHash='b8', amount='1', tid=2)])))
+    manager.process(event(MarketEvents.TRADES.value, dict(trades=[dict(orderHash='b8', amount='1', tid=2)])))
+    manager.process(event(MarketEvents.CANCELS.value, dict(cancels=[dict(orderHash='a9')])))
+
+    snapshot_future.set_result(resync_snapshot())
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    book = manager['ETH_AURA']
+    assert book.resync_count == 1
+    # the trade 1 is not replayed
+    assert book.order('b1').amount == D(5)
+    # the order of the snapshot is kept as is
+    assert book.order('b9').amount == D(1)
+    # the order missing in the snapshot is added, its trade applied once
+    assert book.order('b8').amount == D(1)
+    assert 'a9' not in book
+    assert manager.gap_count == 1
+    assert manager.stats['snapshot_races'] == 0
+
+
+@pytest.mark.asyncio
+async def test_resync_fill_during_snapshot(manager: OrderBookManager):
+    manager._RESYNC_RETRY_DELAY = 0
+    manager.process(event(MarketEvents.ORDERS.value, dict(orders=[
+        dict(orderHash='a2', type='sell', price='0.4', amount='10'),
+    ])))
+
+    snapshot_future = asyncio.get_event_loop().create_future()
+    filled = dict(asks=[dict(orderHash='a2', price='0.4', amount='6')], bids=[])
+    snapshots = [snapshot_future, filled]
+    manager._public.order_book = CoroutineMock(side_effect=lambda *args: snapshots.pop(0))
+
+    manager.suspect_gap('ETH_AURA')
+    await asyncio.sleep(0)
+
+    # the fill lands between the subscription and the snapshot, which already counts it
+    manager.process(event(MarketEvents.TRADES.value, dict(trades=[dict(orderHash='a2', amount='4', tid=5)])))
+    snapshot_future.set_result(filled)
+    await asyncio.sleep(0.01)
+
+    book = manager['ETH_AURA']
+    assert manager._public.order_book.await_count == 2
+    assert book.order('a2').amount == D(6)
+    assert not book.stale
+    assert book.resync_count == 1
+    assert manager.stats['snapshot_races'] == 1
+
+
+@pytest.mark.asyncio
+async def test_reconnect(manager: OrderBookManager):
+    ds = Mock()
+    recovered = asyncio.get_event_loop().create_future()
+    ds.sub_manager.wait_recovered = CoroutineMock(side_effect=lambda: recovered)
+    manager.register(EventRouter(), datastream=ds)
+    callback = ds.on_reconnect.call_args[0][0]
+
+    manager.suspect_gap = Mock()
+    callback(ds)
+    await asyncio.sleep(0)
+
+    # the snapshot is requested once the subscriptions are restored
+    assert manager['ETH_AURA'].stale
+    manager.suspect_gap.assert_not_called()
+
+    recovered.set_result(0.1)
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    manager.suspect_gap.assert_called_once_with(reason='datastream reconnect')
+
+
+@pytest.mark.asyncio
+async def test_close_reconnect(manager: OrderBookManager):
+    ds = Mock()
+    ds.sub_manager.wait_recovered = CoroutineMock(side_effect=lambda: asyncio.sleep(10))
+    manager.register(EventRouter(), datastream=ds)
+    ds.on_reconnect.call_args[0][0](ds)
+    task = next(iter(manager._recoveries))
+
+    await manager.close()
+    await asyncio.sleep(0)
+    assert task.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_sid_change(manager: OrderBookManager):
+    manager.suspect_gap = Mock()
+
+    # make-before-break rotations and the connections of a pool have their own sids, no gap
+    for sid in ('sid:1', 'sid:2', 'sid:1', 'sid:3'):
+        manager.process(dict(event=MarketEvents.LISTING.value, sid=sid, payload={}))
+    manager.suspect_gap.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_server_block_jump(manager: OrderBookManager):
+    manager.suspect_gap = Mock()
+
+    for block in (100, 101, 101):
+        manager.process(dict(event=ChainEvents.SERVER_BLOCK.value, payload=dict(currentBlock=block)))
+    manager.suspect_gap.assert_not_called()
+
+    manager.process(dict(event=ChainEvents.SERVER_BLOCK.value, payload=dict(currentBlock=105)))
+    manager.suspect_gap.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_close(manager: OrderBookManager):
+    manager._public.order_book = CoroutineMock(side_effect=lambda *args: asyncio.sleep(10))
+    manager.suspect_gap('ETH_AURA')
+    task = manager._resyncs['ETH_AURA']
+
+    await manager.close()
+    await asyncio.sleep(0)
+
+    assert task.cancelled()
+    assert manager._resyncs == {}
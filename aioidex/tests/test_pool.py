@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+from asynctest import CoroutineMock, Mock
+
+from aioidex import IdexDatastream
+from aioidex.datastream.pool import IdexDatastreamPool
+from aioidex.types.events import MarketEvents
+from aioidex.types.subscriptions import Category, MarketSubscription, Subscription
+
+MARKETS = ['ETH_AURA', 'ETH_KIN', 'ETH_ZRX', 'ETH_SAN', 'ETH_OMG', 'ETH_DAI', 'ETH_MKR', 'ETH_BAT', 'ETH_LINK']
+
+
+@pytest.fixture()
+async def pool():
+    yield IdexDatastreamPool(size=3, api_key='key')
+
+
+@pytest.mark.asyncio
+async def test_init(pool: IdexDatastreamPool):
+    assert len(pool) == 3
+    assert all(isinstance(ds, IdexDatastream) for ds in pool.datastreams)
+    assert all(ds._API_KEY == 'key' for ds in pool.datastreams)
+    assert len({id(ds.sub_manager) for ds in pool.datastreams}) == 3
+
+    with pytest.raises(ValueError):
+        IdexDatastreamPool(size=0)
+
+
+@pytest.mark.asyncio
+async def test_shard(pool: IdexDatastreamPool):
+    shards = {pool.shard(m) for m in MARKETS}
+
+    assert shards <= {0, 1, 2}
+    assert len(shards) > 1
+    assert pool.shard('ETH_AURA') == pool.shard('ETH_AURA')
+    assert pool.datastream_for('ETH_AURA') is pool.datastreams[pool.shard('ETH_AURA')]
+
+
+@pytest.mark.asyncio
+async def test_pool_init(pool: IdexDatastreamPool):
+    for ds in pool.datastreams:
+        ds.init = CoroutineMock()
+
+    await pool.init()
+
+    for ds in pool.datastreams:
+        ds.init.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_on_reconnect(pool: IdexDatastreamPool):
+    callback = Mock()
+    pool.on_reconnect(callback)
+
+    ds = pool.datastreams[1]
+    ds._restore_connection = CoroutineMock()
+    await ds._reconnect()
+
+    callback.assert_called_once_with(ds)
+
+
+@pytest.mark.asyncio
+async def test_subscribe(pool: IdexDatastreamPool):
+    for ds in pool.datastreams:
+        ds.sub_manager.subscribe = CoroutineMock(return_value='rid')
+
+    rids = await pool.subscribe(MarketSubscription([MarketEvents.ORDERS], MARKETS))
+
+    topics = []
+    for i, ds in enumerate(pool.datastreams):
+        ds.sub_manager.subscribe.assert_awaited_once()
+        sub = ds.sub_manager.subscribe.call_args[0][0]
+        assert sub.category == Category.MARKET
+        assert sub.events == (MarketEvents.ORDERS.value,)
+        assert all(pool.shard(t) == i for t in sub.topics)
+        topics.extend(sub.topics)
+
+    assert sorted(topics) == sorted(MARKETS)
+    assert rids == ['rid'] * 3
+
+
+@pytest.mark.asyncio
+async def test_subscribe_clears_empty_shards(pool: IdexDatastreamPool):
+    topic = MARKETS[0]
+    shard = pool.shard(topic)
+    for i, ds in enumerate(pool.datastreams):
+        ds.sub_manager.subscribe = CoroutineMock(return_value='rid')
+        ds.sub_manager.clear = CoroutineMock(return_value='clear rid')
+        ds.sub_manager.subscriptions = {Category.MARKET: Subscription(Category.MARKET, [], [])} if i != shard else {}
+
+    await pool.subscribe(MarketSubscription([MarketEvents.ORDERS], [topic]))
+
+    for i, ds in enumerate(pool.datastreams):
+        if i == shard:
+            ds.sub_manager.subscribe.assert_awaited_once()
+            ds.sub_manager.clear.assert_not_awaited()
+        else:
+            ds.sub_manager.subscribe.assert_not_awaited()
+            ds.sub_manager.clear.assert_awaited_once_with(Category.MARKET)
+
+
+@pytest.mark.asyncio
+async def test_unsubscribe(pool: IdexDatastreamPool):
+    for ds in pool.datastreams:
+        ds.sub_manager.unsubscribe = CoroutineMock(return_value='rid')
+
+    await pool.unsubscribe(Category.MARKET, MARKETS)
+
+    topics = []
+    for ds in pool.datastreams:
+        for call in ds.sub_manager.unsubscribe.call_args_list:
+            assert call[0][0] == Category.MARKET
+            topics.extend(call[0][1])
+    assert sorted(topics) == sorted(MARKETS)
+
+
+@pytest.mark.asyncio
+async def test_subscriptions(pool: IdexDatastreamPool):
+    sub = Subscription(Category.MARKET, [], ['ETH_AURA'])
+    pool.datastreams[0].sub_manager.subscriptions = {Category.MARKET: sub}
+
+    assert pool.subscriptions == {Category.MARKET: [sub]}
+
+
+def make_listen(*messages, exc=None):
+    async def listen(typed=False):
+        for m in messages:
+            yield m
+        if exc:
+            raise exc
+        await asyncio.sleep(10)
+
+    return listen
+
+
+@pytest.mark.asyncio
+async def test_listen(pool: IdexDatastreamPool):
+    for i, ds in enumerate(pool.datastreams):
+        ds.listen = make_listen(f'{i}-1', f'{i}-2')
+
+    result = []
+    async for msg in pool.listen():
+        result.append(msg)
+        if len(result) == 6:
+            break
+
+    assert sorted(result) == ['0-1', '0-2', '1-1', '1-2', '2-1', '2-2']
+
+
+@pytest.mark.asyncio
+async def test_listen_raise(pool: IdexDatastreamPool):
+    class UnhandledExc(Exception):
+        pass
+
+    pool.datastreams[0].listen = make_listen(exc=UnhandledExc())
+    for ds in pool.datastreams[1:]:
+        ds.listen = make_listen()
+
+    with pytest.raises(UnhandledExc):
+        async for _ in pool.listen():
+            pass
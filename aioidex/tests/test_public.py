@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 from asynctest import CoroutineMock, patch
 
@@ -163,3 +165,117 @@ async def test_next_nonce(p: Public):
     p._post = CoroutineMock()
     await p.next_nonce('some addr')
     p._post.assert_awaited_once_with('returnNextNonce', {'address': 'some addr'})
+
+
+def pages(*pages):
+    return CoroutineMock(side_effect=list(pages))
+
+
+@pytest.mark.asyncio
+async def test_iter_trade_history(p: Public):
+    with pytest.raises(ValueError):
+        p.iter_trade_history()
+    with pytest.raises(ValueError):
+        p.iter_trade_history('ETH_AURA', page_size=101)
+    with pytest.raises(ValueError):
+        p.iter_trade_history('ETH_AURA', sort='up')
+
+    p._post_page = pages(
+        ([{'tid': 1}, {'tid': 2}], 'c1'),
+        ([{'tid': 3}], 'c2'),
+        ([], None),
+    )
+    trades = [t['tid'] async for t in p.iter_trade_history('ETH_AURA', start=10, end=20, page_size=2)]
+
+    assert trades == [1, 2, 3]
+    assert p._post_page.await_count == 3
+    first, second, third = [c[0] for c in p._post_page.call_args_list]
+    assert first == ('returnTradeHistory', {
+        'market': 'ETH_AURA', 'address': None, 'start': 10, 'end': 20, 'sort': None, 'count': 2
+    })
+    assert second[1]['cursor'] == 'c1'
+    assert third[1]['cursor'] == 'c2'
+
+
+@pytest.mark.asyncio
+async def test_iter_trade_history_stops_at_end(p: Public):
+    p._post_page = pages(
+        ([{'tid': 1, 'timestamp': 10}, {'tid': 2, 'timestamp': 20}], 'c1'),
+        ([{'tid': 3, 'timestamp': 21}], 'c2'),
+        ([{'tid': 4, 'timestamp': 22}], 'c3'),
+    )
+    trades = [t['tid'] async for t in p.iter_trade_history('ETH_AURA', end=20, sort='asc', prefetch=False)]
+
+    assert trades == [1, 2]
+    assert p._post_page.await_count == 2
+
+    p._post_page = pages(([{'tid': 2, 'timestamp': 20}, {'tid': 1, 'timestamp': 9}], 'c1'))
+    trades = [t['tid'] async for t in p.iter_trade_history('ETH_AURA', start=10, prefetch=False)]
+    assert trades == [2]
+
+
+@pytest.mark.asyncio
+async def test_iter_open_orders(p: Public):
+    with pytest.raises(ValueError):
+        p.iter_open_orders()
+    with pytest.raises(ValueError):
+        p.iter_open_orders('ETH_AURA', page_size=0)
+
+    p._post_page = pages(([{'id': 1}], 'c1'), ([{'id': 2}], 'c1'))
+    orders = [o['id'] async for o in p.iter_open_orders(address='0x0')]
+
+    # a repeated cursor ends the iteration
+    assert orders == [1, 2]
+    p._post_page.assert_any_await('returnOpenOrders', {'market': None, 'address': '0x0', 'count': 100})
+
+
+@pytest.mark.asyncio
+async def test_iter_prefetch(p: Public):
+    requested = []
+
+    async def post_page(path, data):
+        requested.append(data.get('cursor'))
+        cursor = (data.get('cursor') or 0) + 1
+        return [{'id': cursor}], cursor if cursor < 3 else None
+
+    p._post_page = post_page
+
+    it = p.iter_open_orders('ETH_AURA')
+    assert (await it.__anext__())['id'] == 1
+    await asyncio.sleep(0)
+    # the second page is requested before the first one is consumed
+    assert requested == [None, 1]
+
+    assert [o['id'] async for o in it] == [2, 3]
+    assert requested == [None, 1, 2]
+
+    requested.clear()
+    it = p.iter_open_orders('ETH_AURA', prefetch=False)
+    assert (await it.__anext__())['id'] == 1
+    await asyncio.sleep(0)
+    assert requested == [None]
+    await it.aclose()
+
+
+@pytest.mark.asyncio
+async def test_iter_close_cancels_prefetch(p: Public):
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def post_page(path, data):
+        if data.get('cursor'):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        return [{'id': 1}, {'id': 2}], 'c1'
+
+    p._post_page = post_page
+
+    it = p.iter_open_orders('ETH_AURA')
+    await it.__anext__()
+    await started.wait()
+    await it.aclose()
+    await asyncio.wait_for(cancelled.wait(), 1)
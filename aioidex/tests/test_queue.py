@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from aioidex.datastream.queue import MessageQueue, OverflowPolicy
+
+
+def event(name, topic, n):
+    return {'event': name, 'room': topic, 'n': n}
+
+
+@pytest.mark.asyncio
+async def test_init():
+    q = MessageQueue(10, 'drop_oldest')
+
+    assert q.overflow is OverflowPolicy.DROP_OLDEST
+    assert q.stats['maxsize'] == 10
+    assert len(q) == 0
+
+    with pytest.raises(ValueError):
+        MessageQueue(0)
+
+    with pytest.raises(ValueError):
+        MessageQueue(10, 'unknown')
+
+    # the reader never waits for the consumer by default
+    assert MessageQueue().overflow is OverflowPolicy.DROP_OLDEST
+
+
+@pytest.mark.asyncio
+async def test_fifo():
+    q = MessageQueue(10)
+
+    for i in range(3):
+        assert await q.put(i) is True
+
+    assert [await q.get() for _ in range(3)] == [0, 1, 2]
+    assert q.stats['put'] == 3
+    assert q.stats['got'] == 3
+    assert q.stats['max_depth'] == 3
+    assert q.stats['depth'] == 0
+
+
+@pytest.mark.asyncio
+async def test_get_waits():
+    q = MessageQueue(10)
+
+    getter = asyncio.ensure_future(q.get())
+    await asyncio.sleep(0)
+    assert not getter.done()
+
+    await q.put('msg')
+    assert await getter == 'msg'
+
+
+@pytest.mark.asyncio
+async def test_block():
+    q = MessageQueue(2, OverflowPolicy.BLOCK)
+    await q.put(1)
+    await q.put(2)
+
+    putter = asyncio.ensure_future(q.put(3))
+    await asyncio.sleep(0)
+    assert not putter.done()
+    assert q.stats['blocked'] == 1
+
+    assert await q.get() == 1
+    await putter
+    assert [await q.get(), await q.get()] == [2, 3]
+    assert q.stats['dropped'] == 0
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest():
+    q = MessageQueue(2, OverflowPolicy.DROP_OLDEST)
+
+    for i in range(4):
+        assert await q.put(i) is True
+
+    assert [await q.get(), await q.get()] == [2, 3]
+    assert q.stats['dropped'] == 2
+
+
+@pytest.mark.asyncio
+async def test_drop_newest():
+    q = MessageQueue(2, OverflowPolicy.DROP_NEWEST)
+
+    assert await q.put(0) is True
+    assert await q.put(1) is True
+    assert await q.put(2) is False
+
+    assert [await q.get(), await q.get()] == [0, 1]
+    assert q.stats['dropped'] == 1
+
+
+@pytest.mark.asyncio
+async def test_conflate():
+    q = MessageQueue(3, OverflowPolicy.CONFLATE)
+
+    await q.put(event('market_orders', 'ETH_AURA', 1))
+    await q.put(event('market_orders', 'ETH_KIN', 2))
+    await q.put(event('market_orders', 'ETH_AURA', 3))
+    await q.put({'request': 'subscribeToMarkets'})
+
+    assert len(q) == 3
+    assert q.stats['conflated'] == 1
+    assert (await q.get())['n'] == 3
+    assert (await q.get())['n'] == 2
+    assert await q.get() == {'request': 'subscribeToMarkets'}
+
+
+@pytest.mark.asyncio
+async def test_conflate_full():
+    q = MessageQueue(2, OverflowPolicy.CONFLATE)
+
+    await q.put(event('market_orders', 'ETH_AURA', 1))
+    await q.put(event('market_orders', 'ETH_KIN', 2))
+    await q.put(event('market_orders', 'ETH_ZRX', 3))
+
+    assert q.stats['dropped'] == 1
+    assert [(await q.get())['n'], (await q.get())['n']] == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_exception():
+    class SomeExc(Exception):
+        pass
+
+    q = MessageQueue(10)
+    await q.put(1)
+    q.put_exception(SomeExc())
+
+    assert await q.get() == 1
+    with pytest.raises(SomeExc):
+        await q.get()
+
+    getter = asyncio.ensure_future(q.get())
+    await asyncio.sleep(0)
+    q.put_exception(SomeExc())
+    with pytest.raises(SomeExc):
+        await getter
@@ -0,0 +1,160 @@
+import asyncio
+from unittest.mock import Mock, patch
+
+import pytest
+from asynctest import CoroutineMock
+
+from aioidex import Client
+from aioidex.http.ratelimit import RateLimiter
+
+# a power of two rate, the token counts stay exact
+RATE = 128
+TICK = 1 / RATE
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture()
+def clock():
+    # the limiter time only, the timers of the loop still fire
+    clock = FakeClock()
+    with patch('aioidex.http.ratelimit.time', Mock(monotonic=clock)):
+        yield clock
+
+
+async def wait_tick(clock: FakeClock, future: asyncio.Future):
+    assert not future.done()
+    clock.advance(TICK)
+    await asyncio.wait_for(future, 1)
+
+
+@pytest.mark.asyncio
+async def test_burst(clock: FakeClock):
+    limiter = RateLimiter(rate=RATE, burst=5)
+
+    for _ in range(5):
+        await limiter.acquire('returnTicker')
+    assert limiter.stats['throttled'] == 0
+    assert limiter.stats['tokens'] == 0
+
+    throttled = asyncio.ensure_future(limiter.acquire('returnTicker'))
+    await asyncio.sleep(0)
+    assert limiter.stats['queued'] == 1
+    await wait_tick(clock, throttled)
+
+    assert limiter.stats['throttled'] == 1
+    assert limiter.stats['requests'] == 6
+    assert limiter.stats['wait_seconds']['count'] == 6
+    assert limiter.stats['wait_seconds']['sum'] == TICK
+
+
+@pytest.mark.asyncio
+async def test_rate(clock: FakeClock):
+    limiter = RateLimiter(rate=RATE, burst=1)
+
+    tasks = [asyncio.ensure_future(limiter.acquire('returnTicker')) for _ in range(21)]
+    await asyncio.sleep(0)
+    assert tasks[0].done()
+
+    # a single request is let through per tick
+    for task in tasks[1:]:
+        await wait_tick(clock, task)
+        assert limiter.stats['tokens'] == 0
+    assert limiter.stats['wait_seconds']['sum'] == sum(i * TICK for i in range(21))
+
+
+@pytest.mark.asyncio
+async def test_costs(clock: FakeClock):
+    limiter = RateLimiter(rate=RATE, burst=8, costs={'returnTicker': 8})
+
+    await limiter.acquire('returnTicker')
+    assert limiter.stats['tokens'] == 0
+
+    throttled = asyncio.ensure_future(limiter.acquire('returnOrderBook'))
+    await asyncio.sleep(0)
+    await wait_tick(clock, throttled)
+    assert limiter.stats['tokens'] == 0
+
+
+@pytest.mark.asyncio
+async def test_priorities():
+    limiter = RateLimiter(rate=100, burst=1)
+    await limiter.acquire('returnTicker')
+
+    order = []
+
+    async def request(path):
+        await limiter.acquire(path)
+        order.append(path)
+
+    tasks = [asyncio.ensure_future(request(p)) for p in (
+        'returnTradeHistory', 'returnTicker', 'returnTradeHistory', 'returnNextNonce', 'returnOrderStatus'
+    )]
+    await asyncio.gather(*tasks)
+
+    assert order == [
+        'returnNextNonce', 'returnOrderStatus', 'returnTicker', 'returnTradeHistory', 'returnTradeHistory'
+    ]
+    assert set(limiter.stats['wait_seconds_by_priority']) == {0, 1, 2}
+
+
+@pytest.mark.asyncio
+async def test_cancel(clock: FakeClock):
+    limiter = RateLimiter(rate=RATE, burst=1)
+    await limiter.acquire('returnTicker')
+
+    cancelled = asyncio.ensure_future(limiter.acquire('returnNextNonce'))
+    waiting = asyncio.ensure_future(limiter.acquire('returnTicker'))
+    await asyncio.sleep(0)
+    assert limiter.stats['queued'] == 2
+
+    # the token of the next tick goes to the remaining request
+    cancelled.cancel()
+    await wait_tick(clock, waiting)
+    assert cancelled.cancelled()
+    assert limiter.stats['queued'] == 0
+    assert limiter.stats['tokens'] == 0
+
+
+def test_init():
+    with pytest.raises(ValueError):
+        RateLimiter(rate=0)
+
+    limiter = RateLimiter(priorities={'returnTicker': 5})
+    assert limiter.priority('returnTicker') == 5
+    assert limiter.priority('returnNextNonce') == 1
+    assert limiter.cost('returnTicker') == 1
+
+
+@pytest.mark.asyncio
+async def test_client_rate_limiter():
+    limiter = RateLimiter(rate=1000)
+    c = Client(coalesce=True, rate_limiter=limiter)
+    await c._http._session.close()
+
+    class Context:
+        async def __aenter__(self):
+            return {'nonce': 1}
+
+        async def __aexit__(self, *args):
+            pass
+
+    c._http._session = CoroutineMock()
+    c._http._session.post = lambda url, data=None: Context()
+    c._http._handle_response = CoroutineMock(side_effect=lambda response: response)
+
+    await asyncio.gather(*(c.public.next_nonce('0x0') for _ in range(3)))
+    await c.public.next_nonce('0x1')
+
+    # the coalesced requests take a single token
+    assert limiter.stats['requests'] == 2
+    assert set(limiter.stats['wait_seconds_by_priority']) == {0}
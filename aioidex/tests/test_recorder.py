@@ -0,0 +1,94 @@
+import asyncio
+import os
+
+import pytest
+import ujson
+from asynctest import CoroutineMock, Mock
+
+from aioidex import IdexDatastream
+from aioidex.datastream.queue import MessageQueue
+from aioidex.datastream.recorder import FrameRecorder, FrameReplay, FRAME, SID
+from aioidex.exceptions import IdexResponseSidError
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_record_replay(tmp_path, compress):
+    with FrameRecorder(str(tmp_path), compress=compress) as recorder:
+        recorder.write('{"a":1}', timestamp=1.5)
+        recorder.write(b'{"b":2}', kind=SID, timestamp=2.5)
+    assert recorder.record_count == 2
+
+    records = list(FrameReplay(str(tmp_path)).records())
+    assert records == [(1.5, FRAME, b'{"a":1}'), (2.5, SID, b'{"b":2}')]
+
+
+def test_segments(tmp_path):
+    with FrameRecorder(str(tmp_path), segment_size=20) as recorder:
+        for i in range(5):
+            recorder.write(f'frame{i}')
+
+    # an existing log is never overwritten
+    with FrameRecorder(str(tmp_path)) as recorder:
+        recorder.write('frame5')
+
+    replay = FrameReplay(str(tmp_path))
+    assert [os.path.basename(p) for p in replay.segments] == [
+        'frames-000000.frames', 'frames-000001.frames', 'frames-000002.frames', 'frames-000003.frames',
+    ]
+    assert [data for _, _, data in replay.records()] == [f'frame{i}'.encode() for i in range(6)]
+
+
+def test_truncated(tmp_path):
+    with FrameRecorder(str(tmp_path)) as recorder:
+        recorder.write('frame0')
+        recorder.write('frame1')
+        path = recorder.segment
+
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 2)
+
+    assert [data for _, _, data in FrameReplay(str(tmp_path)).records()] == [b'frame0']
+
+
+@pytest.mark.asyncio
+async def test_replay_speed(tmp_path):
+    with FrameRecorder(str(tmp_path)) as recorder:
+        recorder.write('frame0', timestamp=100)
+        recorder.write('frame1', timestamp=101)
+
+    loop = asyncio.get_event_loop()
+    started = loop.time()
+    frames = [data async for _, data in FrameReplay(str(tmp_path), speed=20).replay()]
+
+    assert frames == [b'frame0', b'frame1']
+    assert loop.time() - started >= 0.05
+
+
+def event(sid, eid):
+    return ujson.dumps(dict(sid=sid, eid=eid, event='market_trades', room='ETH_AURA', payload='{"trades":[]}'))
+
+
+@pytest.mark.asyncio
+async def test_datastream_record_and_replay(tmp_path):
+    recorder = FrameRecorder(str(tmp_path))
+    ds = IdexDatastream(recorder=recorder)
+
+    ds._set_sid('sid:1')
+    await ds._deliver(event('sid:1', 'evt:1'), MessageQueue())
+    ds._switch_connection(Mock(close=CoroutineMock()), 'sid:2', [])
+    await ds._deliver(event('sid:1', 'evt:2'), MessageQueue())
+    await ds._deliver(event('sid:2', 'evt:3'), MessageQueue())
+    # the sid changed without a rotation
+    ds._set_sid('sid:3')
+    with pytest.raises(IdexResponseSidError):
+        await ds._deliver(event('sid:2', 'evt:4'), MessageQueue())
+    await ds._deliver(event('sid:3', 'evt:5'), MessageQueue())
+    recorder.close()
+
+    replayed = IdexDatastream(replay=FrameReplay(str(tmp_path)))
+    replayed._check_connection = CoroutineMock()
+    messages = [m async for m in replayed.listen()]
+
+    replayed._check_connection.assert_not_awaited()
+    assert [m['eid'] for m in messages] == ['evt:1', 'evt:2', 'evt:3', 'evt:5']
+    assert replayed._sid == 'sid:3'
@@ -0,0 +1,160 @@
+import asyncio
+from unittest.mock import patch
+
+import aiohttp
+import pytest
+from asynctest import CoroutineMock, MagicMock, Mock
+
+from aioidex.exceptions import (
+    IdexClientApiError, IdexClientCircuitOpenError, IdexClientContentTypeError, IdexClientStatusError
+)
+from aioidex.http.network import HttpMethod, Network
+from aioidex.http.retry import CircuitBreaker, RetryPolicy, parse_retry_after
+
+URL = 'https://api.idex.market/returnTicker'
+
+
+@pytest.fixture()
+async def nw():
+    nw = Network(retry_policy=RetryPolicy(attempts=3, base_delay=0.001, max_delay=0.01))
+    yield nw
+    await nw.close(0.01)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('3') == 3
+    assert parse_retry_after('-1') == 0
+    assert parse_retry_after('Wed, 21 Oct 2099 07:28:00 GMT') > 86400
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert parse_retry_after('soon') is None
+
+
+def test_retry_delay():
+    policy = RetryPolicy(attempts=4, base_delay=1, max_delay=3, max_retry_after=30)
+
+    for attempt in range(3):
+        assert 0 <= policy.retry_delay(asyncio.TimeoutError(), 'returnTicker', attempt) <= min(3, 2 ** attempt)
+    assert policy.retry_delay(asyncio.TimeoutError(), 'returnTicker', 3) is None
+
+    assert policy.retry_delay(IdexClientApiError('bad market'), 'returnTicker', 0) is None
+    assert policy.retry_delay(IdexClientStatusError(404, ''), 'returnTicker', 0) is None
+    assert policy.retry_delay(IdexClientStatusError(503, '', retry_after=5), 'returnTicker', 0) >= 5
+    assert policy.retry_delay(IdexClientStatusError(503, '', retry_after=60), 'returnTicker', 0) is None
+    assert policy.retry_delay(IdexClientContentTypeError(502, '<html>'), 'returnTicker', 0) is not None
+
+    # the non idempotent requests are retried only if they can't have been processed
+    assert policy.retry_delay(asyncio.TimeoutError(), 'order', 0) is None
+    assert policy.retry_delay(IdexClientStatusError(503, ''), 'order', 0) is None
+    assert policy.retry_delay(IdexClientStatusError(429, ''), 'order', 0) is not None
+
+    assert policy.stats['retries'] == 6
+    assert policy.stats['exhausted'] == 2
+    assert policy.stats['retries_by_reason'] == {'TimeoutError': 3, '503': 1, 'IdexClientContentTypeError': 1, '429': 1}
+
+
+@pytest.mark.asyncio
+async def test_retry(nw: Network):
+    nw._send_once = CoroutineMock(side_effect=[asyncio.TimeoutError(), IdexClientStatusError(502, ''), 'result'])
+
+    assert await nw._request(HttpMethod.POST, URL) == 'result'
+    assert nw._send_once.await_count == 3
+    assert nw.retry_policy.stats['retries'] == 2
+
+
+@pytest.mark.asyncio
+async def test_retry_exhausted(nw: Network):
+    nw._send_once = CoroutineMock(side_effect=IdexClientStatusError(503, 'down'))
+
+    with pytest.raises(IdexClientStatusError):
+        await nw._request(HttpMethod.POST, URL)
+    assert nw._send_once.await_count == 3
+
+    nw._send_once = CoroutineMock(side_effect=IdexClientApiError('bad market'))
+    with pytest.raises(IdexClientApiError):
+        await nw._request(HttpMethod.POST, URL)
+    nw._send_once.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_status_error(nw: Network):
+    class MagicMockContext(MagicMock):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            response = Mock()
+            response.status = 503
+            response.headers = {'Retry-After': '2'}
+            response.text = CoroutineMock(return_value='maintenance')
+            type(self).__aenter__ = CoroutineMock(return_value=response)
+            type(self).__aexit__ = CoroutineMock(return_value=False)
+
+    with patch('aiohttp.ClientSession.post', new_callable=MagicMockContext):
+        with pytest.raises(IdexClientStatusError) as excinfo:
+            await nw._send_once(HttpMethod.POST, URL)
+
+    assert excinfo.value.status == 503
+    assert excinfo.value.retry_after == 2
+    assert excinfo.value.content == 'maintenance'
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    nw = Network(circuit_breaker=breaker)
+    nw._send_once = CoroutineMock(side_effect=aiohttp.ServerDisconnectedError())
+
+    for _ in range(2):
+        with pytest.raises(aiohttp.ServerDisconnectedError):
+            await nw._request(HttpMethod.POST, URL)
+
+    assert breaker.state('api.idex.market') == CircuitBreaker.OPEN
+    with pytest.raises(IdexClientCircuitOpenError):
+        await nw._request(HttpMethod.POST, URL)
+    assert nw._send_once.await_count == 2
+
+    # a failed probe opens the circuit again
+    await asyncio.sleep(0.05)
+    assert breaker.state('api.idex.market') == CircuitBreaker.HALF_OPEN
+    with pytest.raises(aiohttp.ServerDisconnectedError):
+        await nw._request(HttpMethod.POST, URL)
+    assert breaker.state('api.idex.market') == CircuitBreaker.OPEN
+
+    await asyncio.sleep(0.05)
+    nw._send_once = CoroutineMock(return_value='result')
+    assert await nw._request(HttpMethod.POST, URL) == 'result'
+    assert breaker.state('api.idex.market') == CircuitBreaker.CLOSED
+
+    assert breaker.stats['opened'] == 2
+    assert breaker.stats['rejected'] == 1
+    assert breaker.stats['hosts'] == {}
+    await nw.close(0.01)
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure('host')
+
+    breaker.before_request('host')
+    with pytest.raises(IdexClientCircuitOpenError):
+        breaker.before_request('host')
+
+    breaker.release('host')
+    breaker.before_request('host')
+    breaker.record_success('host')
+    assert breaker.state('host') == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_api_error_closes_circuit():
+    breaker = CircuitBreaker(failure_threshold=2)
+    nw = Network(circuit_breaker=breaker)
+    nw._send_once = CoroutineMock(side_effect=[asyncio.TimeoutError(), IdexClientApiError('bad market')])
+
+    with pytest.raises(asyncio.TimeoutError):
+        await nw._request(HttpMethod.POST, URL)
+    assert breaker.stats['hosts']['api.idex.market']['failures'] == 1
+    with pytest.raises(IdexClientApiError):
+        await nw._request(HttpMethod.POST, URL)
+    assert breaker.stats['hosts'] == {}
+    await nw.close(0.01)
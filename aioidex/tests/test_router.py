@@ -0,0 +1,80 @@
+import pytest
+
+from aioidex.datastream.router import EventRouter
+from aioidex.types.events import MarketEvents, ChainEvents
+
+
+@pytest.fixture()
+def router():
+    yield EventRouter()
+
+
+def test_add(router: EventRouter):
+    handler = lambda m: m
+
+    router.add(MarketEvents.ORDERS, handler)
+
+    assert router.resolve(MarketEvents.ORDERS.value) is handler
+    assert router.resolve(MarketEvents.ORDERS.value, 'ETH_AURA') is handler
+    assert router.resolve(MarketEvents.TRADES.value) is None
+    assert MarketEvents.ORDERS in router
+    assert len(router) == 1
+
+
+def test_add_str_event(router: EventRouter):
+    handler = lambda m: m
+
+    router.add('market_orders', handler)
+
+    assert router.resolve(MarketEvents.ORDERS.value) is handler
+
+
+def test_add_not_callable(router: EventRouter):
+    with pytest.raises(TypeError):
+        router.add(MarketEvents.ORDERS, 'not callable')
+
+
+def test_topic_route(router: EventRouter):
+    common = lambda m: 'common'
+    aura = lambda m: 'aura'
+
+    router.add(MarketEvents.ORDERS, common)
+    router.add(MarketEvents.ORDERS, aura, topic='ETH_AURA')
+
+    assert router.resolve(MarketEvents.ORDERS.value, 'ETH_AURA') is aura
+    assert router.resolve(MarketEvents.ORDERS.value, 'ETH_KIN') is common
+    assert router.resolve(MarketEvents.ORDERS.value) is common
+
+
+def test_topic_route_only(router: EventRouter):
+    aura = lambda m: 'aura'
+
+    router.add(MarketEvents.TRADES, aura, topic='ETH_AURA')
+
+    assert MarketEvents.TRADES in router
+    assert router.resolve(MarketEvents.TRADES.value, 'ETH_AURA') is aura
+    assert router.resolve(MarketEvents.TRADES.value, 'ETH_KIN') is None
+
+
+def test_route_decorator(router: EventRouter):
+    @router.route(ChainEvents.SERVER_BLOCK)
+    def handler(message):
+        return message
+
+    assert router.resolve(ChainEvents.SERVER_BLOCK.value) is handler
+
+
+def test_remove(router: EventRouter):
+    handler = lambda m: m
+
+    router.add(MarketEvents.ORDERS, handler)
+    router.add(MarketEvents.ORDERS, handler, topic='ETH_AURA')
+
+    router.remove(MarketEvents.ORDERS, topic='ETH_AURA')
+    assert len(router) == 1
+
+    router.remove(MarketEvents.ORDERS)
+    assert len(router) == 0
+    assert router.resolve(MarketEvents.ORDERS.value, 'ETH_AURA') is None
+
+    router.remove(MarketEvents.ORDERS)
@@ -0,0 +1,149 @@
+import asyncio
+import json
+
+import pytest
+from asynctest import CoroutineMock, Mock
+
+from aioidex import IdexDatastream
+from aioidex.exceptions import IdexAuthenticationFailure, IdexInvalidVersion
+from aioidex.testing.server import DatastreamServer, _Connection
+from aioidex.types.events import MarketEvents
+from aioidex.types.subscriptions import MarketSubscription, Category
+
+
+@pytest.fixture()
+async def server():
+    async with DatastreamServer(rate=1000, batch_size=2, seed=1) as server:
+        yield server
+
+
+async def take(ds: IdexDatastream, count: int):
+    messages = []
+    async for message in ds.listen():
+        messages.append(message)
+        if len(messages) == count:
+            return messages
+
+
+async def subscribed(server: DatastreamServer) -> IdexDatastream:
+    ds = IdexDatastream(ws_endpoint=server.url)
+    await ds.init()
+    await ds.sub_manager.subscribe(MarketSubscription([MarketEvents.ORDERS, MarketEvents.TRADES], ['ETH_AURA']))
+    return ds
+
+
+@pytest.mark.asyncio
+async def test_events(server: DatastreamServer):
+    ds = await subscribed(server)
+    messages = await asyncio.wait_for(take(ds, 10), 5)
+
+    events = [m for m in messages if 'event' in m]
+    assert events
+    assert set(m['event'] for m in events) <= {MarketEvents.ORDERS.value, MarketEvents.TRADES.value}
+    assert all(m['room'] == 'ETH_AURA' and m['sid'] == ds._sid for m in events)
+    assert all(len(m['payload'].get('orders') or m['payload']['trades']) == 2 for m in events)
+
+    assert server.stats['handshakes'] == 1
+    assert server.stats['events'] >= len(events)
+    await ds._ws.close()
+
+
+@pytest.mark.asyncio
+async def test_subscription_actions(server: DatastreamServer):
+    ds = IdexDatastream(ws_endpoint=server.url)
+    await ds.init()
+    listen = ds.listen()
+    reader = asyncio.ensure_future(listen.__anext__())
+
+    topics = await ds.sub_manager.subscribe(
+        MarketSubscription([MarketEvents.TRADES], ['ETH_AURA', 'ETH_KIN']), wait=True
+    )
+    assert topics == ('ETH_AURA', 'ETH_KIN')
+    assert await ds.sub_manager.unsubscribe(Category.MARKET, ['ETH_KIN'], wait=True) == ('ETH_AURA',)
+    assert await ds.sub_manager.clear(Category.MARKET, wait=True) == ()
+
+    reader.cancel()
+    await listen.aclose()
+    await ds._ws.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('fault', ['disconnect', 'abort', 'change_sid'])
+async def test_reconnect(server: DatastreamServer, fault: str):
+    ds = await subscribed(server)
+    await asyncio.wait_for(take(ds, 5), 5)
+    sid = ds._sid
+
+    if fault == 'change_sid':
+        server.change_sid()
+    else:
+        await server.disconnect(abort=fault == 'abort')
+
+    async def reconnected():
+        async for message in ds.listen():
+            if 'event' in message and message['sid'] != sid:
+                return message
+
+    message = await asyncio.wait_for(reconnected(), 5)
+    assert message['sid'] == ds._sid
+    assert message['room'] == 'ETH_AURA'
+    assert server.stats['handshakes'] == 2
+    await ds._ws.close()
+
+
+@pytest.mark.asyncio
+async def test_handshake_errors():
+    async with DatastreamServer(api_keys=['key'], versions=['1.0.0']) as server:
+        with pytest.raises(IdexAuthenticationFailure):
+            await IdexDatastream(api_key='wrong', ws_endpoint=server.url).init()
+
+        with pytest.raises(IdexInvalidVersion):
+            await IdexDatastream(api_key='key', version='0.1', ws_endpoint=server.url).init()
+
+        server.handshake_error = 'AuthenticationFailure'
+        with pytest.raises(IdexAuthenticationFailure):
+            await IdexDatastream(api_key='key', ws_endpoint=server.url).init()
+
+
+@pytest.mark.asyncio
+async def test_rate():
+    async with DatastreamServer(rate=50) as server:
+        ds = await subscribed(server)
+        await asyncio.sleep(0.3)
+        assert 5 < server.stats['events'] < 30
+        await ds._ws.close()
+
+
+@pytest.mark.asyncio
+async def test_payload_pool():
+    server = DatastreamServer(seed=1, pool_size=2)
+    payloads = [server._next_encoded_payload(MarketEvents.ORDERS.value, 'ETH_AURA') for _ in range(3)]
+
+    # pre-generated payloads are sent in turn
+    assert len(server._payloads[MarketEvents.ORDERS.value, 'ETH_AURA']) == 2
+    assert payloads[2] is payloads[0]
+    assert server._next_encoded_payload(MarketEvents.ORDERS.value, 'ETH_KIN') not in payloads
+
+
+@pytest.mark.asyncio
+async def test_byte_count():
+    server = DatastreamServer(seed=1)
+    server._codec.dumps = lambda data: json.dumps(data, ensure_ascii=False)
+    conn = _Connection(Mock(send=CoroutineMock()))
+
+    await server._send_event(conn, MarketEvents.TRADES.value, 'ETH_ÄURA')
+
+    # bytes of the UTF-8 frame, not characters
+    frame = conn.ws.send.call_args[0][0]
+    assert server.stats['bytes'] == len(frame.encode()) > len(frame)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('compression', [None, 'deflate'])
+async def test_compression(compression):
+    async with DatastreamServer(compression=compression) as server:
+        ds = IdexDatastream(ws_endpoint=server.url)
+        await ds.init()
+        # permessage-deflate is off unless asked for
+        assert bool(ds._ws.extensions) is (compression is not None)
+        await ds._ws.close()
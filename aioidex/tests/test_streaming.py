@@ -0,0 +1,123 @@
+import json
+import random
+
+import pytest
+from aiohttp import web
+
+from aioidex import Client
+from aioidex.exceptions import IdexClientApiError, IdexClientContentTypeError
+from aioidex.http.streaming import ObjectStreamParser
+
+DOCUMENT = {
+    'ETH_AURA': {'last': '0.0001', 'high': None, 'percentChange': -1.5, 'baseVolume': '10'},
+    'ETH_"Q"': {'text': 'a, b: {c} [d] \\ "e"', 'list': [1, [2, {'x': []}], {}], 'unicode': 'é☃'},
+    'ETH_EMPTY': {},
+    'ETH_N': 1.5e-7,
+    'ETH_T': True,
+}
+
+
+def parse(body: bytes, chunk_size: int = None):
+    parser = ObjectStreamParser()
+    members = []
+    chunk_size = chunk_size or len(body) or 1
+    for i in range(0, len(body), chunk_size):
+        members.extend(parser.feed(body[i:i + chunk_size]))
+    parser.close()
+    return members
+
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_parse(indent):
+    body = json.dumps(DOCUMENT, indent=indent, ensure_ascii=False).encode()
+    expected = list(DOCUMENT.items())
+
+    for chunk_size in [None, 1, 2, 3, 7, 64]:
+        assert parse(body, chunk_size) == expected
+    assert parse(b'  {}  ') == []
+    assert parse(b'{"a": 1}\n', 1) == [('a', 1)]
+
+
+def test_parse_random_chunks():
+    body = json.dumps({f'ETH_{i}': {'last': str(i), 'q': '\\"{,'} for i in range(200)}).encode()
+    parser = ObjectStreamParser()
+    rnd = random.Random(1)
+
+    members, i = [], 0
+    while i < len(body):
+        size = rnd.randint(1, 50)
+        members.extend(parser.feed(body[i:i + size]))
+        i += size
+
+    assert dict(members) == json.loads(body)
+    # the buffer keeps the incomplete member only
+    assert len(parser._buffer) < 100
+
+
+def test_parse_errors():
+    with pytest.raises(ValueError):
+        parse(b'[1, 2]')
+    with pytest.raises(ValueError):
+        parse(b'{"a": 1')
+    with pytest.raises(ValueError):
+        parse(b'{"a": 1} x')
+    with pytest.raises(ValueError):
+        parse(b'{"a": 1, , "b": 2}')
+    with pytest.raises(ValueError):
+        parse(b'{"a": [1}')
+
+
+@pytest.fixture()
+async def client():
+    body = json.dumps(DOCUMENT).encode()
+
+    async def ticker(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={'Content-Type': 'application/json'})
+        await response.prepare(request)
+        for i in range(0, len(body), 10):
+            await response.write(body[i:i + 10])
+        await response.write_eof()
+        return response
+
+    async def currencies(request: web.Request) -> web.Response:
+        return web.json_response({'error': 'Service unavailable'})
+
+    async def volume(request: web.Request) -> web.Response:
+        return web.Response(text='<html>', content_type='text/html', status=502)
+
+    app = web.Application()
+    app.router.add_post('/returnTicker', ticker)
+    app.router.add_post('/returnCurrencies', currencies)
+    app.router.add_post('/return24Volume', volume)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+
+    c = Client()
+    c._http._API_URL = 'http://127.0.0.1:{}'.format(site._server.sockets[0].getsockname()[1])
+    yield c
+    await c.close(0.01)
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_iter_ticker(client: Client):
+    assert [m async for m in client.public.iter_ticker()] == list(DOCUMENT.items())
+
+
+@pytest.mark.asyncio
+async def test_stream_errors(client: Client):
+    with pytest.raises(IdexClientApiError):
+        async for _ in client.public.iter_currencies():
+            pass
+
+    with pytest.raises(IdexClientContentTypeError):
+        async for _ in client._http.post_stream('return24Volume'):
+            pass
+
+
+def test_parse_escaped_keys():
+    body = json.dumps({'a\\"b': 1, 'é': [2], 'c': {'d\\': 3}}, ensure_ascii=True).encode()
+    for chunk_size in [None, 1, 5]:
+        assert parse(body, chunk_size) == [('a\\"b', 1), ('é', [2]), ('c', {'d\\': 3})]
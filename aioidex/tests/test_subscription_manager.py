@@ -1,3 +1,4 @@
+import asyncio
 from logging import Logger
 
 import pytest
@@ -5,7 +6,7 @@ from asynctest import Mock, patch, CoroutineMock
 
 from aioidex import IdexDatastream
 from aioidex.datastream.sub_manager import SubscriptionManager
-from aioidex.types.events import MarketEvents
+from aioidex.types.events import MarketEvents, ChainEvents
 from aioidex.types.subscriptions import Category, Subscription, Action
 
 
@@ -230,10 +231,121 @@ async def test_resubscribe(sm: SubscriptionManager):
     sm._init_subscriptions = Mock()
     sm.subscribe = CoroutineMock()
 
-    await sm.resubscribe()
+    await sm.resubscribe(wait=False)
 
     sm._init_subscriptions.assert_called_once()
-    sm.subscribe.assert_awaited_once_with(sub)
+    sm.subscribe.assert_awaited_once()
+    assert sm.subscribe.call_args[0][0] is sub
+    rid = sm.subscribe.call_args[0][1]
+    assert rid in sm._ds._requests
+
+
+def sub_response(rid, category=Category.MARKET, result='success'):
+    return dict(
+        rid=rid,
+        result=result,
+        request=category.value,
+        payload=dict(action='subscribe', events=[MarketEvents.ORDERS.value], topics=['ETH_AURA'])
+    )
+
+
+@pytest.mark.asyncio
+async def test_resubscribe_pipelined(sm: SubscriptionManager):
+    sm.subscriptions = {
+        Category.MARKET: Subscription(Category.MARKET, [MarketEvents.ORDERS], ['ETH_AURA']),
+        Category.CHAIN: Subscription(Category.CHAIN, [ChainEvents.SERVER_BLOCK], ['ETH']),
+    }
+
+    sent = []
+
+    async def subscribe(sub, rid=None):
+        sent.append((sub.category, rid))
+        return rid
+
+    sm.subscribe = subscribe
+
+    task = asyncio.ensure_future(sm.resubscribe(timeout=1))
+    while len(sent) < 2:
+        await asyncio.sleep(0)
+
+    # every request is sent before any confirmation
+    assert [c for c, _ in sent] == [Category.MARKET, Category.CHAIN]
+    assert not task.done()
+
+    for category, rid in sent:
+        sm._ds._resolve_request(sub_response(rid, category))
+
+    recovery_time = await task
+    assert recovery_time is not None and recovery_time >= 0
+    assert sm.recovery_time == recovery_time
+    assert sm._ds._requests == {}
+    assert await sm.wait_recovered() == recovery_time
+
+
+@pytest.mark.asyncio
+async def test_resubscribe_timeout(sm: SubscriptionManager):
+    sm.subscriptions = {Category.MARKET: Subscription(Category.MARKET, [MarketEvents.ORDERS], ['ETH_AURA'])}
+    sm.subscribe = CoroutineMock()
+    sm._logger.error = Mock()
+
+    assert await sm.resubscribe(timeout=0.01) is None
+
+    sm._logger.error.assert_called_once()
+    assert sm._ds._requests == {}
+    assert sm.recovery_time is None
+
+
+@pytest.mark.asyncio
+async def test_resubscribe_error_response(sm: SubscriptionManager):
+    sm.subscriptions = {Category.MARKET: Subscription(Category.MARKET, [MarketEvents.ORDERS], ['ETH_AURA'])}
+    sm.subscribe = CoroutineMock()
+
+    await sm.resubscribe(wait=False)
+    rid = sm.subscribe.call_args[0][1]
+    sm._ds._resolve_request(sub_response(rid, result='error'))
+
+    assert await sm.wait_recovered() is None
+
+
+@pytest.mark.asyncio
+async def test_resubscribe_cancels_previous(sm: SubscriptionManager):
+    sm.subscriptions = {Category.MARKET: Subscription(Category.MARKET, [MarketEvents.ORDERS], ['ETH_AURA'])}
+    sm.subscribe = CoroutineMock()
+
+    await sm.resubscribe(wait=False)
+    previous = sm._recovery
+    old_rid = sm.subscribe.call_args[0][1]
+
+    assert old_rid in sm._ds._requests
+
+    sm.subscriptions = {Category.MARKET: Subscription(Category.MARKET, [MarketEvents.ORDERS], ['ETH_AURA'])}
+    await sm.resubscribe(wait=False)
+    await asyncio.sleep(0)
+
+    assert previous.cancelled()
+    # the old confirmation is not expected anymore
+    assert old_rid not in sm._ds._requests
+    assert list(sm._ds._requests) == [sm.subscribe.call_args[0][1]]
+
+
+@pytest.mark.asyncio
+async def test_wait_recovered_superseded(sm: SubscriptionManager):
+    sm.subscriptions = {Category.MARKET: Subscription(Category.MARKET, [MarketEvents.ORDERS], ['ETH_AURA'])}
+    sm.subscribe = CoroutineMock()
+
+    await sm.resubscribe(wait=False)
+    waiter = asyncio.ensure_future(sm.wait_recovered())
+    await asyncio.sleep(0)
+
+    sm.subscriptions = {Category.MARKET: Subscription(Category.MARKET, [MarketEvents.ORDERS], ['ETH_AURA'])}
+    await sm.resubscribe(wait=False)
+    rid = sm.subscribe.call_args[0][1]
+    sm._ds._resolve_request(sub_response(rid))
+
+    # the waiter follows the newer resubscribe instead of raising CancelledError
+    recovery_time = await asyncio.wait_for(waiter, 1)
+    assert recovery_time is not None
+    assert recovery_time == sm.recovery_time
 
 
 def test_is_sub_response(sm: SubscriptionManager):
@@ -435,3 +547,45 @@ def test_sub_payload(sm: SubscriptionManager):
 def test_filter_none(sm: SubscriptionManager):
     assert sm._filter_none({1: 2}) == {1: 2}
     assert sm._filter_none({1: 2, 3: None}) == {1: 2}
+
+
+def test_subscription_requests(sm: SubscriptionManager):
+    sm.subscriptions = {
+        Category.MARKET: Subscription(Category.MARKET, [MarketEvents.ORDERS], ['ETH_AURA']),
+    }
+
+    assert sm.subscription_requests() == [
+        (
+            Category.MARKET.value,
+            dict(action=Action.SUBSCRIBE.value, topics=('ETH_AURA',), events=(MarketEvents.ORDERS.value,))
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_subscribe_wait(sm: SubscriptionManager):
+    sm._ds.request = CoroutineMock(return_value=sub_response('rid'))
+    sm._ds.send_message = CoroutineMock()
+
+    sub = Subscription(Category.MARKET, [MarketEvents.ORDERS], ['ETH_AURA'])
+    result = await sm.subscribe(sub, wait=True, timeout=3)
+
+    assert result == ('ETH_AURA',)
+    sm._ds.send_message.assert_not_awaited()
+    sm._ds.request.assert_awaited_once_with(
+        Category.MARKET.value,
+        dict(action='subscribe', topics=('ETH_AURA',), events=(MarketEvents.ORDERS.value,)),
+        None,
+        3
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_unsubscribe_clear_wait(sm: SubscriptionManager):
+    sm._ds.request = CoroutineMock(return_value=sub_response('rid'))
+
+    assert await sm.get(Category.MARKET, wait=True) == ('ETH_AURA',)
+    assert await sm.unsubscribe(Category.MARKET, ['ETH_KIN'], wait=True) == ('ETH_AURA',)
+
+    sm._ds.request.return_value = dict(rid='rid', result='success', payload=dict(action='clear'))
+    assert await sm.clear(Category.MARKET, wait=True) == ()
@@ -0,0 +1,135 @@
+import pytest
+from asynctest import Mock
+
+from aioidex.datastream.router import EventRouter
+from aioidex.trades.tape import TradeTape, TradeTapeManager
+from aioidex.types.events import MarketEvents
+
+# the tape requires the analytics extra
+np = pytest.importorskip('numpy')
+
+
+def trade(tid, timestamp, price, amount, side='buy'):
+    return dict(tid=tid, timestamp=timestamp, price=str(price), amount=str(amount), type=side)
+
+
+def test_append_and_wrap():
+    tape = TradeTape('ETH_AURA', capacity=3)
+    for i in range(5):
+        tape.append(100 + i, 1.0 + i, 1.0, 1, tid=i)
+
+    assert len(tape) == 3
+    assert list(tape.trades['tid']) == [2, 3, 4]
+
+
+def test_extend_wraps_and_skips_known_tids():
+    tape = TradeTape('ETH_AURA', capacity=4)
+    assert tape.add_trades([trade(1, 100, 1, 1), trade(2, 101, 2, 1), trade(3, 102, 3, 1)]) == 3
+    assert tape.add_trades([trade(3, 102, 3, 1), trade(4, 103, 4, 1), trade(5, 104, 5, 1)]) == 2
+
+    assert len(tape) == 4
+    assert list(tape.trades['tid']) == [2, 3, 4, 5]
+
+
+def test_extend_skips_batch_duplicates():
+    tape = TradeTape('ETH_AURA', capacity=10)
+    assert tape.add_trades([trade(1, 100, 1, 1), trade(2, 101, 2, 1), trade(1, 100, 1, 1)]) == 2
+    assert list(tape.trades['tid']) == [1, 2]
+
+    # trades without tid are never duplicates
+    assert tape.add_trades([dict(timestamp=102, price='1', amount='1')] * 2) == 2
+    assert len(tape) == 4
+
+    assert tape.append(103, 1.0, 1.0, 1, tid=2) is False
+    assert tape.append(103, 1.0, 1.0, 1, tid=3) is True
+
+
+def test_overwritten_tids_forgotten():
+    tape = TradeTape('ETH_AURA', capacity=2)
+    tape.add_trades([trade(i, 100 + i, 1, 1) for i in range(4)])
+    assert tape._tids == {2, 3}
+
+    # the overwritten trade may be loaded again
+    assert tape.add_trades([trade(1, 101, 1, 1)]) == 1
+    assert list(tape.trades['tid']) == [3, 1]
+    assert tape._tids == {1, 3}
+
+    tape.clear()
+    assert tape.add_trades([trade(3, 103, 1, 1)]) == 1
+
+
+def test_extend_more_than_capacity():
+    tape = TradeTape('ETH_AURA', capacity=2)
+    tape.add_trades([trade(i, 100 + i, 1, 1) for i in range(5)])
+    assert list(tape.trades['tid']) == [3, 4]
+
+
+def test_analytics():
+    tape = TradeTape('ETH_AURA')
+    tape.add_trades([
+        trade(1, 100, 1, 2, 'buy'),
+        trade(2, 150, 3, 1, 'sell'),
+        trade(3, 190, 2, 1, 'buy'),
+    ])
+
+    assert tape.vwap() == pytest.approx((2 + 3 + 2) / 4)
+    assert tape.vwap(60, now=200) == pytest.approx(2.5)
+    assert tape.volume() == 4
+    assert tape.volume(side='buy') == 3
+    assert tape.volume(60, now=200, side='sell') == 1
+    assert tape.high_low() == (3, 1)
+    assert tape.high_low(20, now=200) == (2, 2)
+
+    assert tape.vwap(5, now=1000) is None
+    assert tape.high_low(5, now=1000) is None
+
+
+def test_to_records():
+    records = TradeTape.to_records([dict(timestamp=1, price='0.5', amount='2', type='sell')])
+    assert records.dtype == np.dtype([('timestamp', 'f8'), ('price', 'f8'), ('amount', 'f8'), ('side', 'i1'),
+                                      ('tid', 'i8')])
+    assert records[0]['side'] == -1
+    assert records[0]['tid'] == -1
+
+
+def test_capacity():
+    with pytest.raises(ValueError):
+        TradeTape('ETH_AURA', capacity=0)
+
+
+def test_manager_process():
+    router = EventRouter()
+    tapes = TradeTapeManager(capacity=10)
+    tapes.register(router, ['ETH_AURA'])
+
+    message = dict(event=MarketEvents.TRADES.value, room='ETH_AURA', payload=dict(trades=[trade(1, 100, 1, 1)]))
+    router.resolve(MarketEvents.TRADES.value, 'ETH_AURA')(message)
+    tapes.process(dict(event=MarketEvents.ORDERS.value, room='ETH_AURA', payload=dict(orders=[])))
+
+    assert 'ETH_AURA' in tapes
+    assert len(tapes['ETH_AURA']) == 1
+
+
+@pytest.mark.asyncio
+async def test_manager_load():
+    # the cursor chains may repeat a trade
+    trades = [trade(4, 104, 1, 1), trade(3, 103, 1, 1), trade(3, 103, 1, 1), trade(2, 102, 1, 1), trade(1, 101, 1, 1)]
+
+    async def iter_trade_history(**kwargs):
+        for t in trades:
+            yield t
+
+    public = Mock()
+    public.iter_trade_history = Mock(side_effect=iter_trade_history)
+    tapes = TradeTapeManager(public)
+
+    assert await tapes.load('ETH_AURA', pages=5, count=2) == 4
+    public.iter_trade_history.assert_called_once_with(
+        market='ETH_AURA', start=None, end=None, sort='desc', page_size=2, prefetch=False
+    )
+    assert sorted(tapes['ETH_AURA'].trades['tid']) == [1, 2, 3, 4]
+
+    # the loading stops after the pages
+    tapes = TradeTapeManager(public)
+    assert await tapes.load('ETH_AURA', pages=1, count=2) == 2
+    assert sorted(tapes['ETH_AURA'].trades['tid']) == [3, 4]
\ No newline at end of file
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from decimal import Decimal
+from typing import Dict, Iterable, Deque, Tuple, Union, AsyncIterator, Optional, List
+
+from aioidex.datastream.message import TOPIC_FIELD
+from aioidex.datastream.router import EventRouter
+from aioidex.http.modules.public import Public
+from aioidex.types.events import MarketEvents
+
+INTERVALS = {
+    '1s': 1,
+    '5s': 5,
+    '15s': 15,
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+    '30m': 1800,
+    '1h': 3600,
+    '4h': 14400,
+    '1d': 86400,
+}
+
+Interval = Union[str, int]
+CandleKey = Tuple[str, int]
+
+
+def parse_interval(interval: Interval) -> int:
+    '''Interval in seconds, `interval` is a number of seconds or one of the `INTERVALS` names.'''
+    if isinstance(interval, str):
+        if interval not in INTERVALS:
+            raise ValueError(f'Unknown candle interval {interval!r}, expected one of {", ".join(INTERVALS)}')
+        return INTERVALS[interval]
+    if interval < 1 or 86400 % interval:
+        raise ValueError(f'Candle interval must divide a day in whole seconds, got {interval}')
+    return interval
+
+
+class Candle:
+    __slots__ = ('market', 'interval', 'start', 'open', 'high', 'low', 'close', 'volume', 'trades')
+
+    def __init__(self, market: str, interval: int, start: int, price: Decimal, amount: Decimal):
+        self.market = market
+        self.interval = interval
+        self.start = start
+        self.open = self.high = self.low = self.close = price
+        self.volume = amount
+        self.trades = 1
+
+    def __repr__(self):
+        return (
+            f'Candle(market={self.market!r}, interval={self.interval}, start={self.start}, open={self.open}, '
+            f'high={self.high}, low={self.low}, close={self.close}, volume={self.volume}, trades={self.trades})'
+        )
+
+    @property
+    def end(self) -> int:
+        return self.start + self.interval
+
+    def update(self, price: Decimal, amount: Decimal):
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.volume += amount
+        self.trades += 1
+
+
+class CandleAggregator:
+    '''Builds OHLCV candles of several intervals from the `market_trades` events, trade by trade.
+
+    A candle is closed by the first trade of a later period or by `flush` once its period is over, closed candles are
+    kept in `history` and emitted by `candles()`. Trades older than the open candle or of a closed period are dropped,
+    so the history is to be loaded before the live trades are processed. Up to `history_size` closed candles wait for
+    the `candles()` consumer, the oldest are dropped then.
+    '''
+
+    def __init__(self, public: Public = None, intervals: Iterable[Interval] = ('1m',), history_size: int = 1000):
+        self._public = public
+        self.intervals: List[int] = sorted(set(parse_interval(i) for i in intervals))
+
+        self._open: Dict[CandleKey, Candle] = {}
+        self.history: Dict[CandleKey, Deque[Candle]] = {}
+        self._HISTORY_SIZE = history_size
+
+        # end of the last closed period
+        self._closed_end: Dict[CandleKey, int] = {}
+
+        self._closed: asyncio.Queue = asyncio.Queue(history_size)
+        self.late_count = 0
+        self.dropped_count = 0
+
+        self._logger = logging.getLogger(__name__)
+
+    def register(self, router: EventRouter, markets: Iterable[str] = None):
+        if markets is None:
+            router.add(MarketEvents.TRADES, self.process)
+        else:
+            for market in markets:
+                router.add(MarketEvents.TRADES, self.process, topic=market)
+
+    def process(self, message: Dict):
+        if message.get('event') != MarketEvents.TRADES.value:
+            return
+
+        payload = message['payload']
+        market = payload.get('market') or message.get(TOPIC_FIELD)
+        if market:
+            for trade in payload.get('trades', ()):
+                self.add_trade(market, trade)
+
+    def add_trade(self, market: str, trade: Dict, emit: bool = True):
+        timestamp = int(trade['timestamp'])
+        price, amount = Decimal(trade['price']), Decimal(trade['amount'])
+
+        for interval in self.intervals:
+            key = market, interval
+            start = timestamp - timestamp % interval
+            candle = self._open.get(key)
+
+            if candle is None and start < self._closed_end.get(key, start):
+                # the period is already flushed
+                self.late_count += 1
+            elif candle is None or start > candle.start:
+                if candle is not None:
+                    self._close(candle, emit)
+                self._open[key] = Candle(market, interval, start, price, amount)
+            elif start == candle.start:
+                candle.update(price, amount)
+            else:
+                self.late_count += 1
+
+    def open_candle(self, market: str, interval: Interval) -> Optional[Candle]:
+        return self._open.get((market, parse_interval(interval)))
+
+    def closed_candles(self, market: str, interval: Interval) -> List[Candle]:
+        return list(self.history.get((market, parse_interval(interval)), ()))
+
+    def flush(self, now: float = None) -> int:
+        '''Closes the open candles which period is over, returns the number of the closed candles.'''
+        now = now if now is not None else time.time()
+        expired = [key for key, candle in self._open.items() if candle.end <= now]
+        for key in expired:
+            self._close(self._open.pop(key))
+        return len(expired)
+
+    async def candles(self, flush_interval: Optional[float] = 1.0) -> AsyncIterator[Candle]:
+        '''Yields the closed candles. Every `flush_interval` seconds the open candles of quiet markets are flushed.'''
+        # flushed by the clock, the queue of a busy market is never idle long enough for the quiet ones
+        flushed_at = time.monotonic()
+        while True:
+            timeout = None
+            if flush_interval is not None:
+                timeout = flushed_at + flush_interval - time.monotonic()
+                if timeout <= 0:
+                    self.flush()
+                    flushed_at = time.monotonic()
+                    timeout = flush_interval
+            try:
+                yield await asyncio.wait_for(self._closed.get(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def load(self, market: str, start: int, end: int = None, count: int = 100) -> int:
+        '''Builds the candles of the market from the trade history since `start`, returns the number of the trades.
+
+        Candles closed by the history are kept in `history` without being emitted.
+        '''
+        loaded = 0
+        # tids of the trades of the last second, the cursor chains may repeat them
+        second, seen = None, set()
+        async for trade in self._public.iter_trade_history(
+                market=market, start=start, end=end, sort='asc', page_size=count
+        ):
+            tid, timestamp = trade.get('tid'), int(trade['timestamp'])
+            if timestamp != second:
+                second, seen = timestamp, set()
+            if tid is not None:
+                if tid in seen:
+                    continue
+                seen.add(tid)
+
+            self.add_trade(market, trade, emit=False)
+            loaded += 1
+
+        self._logger.info('Candles %s loaded: %s trades', market, loaded)
+        return loaded
+
+    def _close(self, candle: Candle, emit: bool = True):
+        key = candle.market, candle.interval
+        if key not in self.history:
+            self.history[key] = deque(maxlen=self._HISTORY_SIZE)
+        self.history[key].append(candle)
+        self._closed_end[key] = candle.end
+        if emit:
+            if self._closed.full():
+                self._closed.get_nowait()
+                self.dropped_count += 1
+            self._closed.put_nowait(candle)
@@ -0,0 +1,223 @@
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from aioidex.datastream.message import TOPIC_FIELD
+from aioidex.datastream.router import EventRouter
+from aioidex.http.modules.public import Public
+from aioidex.types.events import MarketEvents
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TRADE_DTYPE = [
+    ('timestamp', 'f8'),
+    ('price', 'f8'),
+    ('amount', 'f8'),
+    # 1 for buy, -1 for sell
+    ('side', 'i1'),
+    # -1 if unknown
+    ('tid', 'i8'),
+]
+
+SIDES = {'buy': 1, 'sell': -1}
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('Trade tape requires the numpy package: pip install aioidex[analytics]')
+
+
+class TradeTape:
+    '''Fixed capacity ring buffer of the market trades backed by a numpy structured array.
+
+    Once the capacity is reached the oldest trades are overwritten. The window analytics are vectorized and don't
+    depend on the insertion order, so history pages may be loaded after the live trades. The tids of the stored trades
+    are kept in a set to skip the duplicates.
+    '''
+
+    def __init__(self, market: str, capacity: int = 100000):
+        _require_numpy()
+        if capacity < 1:
+            raise ValueError('Capacity must be positive')
+
+        self.market = market
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=TRADE_DTYPE)
+        self._next = 0
+        self._size = 0
+        self._tids: Set[int] = set()
+
+    def __len__(self):
+        return self._size
+
+    def __repr__(self):
+        return f'TradeTape(market={self.market!r}, trades={self._size}, capacity={self.capacity})'
+
+    @property
+    def trades(self) -> 'np.ndarray':
+        '''The stored trades in the insertion order (a copy once the buffer wrapped around).'''
+        if self._size < self.capacity:
+            return self._data[:self._size]
+        return np.concatenate((self._data[self._next:], self._data[:self._next]))
+
+    def append(self, timestamp: float, price: float, amount: float, side: int, tid: int = -1) -> bool:
+        '''Returns False if the trade with the tid is already stored.'''
+        return self.extend(np.array([(timestamp, price, amount, side, tid)], dtype=TRADE_DTYPE)) == 1
+
+    def extend(self, records: 'np.ndarray') -> int:
+        '''Appends the trades array of `TRADE_DTYPE`, trades with the already stored (or repeated) tids are skipped.
+
+        Returns the number of the appended trades.
+        '''
+        records = np.asarray(records, dtype=TRADE_DTYPE)
+        keep = np.ones(len(records), dtype=bool)
+        batch = set()
+        for i, tid in enumerate(records['tid'].tolist()):
+            if tid < 0:
+                continue
+            if tid in self._tids or tid in batch:
+                keep[i] = False
+            else:
+                batch.add(tid)
+        if not keep.all():
+            records = records[keep]
+
+        # only the newest `capacity` trades can fit
+        records = records[-self.capacity:]
+        count = len(records)
+        if not count:
+            return 0
+
+        # the tids of the overwritten trades are forgotten
+        slots = (self._next + np.arange(count)) % self.capacity
+        self._tids.difference_update(self._data['tid'][slots[slots < self._size]].tolist())
+
+        head = min(count, self.capacity - self._next)
+        self._data[self._next:self._next + head] = records[:head]
+        self._data[:count - head] = records[head:]
+        self._tids.update(tid for tid in records['tid'].tolist() if tid >= 0)
+
+        self._next = (self._next + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+        return count
+
+    def add_trades(self, trades: Iterable[Dict]) -> int:
+        '''Appends the trades of `returnTradeHistory` response or `market_trades` event payload.'''
+        return self.extend(self.to_records(trades))
+
+    def clear(self):
+        self._next = self._size = 0
+        self._tids.clear()
+
+    def window(self, seconds: float = None, now: float = None) -> 'np.ndarray':
+        '''Trades of the last `seconds` (all the stored trades if None).'''
+        data = self._stored()
+        if seconds is None:
+            return data
+        since = (now if now is not None else time.time()) - seconds
+        return data[data['timestamp'] >= since]
+
+    def vwap(self, seconds: float = None, now: float = None) -> Optional[float]:
+        data = self.window(seconds, now)
+        volume = data['amount'].sum()
+        if not volume:
+            return None
+        return float(np.dot(data['price'], data['amount']) / volume)
+
+    def volume(self, seconds: float = None, now: float = None, side: str = None) -> float:
+        data = self.window(seconds, now)
+        if side is not None:
+            data = data[data['side'] == SIDES[side]]
+        return float(data['amount'].sum())
+
+    def high_low(self, seconds: float = None, now: float = None) -> Optional[Tuple[float, float]]:
+        data = self.window(seconds, now)
+        if not len(data):
+            return None
+        return float(data['price'].max()), float(data['price'].min())
+
+    @staticmethod
+    def to_records(trades: Iterable[Dict]) -> 'np.ndarray':
+        _require_numpy()
+        return np.array(
+            [
+                (
+                    float(t['timestamp']),
+                    float(t['price']),
+                    float(t['amount']),
+                    SIDES.get(t.get('type'), 0),
+                    int(t.get('tid', -1)),
+                )
+                for t in trades
+            ],
+            dtype=TRADE_DTYPE
+        )
+
+    def _stored(self) -> 'np.ndarray':
+        return self._data[:self._size]
+
+
+class TradeTapeManager:
+    '''Trade tapes of several markets, filled by the `market_trades` events and `returnTradeHistory` pages.'''
+
+    def __init__(self, public: Public = None, capacity: int = 100000):
+        _require_numpy()
+
+        self._public = public
+        self._CAPACITY = capacity
+
+        self.tapes: Dict[str, TradeTape] = {}
+
+        self._logger = logging.getLogger(__name__)
+
+    def __getitem__(self, market: str) -> TradeTape:
+        return self.tapes[market]
+
+    def __contains__(self, market: str) -> bool:
+        return market in self.tapes
+
+    def tape(self, market: str) -> TradeTape:
+        if market not in self.tapes:
+            self.tapes[market] = TradeTape(market, self._CAPACITY)
+        return self.tapes[market]
+
+    def register(self, router: EventRouter, markets: Iterable[str] = None):
+        if markets is None:
+            router.add(MarketEvents.TRADES, self.process)
+        else:
+            for market in markets:
+                router.add(MarketEvents.TRADES, self.process, topic=market)
+
+    def process(self, message: Dict):
+        if message.get('event') != MarketEvents.TRADES.value:
+            return
+
+        payload = message['payload']
+        market = payload.get('market') or message.get(TOPIC_FIELD)
+        if market:
+            self.tape(market).add_trades(payload.get('trades', ()))
+
+    async def load(self, market: str, start: int = None, end: int = None, pages: int = 1, count: int = 100) -> int:
+        '''Loads up to `pages` pages of the trade history, newest first. Returns the number of the loaded trades.'''
+        tape = self.tape(market)
+        loaded = 0
+        page: List[Dict] = []
+        # no page is requested ahead, the loading stops after `pages` pages
+        async for trade in self._public.iter_trade_history(
+                market=market, start=start, end=end, sort='desc', page_size=count, prefetch=False
+        ):
+            page.append(trade)
+            if len(page) == count:
+                loaded += tape.add_trades(reversed(page))
+                page = []
+                pages -= 1
+                if not pages:
+                    break
+        if page:
+            loaded += tape.add_trades(reversed(page))
+
+        self._logger.info('Trade tape %s loaded: %s trades', market, loaded)
+        return loaded
@@ -0,0 +1,207 @@
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Optional
+
+from aioidex.datastream.message import TOPIC_FIELD
+from aioidex.types.events import AccountEvents, MarketEvents, ChainEvents
+
+
+class OrderEvent:
+    __slots__ = ('hash', 'market', 'side', 'price', 'amount', 'total', 'user', 'timestamp')
+
+    def __init__(self, order_hash, market, side, price, amount, total=None, user=None, timestamp=None):
+        self.hash = order_hash
+        self.market = market
+        self.side = side
+        self.price = price
+        self.amount = amount
+        self.total = total
+        self.user = user
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f'OrderEvent(hash={self.hash!r}, side={self.side}, price={self.price}, amount={self.amount})'
+
+
+class Cancel:
+    __slots__ = ('id', 'hash', 'market', 'timestamp')
+
+    def __init__(self, cancel_id, order_hash, market, timestamp=None):
+        self.id = cancel_id
+        self.hash = order_hash
+        self.market = market
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f'Cancel(id={self.id!r}, hash={self.hash!r})'
+
+
+class Trade:
+    __slots__ = (
+        'tid', 'hash', 'market', 'side', 'price', 'amount', 'total', 'timestamp', 'maker', 'taker', 'transaction_hash'
+    )
+
+    def __init__(self, tid, order_hash, market, side, price, amount, total=None, timestamp=None, maker=None,
+                 taker=None, transaction_hash=None):
+        self.tid = tid
+        self.hash = order_hash
+        self.market = market
+        self.side = side
+        self.price = price
+        self.amount = amount
+        self.total = total
+        self.timestamp = timestamp
+        self.maker = maker
+        self.taker = taker
+        self.transaction_hash = transaction_hash
+
+    def __repr__(self):
+        return f'Trade(tid={self.tid!r}, side={self.side}, price={self.price}, amount={self.amount})'
+
+
+class BalanceSheet:
+    __slots__ = ('account', 'balances')
+
+    def __init__(self, account, balances):
+        self.account = account
+        self.balances = balances
+
+    def __repr__(self):
+        return f'BalanceSheet(account={self.account!r}, balances={self.balances!r})'
+
+
+class Nonce:
+    __slots__ = ('account', 'nonce')
+
+    def __init__(self, account, nonce):
+        self.account = account
+        self.nonce = nonce
+
+    def __repr__(self):
+        return f'Nonce(account={self.account!r}, nonce={self.nonce!r})'
+
+
+class ServerBlock:
+    __slots__ = ('chain', 'block')
+
+    def __init__(self, chain, block):
+        self.chain = chain
+        self.block = block
+
+    def __repr__(self):
+        return f'ServerBlock(chain={self.chain!r}, block={self.block!r})'
+
+
+class EventMessage:
+    '''Datastream event with the payload built into the model objects.
+
+    `data` is a list of `OrderEvent`, `Cancel` or `Trade`, a `BalanceSheet`, `Nonce` or `ServerBlock`, or the payload
+    dict for the events without a model.
+    '''
+    __slots__ = ('event', 'topic', 'sid', 'eid', 'seq', 'data')
+
+    def __init__(self, event: str, topic: str, sid: str, eid: str, seq: int, data: Any):
+        self.event = event
+        self.topic = topic
+        self.sid = sid
+        self.eid = eid
+        self.seq = seq
+        self.data = data
+
+    def __repr__(self):
+        return f'EventMessage(event={self.event!r}, topic={self.topic!r}, eid={self.eid!r}, data={self.data!r})'
+
+
+# the factories read the items with `get`, the fields missing in the payload are None
+
+def _orders(payload: Dict) -> List[OrderEvent]:
+    market = payload.get('market')
+    return [
+        OrderEvent(
+            o.get('orderHash') or o.get('hash'),
+            o.get('market', market),
+            o.get('type'),
+            o.get('price'),
+            o.get('amount'),
+            o.get('total'),
+            o.get('user'),
+            o.get('timestamp') or o.get('createdAt'),
+        )
+        for o in payload.get('orders', ())
+    ]
+
+
+def _cancels(payload: Dict) -> List[Cancel]:
+    market = payload.get('market')
+    return [
+        Cancel(
+            c.get('id'),
+            c.get('orderHash') or c.get('hash'),
+            c.get('market', market),
+            c.get('timestamp') or c.get('createdAt'),
+        )
+        for c in payload.get('cancels', ())
+    ]
+
+
+def _trades(payload: Dict) -> List[Trade]:
+    market = payload.get('market')
+    return [
+        Trade(
+            t.get('tid'),
+            t.get('orderHash') or t.get('hash'),
+            t.get('market', market),
+            t.get('type'),
+            t.get('price'),
+            t.get('amount'),
+            t.get('total'),
+            t.get('timestamp'),
+            t.get('maker'),
+            t.get('taker'),
+            t.get('transactionHash'),
+        )
+        for t in payload.get('trades', ())
+    ]
+
+
+def _balance_sheet(payload: Dict) -> BalanceSheet:
+    return BalanceSheet(payload.get('account'), payload.get('balances', payload))
+
+
+def _nonce(payload: Dict) -> Nonce:
+    return Nonce(payload.get('account'), payload.get('nonce'))
+
+
+def _server_block(payload: Dict) -> ServerBlock:
+    block = payload.get('currentBlock', payload.get('blockNumber', payload.get('block')))
+    return ServerBlock(payload.get('chain'), block)
+
+
+FACTORIES: Dict[str, Callable[[Dict], Any]] = {
+    MarketEvents.ORDERS.value: _orders,
+    AccountEvents.ORDERS.value: _orders,
+    MarketEvents.CANCELS.value: _cancels,
+    AccountEvents.CANCELS.value: _cancels,
+    MarketEvents.TRADES.value: _trades,
+    AccountEvents.TRADES.value: _trades,
+    AccountEvents.BALANCE_SHEET.value: _balance_sheet,
+    AccountEvents.NONCE.value: _nonce,
+    ChainEvents.SERVER_BLOCK.value: _server_block,
+}
+
+
+def to_event(message: Mapping) -> Optional[EventMessage]:
+    '''Builds the `EventMessage` of the datastream event message, None for the other messages.'''
+    event = message.get('event')
+    if event is None:
+        return None
+
+    payload = message.get('payload')
+    factory = FACTORIES.get(event)
+    return EventMessage(
+        event,
+        message.get(TOPIC_FIELD),
+        message.get('sid'),
+        message.get('eid'),
+        message.get('seq'),
+        factory(payload) if factory is not None and isinstance(payload, dict) else payload,
+    )
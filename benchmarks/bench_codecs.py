@@ -0,0 +1,101 @@
+'''Codec throughput benchmark.
+
+Measures encode/decode rates of every available codec on datastream-like frames and HTTP-like bodies, both for `str`
+and raw `bytes` input, so the fastest codec available in a deployment can be picked:
+
+    python -m benchmarks.bench_codecs --count 20000
+'''
+import argparse
+import time
+from typing import Callable, Dict, List
+
+from aioidex import IdexDatastream
+from aioidex.codecs import CODECS, Codec, get_codec
+
+
+def make_order(i: int) -> Dict:
+    return {
+        'orderHash': f'0x{i:064x}',
+        'price': f'0.000{i % 97 + 1}',
+        'amount': f'{i % 1000 + 1}.5',
+        'total': f'0.{i % 1000 + 1}',
+        'type': 'buy' if i % 2 else 'sell',
+        'params': {'tokenBuy': '0x' + '0' * 40, 'buySymbol': 'ETH', 'buyPrecision': 18, 'amountBuy': str(i)},
+    }
+
+
+def make_frame(codec: Codec, orders: int) -> str:
+    payload = {'market': 'ETH_AURA', 'orders': [make_order(i) for i in range(orders)]}
+    return codec.dumps({
+        'type': 'notification',
+        'sid': 'sid:bench',
+        'eid': 'evt:bench',
+        'seq': 1,
+        'room': 'ETH_AURA',
+        'event': 'market_orders',
+        'payload': codec.dumps(payload),
+    })
+
+
+def make_body(codec: Codec, markets: int) -> str:
+    return codec.dumps({
+        f'ETH_T{i}': {'last': '0.1', 'high': '0.2', 'low': '0.05', 'lowestAsk': '0.11', 'highestBid': '0.09',
+                      'percentChange': '1.5', 'baseVolume': '100.5', 'quoteVolume': '1000.5'}
+        for i in range(markets)
+    })
+
+
+def rate(func: Callable, arg, count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        func(arg)
+    return count / (time.perf_counter() - started)
+
+
+def available_codecs() -> List[Codec]:
+    codecs = []
+    for name in CODECS:
+        try:
+            codecs.append(get_codec(name))
+        except ImportError:
+            print(f'{name}: not installed, skipped')
+    return codecs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=10000, help='iterations per measurement')
+    parser.add_argument('--orders', type=int, nargs='+', default=[1, 10, 100], help='orders per datastream frame')
+    parser.add_argument('--markets', type=int, default=300, help='markets in the HTTP body')
+    args = parser.parse_args()
+
+    codecs = available_codecs()
+    reference = codecs[0]
+
+    print(f'{"codec":8} {"input":28} {"str/s":>12} {"bytes/s":>12}')
+    for orders in args.orders:
+        frame = make_frame(reference, orders)
+        for codec in codecs:
+            ds = IdexDatastream(codec=codec)
+            process = lambda f: ds._decode(f)['payload']
+            print(
+                f'{codec.name:8} {f"frame, {orders} orders ({len(frame)} B)":28} '
+                f'{rate(process, frame, args.count):12.0f} {rate(process, frame.encode(), args.count):12.0f}'
+            )
+
+    body = make_body(reference, args.markets)
+    count = max(1, args.count // 100)
+    for codec in codecs:
+        print(
+            f'{codec.name:8} {f"body, {args.markets} markets ({len(body)} B)":28} '
+            f'{rate(codec.loads, body, count):12.0f} {rate(codec.loads, body.encode(), count):12.0f}'
+        )
+
+    message = {'rid': 'rid:bench', 'sid': 'sid:bench', 'request': 'subscribeToMarkets',
+               'payload': {'action': 'subscribe', 'topics': [f'ETH_T{i}' for i in range(args.markets)]}}
+    for codec in codecs:
+        print(f'{codec.name:8} {"encode subscribe request":28} {rate(codec.dumps, message, args.count):12.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+'''Datastream benchmark.
+
+Measures the message processing rate by payload size, subscription responses handling with thousands of topics and
+the end-to-end `listen()` throughput and reconnect latency against the local datastream server:
+
+    python -m benchmarks.bench_datastream --count 20000 --duration 5 --json datastream.json
+'''
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List
+
+from aioidex import IdexDatastream
+from aioidex.datastream.metrics import DatastreamMetrics
+from aioidex.testing.server import DatastreamServer
+from aioidex.types.events import MarketEvents
+from aioidex.types.models import to_event
+from aioidex.types.subscriptions import MarketSubscription
+from benchmarks.bench_codecs import make_frame, rate
+
+
+def bench_processing(orders: List[int], count: int) -> List[Dict]:
+    results = []
+    ds = IdexDatastream()
+    ds._set_sid('sid:bench')
+    measured = IdexDatastream(metrics=DatastreamMetrics())
+    measured._set_sid('sid:bench')
+    for n in orders:
+        frame = make_frame(ds._codec, n)
+        for name, func in (
+                ('decode', ds._decode),
+                ('process', ds._process_message),
+                ('process, metrics on', measured._process_message),
+                # the payload is decoded on the first access
+                ('process+payload', lambda f: ds._process_message(f)['payload']),
+                ('process+models', lambda f: to_event(ds._process_message(f))),
+        ):
+            results.append(dict(
+                bench=name, orders=n, size=len(frame), rate=rate(func, frame, count), unit='msg/s'
+            ))
+    return results
+
+
+def sub_response(topics: int) -> str:
+    return json.dumps(dict(
+        type='response', rid='rid:bench', sid='sid:bench', request='subscribeToMarkets', result='success',
+        payload=json.dumps(dict(
+            action='subscribe', topics=[f'ETH_T{i}' for i in range(topics)], events=['market_orders']
+        )),
+    ))
+
+
+def bench_subscriptions(topics: List[int], count: int) -> List[Dict]:
+    results = []
+    ds = IdexDatastream()
+    ds._set_sid('sid:bench')
+    for n in topics:
+        frame = sub_response(n)
+        results.append(dict(
+            bench='sub response', topics=n, size=len(frame), rate=rate(ds._process_message, frame, count),
+            unit='msg/s'
+        ))
+        results.append(dict(
+            bench='subscription requests', topics=n, rate=rate(lambda _: ds.sub_manager.subscription_requests(),
+                                                                None, count), unit='call/s'
+        ))
+    return results
+
+
+async def bench_listen(markets: int, batch_size: int, duration: float) -> List[Dict]:
+    async with DatastreamServer(rate=None, batch_size=batch_size) as server:
+        ds = IdexDatastream(ws_endpoint=server.url)
+        await ds.init()
+        await ds.sub_manager.subscribe(
+            MarketSubscription([MarketEvents.ORDERS, MarketEvents.TRADES], [f'ETH_T{i}' for i in range(markets)])
+        )
+
+        received = 0
+        listen = ds.listen()
+        started = time.perf_counter()
+        async for message in listen:
+            received += 1
+            if time.perf_counter() - started >= duration:
+                break
+        elapsed = time.perf_counter() - started
+
+        # reconnect latency: from the sid change to the first event of the new connection
+        sid = ds._sid
+        server.change_sid()
+        changed = time.perf_counter()
+        async for message in listen:
+            if 'event' in message and message['sid'] != sid:
+                break
+        reconnect = time.perf_counter() - changed
+
+        await listen.aclose()
+        await ds._ws.close()
+
+    return [
+        dict(bench='listen', markets=markets, batch_size=batch_size, rate=received / elapsed, unit='msg/s'),
+        dict(bench='reconnect', markets=markets, latency=reconnect * 1000, unit='ms'),
+    ]
+
+
+def print_results(results: List[Dict]):
+    for result in results:
+        value = result.get('rate', result.get('latency'))
+        params = ', '.join(f'{k}={v}' for k, v in result.items() if k not in ('bench', 'rate', 'latency', 'unit'))
+        print(f'{result["bench"]:24} {params:40} {value:12.1f} {result["unit"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=10000, help='iterations per measurement')
+    parser.add_argument('--orders', type=int, nargs='+', default=[1, 10, 100], help='orders per datastream frame')
+    parser.add_argument('--topics', type=int, nargs='+', default=[100, 1000, 5000], help='topics per subscription')
+    parser.add_argument('--markets', type=int, default=10, help='subscribed markets of the listen benchmark')
+    parser.add_argument('--batch-size', type=int, default=10, help='orders per event of the listen benchmark')
+    parser.add_argument('--duration', type=float, default=3.0, help='listen benchmark duration, seconds')
+    parser.add_argument('--json', help='write the results to the file to compare them across releases')
+    args = parser.parse_args()
+
+    # the reconnect benchmark makes the expected errors logged
+    logging.basicConfig(level=logging.CRITICAL)
+
+    results = bench_processing(args.orders, args.count)
+    results += bench_subscriptions(args.topics, max(1, args.count // 100))
+    results += asyncio.get_event_loop().run_until_complete(
+        bench_listen(args.markets, args.batch_size, args.duration)
+    )
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
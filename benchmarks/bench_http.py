@@ -0,0 +1,138 @@
+'''HTTP benchmark.
+
+Measures requests/sec and p50/p99 latency of `Network` and `Public` calls against a local aiohttp stub of the REST API
+by response size and concurrency, the streamed ticker is measured to the end and to the first market:
+
+    python -m benchmarks.bench_http --requests 2000 --concurrency 1 10 50 --json http.json
+'''
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List, Callable, Awaitable, AsyncIterator
+
+from aiohttp import web
+
+from aioidex import Client
+from benchmarks.bench_codecs import make_body
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def start_stub(markets: int) -> web.AppRunner:
+    ticker = make_body(json, markets).encode()
+    order_book = json.dumps(dict(
+        asks=[dict(price='0.1', amount='1', total='0.1', orderHash=f'0x{i:064x}') for i in range(markets)],
+        bids=[dict(price='0.1', amount='1', total='0.1', orderHash=f'0x{i:064x}') for i in range(markets)],
+    )).encode()
+    small = json.dumps(dict(nonce=1)).encode()
+
+    def handler(body: bytes):
+        async def handle(request: web.Request) -> web.Response:
+            await request.read()
+            return web.Response(body=body, content_type='application/json')
+
+        return handle
+
+    app = web.Application()
+    app.router.add_post('/returnTicker', handler(ticker))
+    app.router.add_post('/returnOrderBook', handler(order_book))
+    app.router.add_post('/returnNextNonce', handler(small))
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    return runner
+
+
+def stub_url(runner: web.AppRunner) -> str:
+    host, port = runner.addresses[0][:2]
+    return f'http://{host}:{port}'
+
+
+async def consume(iterator: AsyncIterator):
+    async for _ in iterator:
+        pass
+
+
+async def first(iterator: AsyncIterator):
+    async for _ in iterator:
+        break
+    await iterator.aclose()
+
+
+async def measure(call: Callable[[], Awaitable], requests: int, concurrency: int) -> Dict:
+    latencies = []
+
+    async def worker(count: int):
+        for _ in range(count):
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return dict(
+        rate=len(latencies) / elapsed,
+        p50=percentile(latencies, 50) * 1000,
+        p99=percentile(latencies, 99) * 1000,
+    )
+
+
+async def bench(markets: int, requests: int, concurrency: List[int]) -> List[Dict]:
+    runner = await start_stub(markets)
+    client = Client()
+    client._http._API_URL = stub_url(runner)
+    coalescing = Client(coalesce=True)
+    coalescing._http._API_URL = stub_url(runner)
+
+    calls = {
+        'network next_nonce': lambda: client._http.post('returnNextNonce', dict(address='0x0')),
+        'public next_nonce': lambda: client.public.next_nonce('0x0'),
+        f'public ticker ({markets} markets)': lambda: client.public.ticker(),
+        f'public order_book ({markets} orders)': lambda: client.public.order_book('ETH_AURA', 100),
+        'public ticker, coalesced': lambda: coalescing.public.ticker(),
+        f'public iter_ticker ({markets} markets)': lambda: consume(client.public.iter_ticker()),
+        'public iter_ticker, first market': lambda: first(client.public.iter_ticker()),
+    }
+
+    results = []
+    try:
+        for name, call in calls.items():
+            # warm up the connection pool
+            await measure(call, concurrency[-1], concurrency[-1])
+            for c in concurrency:
+                results.append(dict(bench=name, concurrency=c, **await measure(call, requests, c)))
+    finally:
+        await client.close()
+        await coalescing.close()
+        await runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000, help='requests per measurement')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50], help='requests in flight')
+    parser.add_argument('--markets', type=int, default=300, help='markets (orders) in the large responses')
+    parser.add_argument('--json', help='write the results to the file to compare them across releases')
+    args = parser.parse_args()
+
+    results = asyncio.get_event_loop().run_until_complete(bench(args.markets, args.requests, args.concurrency))
+
+    print(f'{"request":36} {"concurrency":>11} {"req/s":>10} {"p50 ms":>8} {"p99 ms":>8}')
+    for r in results:
+        print(f'{r["bench"]:36} {r["concurrency"]:11} {r["rate"]:10.0f} {r["p50"]:8.2f} {r["p99"]:8.2f}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()